@@ -70,9 +70,10 @@ from importlib import import_module
 
 from dposlib import rest, cfg, HOME, FROZEN
 from dposlib.ark import crypto, api
-from dposlib.ark.tx import Transaction
+from dposlib.ark.tx import Transaction, finalizeMany
 from dposlib.util.bin import hexlify, unhexlify
 from dposlib.util.asynch import setInterval
+from dposlib.util import scoreboard
 
 from dposlib.ark import builders
 from dposlib.ark.builders import broadcastTransactions
@@ -158,7 +159,7 @@ def _load_builders():
 
     __all__.extend([
         api, cfg, rest, crypto,
-        hexlify, unhexlify, broadcastTransactions,
+        hexlify, unhexlify, broadcastTransactions, finalizeMany,
     ])
 
     for name in [
@@ -203,7 +204,8 @@ def _write_module(path, configuration={}, fees={}):
 
 
 def _select_peers():
-    peers = []
+    # keep best scored peers, current ones are candidates too
+    peers = list(cfg.peers)
     candidates = rest.GET.api.peers(
         version=cfg.version, orderBy="height:desc"
     ).get("data", [])
@@ -214,11 +216,13 @@ def _select_peers():
                 api_port = value
                 break
         if api_port > 0:
-            peers.append("http://%s:%s" % (candidate["ip"], api_port))
-            if len(peers) >= cfg.broadcast:
-                break
-    if len(peers):
-        cfg.peers = peers
+            peer = "http://%s:%s" % (candidate["ip"], api_port)
+            if "height" in candidate:
+                scoreboard.SCOREBOARD.setHeight(peer, candidate["height"])
+            if peer not in peers:
+                peers.append(peer)
+    if len(candidates) and len(peers):
+        cfg.peers = scoreboard.SCOREBOARD.rank(peers)[:cfg.broadcast]
 
 
 def init(seed=None):
@@ -284,6 +288,7 @@ def init(seed=None):
     )
     cfg.activeDelegates = constants["activeDelegates"]
     cfg.maxTransactions = constants["block"]["maxTransactions"]
+    cfg.multiPaymentLimit = constants.get("multiPaymentLimit", 64)
     # on solar block time is blockTime
     cfg.blocktime = constants.get("blockTime", constants.get("blocktime"))
     cfg.begintime = datetime.strptime(
@@ -321,14 +326,16 @@ def init(seed=None):
 
 def stop():
     """
-    Stop daemon initialized by `init` call.
+    Stop daemon initialized by `init` call and content refresh.
     """
     global DAEMON_PEERS
     if DAEMON_PEERS is not None:
         DAEMON_PEERS.set()
+    api.WATCHER.stop()
+    api.SCHEDULER.stop()
 
 
 __all__ = [
     api, cfg, rest, crypto,
-    hexlify, unhexlify, broadcastTransactions
+    hexlify, unhexlify, broadcastTransactions, finalizeMany
 ]
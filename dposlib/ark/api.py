@@ -9,11 +9,13 @@ import weakref
 import hashlib
 import getpass
 import inspect
+import warnings
 import dposlib
 
 from dposlib.ark import slots, crypto
+from dposlib.ark.tx import signAndIdentify
 from dposlib.util.data import filter_dic, dumpJson, loadJson
-from dposlib.util.asynch import setInterval
+from dposlib.util.asynch import Scheduler, setInterval
 from dposlib.ark.mixin import loadPages, deltas
 
 try:
@@ -28,6 +30,38 @@ deltas = deltas
 GET = dposlib.rest.GET
 
 
+def _height():
+    # blockchain height used to skip refreshes while no block is forged
+    if WATCHER.event is not None and WATCHER.height is not None:
+        return WATCHER.height
+    return GET.api.blockchain(returnKey="data")["block"]["height"]
+
+
+def _txKeys(tx):
+    # addresses, public keys and usernames involved in a transaction
+    asset = tx.get("asset", {}) or {}
+    keys = [
+        tx.get(k, None) for k in
+        ["sender", "senderId", "senderPublicKey", "recipient", "recipientId"]
+    ]
+    keys.extend(
+        p.get("recipientId", None)
+        for p in asset.get("payments", []) + asset.get("transfers", [])
+    )
+    votes = asset.get("votes", [])
+    if isinstance(votes, dict):
+        # solar-network vote dictionary {username: percent}
+        keys.extend(votes)
+    else:
+        keys.extend(v[1:] for v in votes if isinstance(v, str))
+    keys.append(asset.get("delegate", {}).get("username", None))
+    return set(k for k in keys if isinstance(k, str))
+
+
+#: refresh scheduler of tracked Content objects
+SCHEDULER = Scheduler(30, jitter=0.1, workers=8, batch=100, height=_height)
+
+
 def isLinked(func):
     """
     `Python decorator`.
@@ -203,13 +237,52 @@ class JSDict(dict):
     __getattr__ = dict.__getitem__
 
 
+class _Deprecated(object):
+    # former Content class attribute computed from SCHEDULER on access
+
+    def __init__(self, name, getter):
+        self.name = name
+        self.getter = getter
+
+    def __get__(self, obj, cls=None):
+        warnings.warn(
+            "Content.%s is deprecated, use dposlib.ark.api.SCHEDULER" %
+            self.name, DeprecationWarning, stacklevel=2
+        )
+        return self.getter()
+
+
+class _SchedulerEvent(object):
+    # former refresh loop event, setting it stops tracked contents refresh
+
+    def set(self):
+        SCHEDULER.stop()
+
+    def is_set(self):
+        return SCHEDULER.stats()["objects"] == 0
+
+
+def contentUpdate():
+    """
+    Deprecated, refresh all tracked contents. Use `SCHEDULER.refresh`
+    instead.
+    """
+    warnings.warn(
+        "contentUpdate is deprecated, use dposlib.ark.api.SCHEDULER.refresh",
+        DeprecationWarning, stacklevel=2
+    )
+    SCHEDULER.refresh()
+
+
 class Content(object):
     """
     Live object connected to blockchain. It is initialized with
     [`dposlib.rest.GET`](../rest.md#dposlib.rest.GET) request. Object is
-    updated every 30s. Endpoint response can be a `dict` or a `list`. If it is
-    a `list`, it is stored in `data` attribute else all fields are stored as
-    instance attribute.
+    updated as soon as a new block affecting it is forged, see
+    `ChainWatcher`, and every 30s by default through `SCHEDULER` if a block
+    was forged since last update. Endpoint response can be a `dict` or a
+    `list`. If it is a `list`, it is stored in `data` attribute else all
+    fields are stored as instance attribute.
 
     ```python
     >>> txs = dposlib.ark.Content(rest.GET.api.transactions)
@@ -234,10 +307,18 @@ class Content(object):
     >>> tx.datetime
     datetime.datetime(2021, 1, 30, 15, 35, 4, tzinfo=<UTC>)
     ```
+
+    `Content.REF` and `Content.EVENT` of the former refresh loop are
+    deprecated and computed from `SCHEDULER`.
     """
 
-    REF = set()
-    EVENT = False
+    REF = _Deprecated(
+        "REF", lambda: set(weakref.ref(obj) for obj in SCHEDULER.objects())
+    )
+    EVENT = _Deprecated(
+        "EVENT",
+        lambda: _SchedulerEvent() if SCHEDULER.stats()["objects"] else False
+    )
 
     datetime = property(
         lambda cls: slots.getRealTime(cls.timestamp["epoch"]),
@@ -254,18 +335,17 @@ class Content(object):
 
         * `keep_alive` *bool* - set hook to update data from blockcahin.
             Default to True.
+        * `refresh` *float* - update interval in seconds. Default to 30.
         """
         track = kwargs.pop("keep_alive", True)
+        interval = kwargs.pop("refresh", None)
         self.__ndpt = ndpt
         self.__args = args
         self.__kwargs = kwargs
         self.update()
 
         if track:
-            self.track()
-
-        if Content.EVENT is False:
-            Content.EVENT = setInterval(30)(contentUpdate)()
+            self.track(interval)
 
     def __str__(self):
         return json.dumps(
@@ -314,33 +394,128 @@ class Content(object):
                     data[k] = int(v)
         return JSDict(data)
 
-    def update(self):
-        result = self.__ndpt(*self.__args, **self.__kwargs)
+    def _refresh(self, result):
         if isinstance(result, dict):
             if result.get("status", 0) < 300:
                 self.__dict__.update(
                     self.filter(result.get("data", result))
                 )
 
-    def track(self):
+    def update(self):
+        self._refresh(self.__ndpt(*self.__args, **self.__kwargs))
+
+    def track(self, interval=None):
+        SCHEDULER.add(self, interval)
+        if getattr(dposlib.rest.cfg, "hotmode", False):
+            WATCHER.start()
+
+    def affected(self, keys):
+        """
+        Check if content may have changed according to addresses, public
+        keys and usernames involved in new blocks.
+
+        Args:
+            keys (set): addresses, public keys and usernames.
+
+        Returns:
+            bool: True if content has to be updated.
+        """
+        return True
+
+
+class ChainWatcher(object):
+    """
+    Poll `api/blockchain` endpoint and, when new blocks are forged, refresh
+    tracked contents they affect. Contents not affected are considered up to
+    date so periodic refresh of `SCHEDULER` skips them.
+
+    Args:
+        scheduler (dposlib.util.asynch.Scheduler): contents scheduler.
+        interval (float): polling interval in seconds, default to a quarter
+            of block time.
+        depth (int): maximum number of new blocks inspected, all contents are
+            refreshed beyond.
+    """
+
+    def __init__(self, scheduler, interval=None, depth=10):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.depth = depth
+        self.height = None
+        self.event = None
+
+    def start(self):
+        if self.event is None:
+            self.event = setInterval(
+                self.interval or
+                max(1., getattr(dposlib.rest.cfg, "blocktime", 8) / 4.)
+            )(self.poll)()
+
+    def stop(self):
+        if self.event is not None:
+            self.event.set()
+            self.event = None
+        self.height = None
+
+    def keys(self, first, last):
+        """
+        Get addresses, public keys and usernames involved in a block range.
+
+        Args:
+            first (int): first block height.
+            last (int): last block height.
+
+        Returns:
+            set: keys or `None` if they can not be determined.
+        """
+        if last - first >= self.depth:
+            return None
+        keys = set()
+        for height in range(first, last + 1):
+            block = GET.api.blocks("%d" % height, returnKey="data")
+            if not isinstance(block, dict) or "id" not in block:
+                return None
+            keys.update(
+                v for v in block.get("generator", {}).values()
+                if isinstance(v, str)
+            )
+            if block.get("transactions", 0):
+                # few tries so a single poll does not stall the interval
+                for tx in loadPages(
+                    GET.api.blocks.__getattr__(block["id"]).transactions,
+                    nb_tries=1
+                ):
+                    keys |= _txKeys(tx)
+        return keys
+
+    def poll(self):
+        """
+        Check blockchain height and refresh affected contents.
+        """
+        if self.scheduler.stats()["objects"] == 0:
+            return self.stop()
         try:
-            Content.REF.add(weakref.ref(self))
+            height = GET.api.blockchain(returnKey="data")["block"]["height"]
         except Exception:
-            pass
+            return
+        if self.height is None:
+            self.height = height
+            return
+        if height <= self.height:
+            return
+        try:
+            keys = self.keys(self.height + 1, height)
+        except Exception:
+            # unavailable block data, all contents are refreshed
+            keys = None
+        self.height = height
+        self.scheduler.refresh(
+            None if keys is None else lambda obj: obj.affected(keys), height
+        )
 
 
-def contentUpdate():
-    dead = set()
-    for ref in list(Content.REF):
-        obj = ref()
-        if obj:
-            obj.update()
-        else:
-            dead.add(ref)
-    Content.REF -= dead
-    if len(Content.REF) == 0:
-        Content.EVENT.set()
-        Content.EVENT = False
+#: chain head watcher refreshing tracked Content objects
+WATCHER = ChainWatcher(SCHEDULER)
 
 
 class Wallet(Content):
@@ -391,6 +566,34 @@ class Wallet(Content):
             self, GET.api.wallets, address, **dict({"returnKey": "data"}, **kw)
         )
 
+    def affected(self, keys):
+        return getattr(self, "address", None) in keys or \
+            getattr(self, "publicKey", None) in keys
+
+    @staticmethod
+    def updateMany(wallets):
+        """
+        Update wallets using a single search request. Wallets not found are
+        updated one by one.
+
+        Args:
+            wallets (list): wallets to update.
+        """
+        records = dposlib.rest.POST.api.wallets.search(
+            addresses=[w.address for w in wallets]
+        ).get("data", None)
+        if isinstance(records, list):
+            records = dict(
+                (r["address"], r) for r in records if isinstance(r, dict)
+            )
+        else:
+            records = {}
+        for wallet in wallets:
+            if wallet.address in records:
+                wallet._refresh(filter_dic(records[wallet.address]))
+            else:
+                wallet.update()
+
     def _finalizeTx(self, tx):
         if hasattr(self, "_privateKey"):
             # set publicKey manualy
@@ -401,17 +604,9 @@ class Wallet(Content):
                 tx["recipientId"] = self.address
             tx.fee = self._fee
             tx.feeIncluded = self._fee_included
-            tx["signature"] = crypto.getSignatureFromBytes(
-                crypto.getBytes(tx), self._privateKey
-            )
-            if hasattr(self, "_secondPrivateKey"):
-                tx["signSignature"] = \
-                    crypto.getSignatureFromBytes(
-                        crypto.getBytes(tx),
-                        self._secondPrivateKey
-                    )
-            tx["id"] = crypto.getIdFromBytes(
-                crypto.getBytes(tx, exclude_multi_sig=False)
+            signAndIdentify(
+                tx, self._privateKey,
+                getattr(self, "_secondPrivateKey", None)
             )
         return tx
 
@@ -682,17 +877,7 @@ class Ledger(Wallet):
 class Delegate(Content):
 
     wallet = property(lambda cls: Wallet(cls.address), None, None, "")
-    voters = property(
-        lambda cls: list(sorted(
-            [
-                filter_dic(dic) for dic in
-                loadPages(GET.api.delegates.__getattr__(cls.username).voters)
-            ],
-            key=lambda e: e["balance"],
-            reverse=True
-        )),
-        None, None, ""
-    )
+    voters = property(lambda cls: cls._getVoters(), None, None, "")
     lastBlock = property(
         lambda cls: Block(cls.blocks["last"]["id"]), None, None, ""
     )
@@ -703,6 +888,35 @@ class Delegate(Content):
             **dict({"returnKey": "data"}, **kw)
         )
 
+    def _getVoters(self):
+        voters = list(sorted(
+            [
+                filter_dic(dic) for dic in
+                loadPages(GET.api.delegates.__getattr__(self.username).voters)
+            ],
+            key=lambda e: e["balance"],
+            reverse=True
+        ))
+        # voter addresses are kept to detect vote balance changes
+        self._voters = set(v.get("address", None) for v in voters)
+        return voters
+
+    def affected(self, keys):
+        """
+        Delegate votes move with its voters balance. Voters known from last
+        `voters` call are checked, if they are unknown or if a vote may have
+        changed, delegate is considered affected by any new transaction.
+        """
+        if any(
+            getattr(self, k, None) in keys
+            for k in ["address", "publicKey", "username"]
+        ):
+            self._voters = None
+            return True
+        voters = getattr(self, "_voters", None)
+        return len(keys) > 0 if voters is None else \
+            not voters.isdisjoint(keys)
+
     def getRecentBlocks(self, limit=50):
         return loadPages(
             GET.api.delegates.__getattr__(self.username).blocks,
@@ -731,6 +945,12 @@ class Block(Content):
             self, GET.api.blocks, blk_id, **dict({"returnKey": "data"}, **kw)
         )
 
+    def affected(self, keys):
+        # forged blocks only change by confirmation count until final
+        return getattr(self, "confirmations", 0) < getattr(
+            dposlib.rest.cfg, "activeDelegates", 51
+        )
+
 
 class Webhook(Content):
     """
@@ -38,7 +38,10 @@ blockchain|builders
 
 import sys
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from dposlib import rest, cfg
+from dposlib.util import scoreboard
 from . import v2, v3
 
 CACHE = {}
@@ -58,7 +61,71 @@ def _getbldr(name):
         return func
 
 
+def _broadcastChunk(chunk, peers, quorum):
+    # post chunk to peers concurrently and merge reports per transaction id
+    report = {
+        "data": {"accept": [], "broadcast": [], "excess": [], "invalid": []},
+        "errors": {},
+        "peers": {}
+    }
+    accepted = dict((tx["id"], 0) for tx in chunk)
+    executor = ThreadPoolExecutor(len(peers))
+    futures = dict(
+        (executor.submit(
+            rest.POST.api.transactions, peer=peer, transactions=chunk
+        ), peer) for peer in peers
+    )
+    for future in as_completed(futures):
+        response = future.result()
+        data = response.get("data", None) if isinstance(response, dict) \
+            else None
+        if not isinstance(data, dict):
+            report["peers"][futures[future]] = response
+            continue
+        report["peers"][futures[future]] = len(data.get("accept", []))
+        for key, ids in report["data"].items():
+            ids.extend(i for i in data.get(key, []) if i not in ids)
+        for txid in data.get("accept", []):
+            accepted[txid] = accepted.get(txid, 0) + 1
+        report["errors"].update(response.get("errors", {}))
+        if min(accepted.values()) >= quorum:
+            break
+    executor.shutdown(wait=False)
+    # a transaction accepted by a peer is neither invalid nor in excess
+    for key in ["excess", "invalid"]:
+        report["data"][key] = [
+            i for i in report["data"][key] if not accepted.get(i, 0)
+        ]
+    report["errors"] = dict(
+        (i, e) for i, e in report["errors"].items() if not accepted.get(i, 0)
+    )
+    report["quorum"] = min(accepted.values()) >= quorum
+    return report
+
+
 def broadcastTransactions(*transactions, **params):
+    """
+    Post transactions by chunks of `cfg.maxTransactions` at most.
+
+    If `peers` is given, each chunk is posted concurrently to the `peers`
+    best scored peers of `cfg.peers` and their reports are merged per
+    transaction id. Next chunk is posted as soon as every transaction of the
+    current one is accepted by `quorum` peers. Merged report also provides
+    the number of transactions accepted by each peer and if quorum was
+    reached. Within a `rest.usePeer` block, chunks are posted to the bound
+    peer only.
+
+    ```python
+    >>> broadcastTransactions(*txs, peers=cfg.broadcast, quorum=2)
+    ```
+
+    Args:
+        *transactions (dposlib.ark.tx.Transaction): transactions to post.
+        **params: `chunk_size`, `peers` and `quorum` values.
+
+    Returns:
+        dict or list: report or list of reports if more than one chunk.
+    """
     if "sxp" in rest.cfg.network:
         # Solar-network renamed vendorField to memo since v3 transaction,
         # __setitem__ is used to keep signatures and id.
@@ -69,12 +136,20 @@ def broadcastTransactions(*transactions, **params):
         params.pop("chunk_size", cfg.maxTransactions), cfg.maxTransactions
     )
 
+    peers = params.pop("peers", 1)
+    peers = scoreboard.SCOREBOARD.rank(cfg.peers)[:peers] \
+        if peers > 1 and rest.PEER.get() is None else []
+    quorum = min(params.pop("quorum", 1), len(peers))
+
     report = []
     for chunk in [
         transactions[i:i+chunk_size] for i in
         range(0, len(transactions), chunk_size)
     ]:
-        report.append(rest.POST.api.transactions(transactions=chunk))
+        if len(peers) > 1:
+            report.append(_broadcastChunk(chunk, peers, quorum))
+        else:
+            report.append(rest.POST.api.transactions(transactions=chunk))
 
     return \
         None if len(report) == 0 else \
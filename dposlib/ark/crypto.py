@@ -1,14 +1,24 @@
 # -*- coding: utf-8 -*-
 
+import hmac
 import base58
 import hashlib
+import os
 from io import BytesIO
 from collections import UserDict
+from concurrent.futures import ProcessPoolExecutor
 
 import cSecp256k1 as secp256k1
 from dposlib import cfg
-from dposlib.ark.tx import serialize
+from dposlib.ark.tx import serialize, serializeUnsigned, POOL_THRESHOLD
 from dposlib.util.bin import hexlify, unhexlify, pack, pack_bytes, HEX, BHEX
+from dposlib.util.bin import b58encode, b58encode_check
+from dposlib.util.data import LRUCache
+
+# derivation caches, salt is generated on each run
+SALT = os.urandom(32)
+KEYS_CACHE = LRUCache(1024)
+ADDRESSES_CACHE = LRUCache(4096)
 
 
 def getKeys(secret):
@@ -34,9 +44,15 @@ def getKeys(secret):
         privateKey = secret.decode() if BHEX.match(secret) else \
             secp256k1.hash_sha256(secret).decode()
         seed = unhexlify(privateKey)
-    publicKey = secp256k1.PublicKey.from_seed(seed)
+    # public key is cached using a salted digest of the seed so no secret
+    # is kept in memory
+    digest = hmac.new(SALT, seed, hashlib.sha256).digest()
+    publicKey = KEYS_CACHE.get(digest)
+    if publicKey is None:
+        publicKey = secp256k1.PublicKey.from_seed(seed).encode().decode()
+        KEYS_CACHE.put(digest, publicKey)
     return {
-        "publicKey": publicKey.encode().decode(),
+        "publicKey": publicKey,
         "privateKey": privateKey,
         "wif": getWIF(seed)
     }
@@ -91,11 +107,71 @@ def getAddress(publicKey, marker=None):
     if marker and isinstance(marker, int):
         marker = hex(marker)[2:]
     else:
-        marker = None
-    ripemd160 = hashlib.new('ripemd160', unhexlify(publicKey)).digest()[:20]
-    seed = unhexlify(cfg.marker if not marker else marker) + ripemd160
-    b58 = base58.b58encode_check(seed)
-    return b58.decode('utf-8') if isinstance(b58, bytes) else b58
+        marker = cfg.marker
+    address = ADDRESSES_CACHE.get((publicKey, marker))
+    if address is None:
+        ripemd160 = \
+            hashlib.new('ripemd160', unhexlify(publicKey)).digest()[:20]
+        address = b58encode_check(unhexlify(marker) + ripemd160)
+        ADDRESSES_CACHE.put((publicKey, marker), address)
+    return address
+
+
+def getAddresses(publicKeys, marker=None):
+    """
+    Compute ARK addresses from a public key set. Network marker is decoded
+    once and hash objects are initialized once, it is the way to go for
+    large sets (voters list, wallet exports...). Derivation cache is not
+    used.
+
+    Args:
+        publicKeys (iterable): public keys as hex strings.
+        marker (int): network marker (optional).
+
+    Returns:
+        list: addresses in the given order.
+    """
+    prefix = unhexlify(
+        hex(marker)[2:] if marker and isinstance(marker, int) else cfg.marker
+    )
+    ripemd160 = hashlib.new("ripemd160")
+    sha256 = hashlib.sha256
+    addresses = []
+    for publicKey in publicKeys:
+        h = ripemd160.copy()
+        h.update(unhexlify(publicKey))
+        seed = prefix + h.digest()
+        addresses.append(
+            b58encode(seed + sha256(sha256(seed).digest()).digest()[:4])
+        )
+    return addresses
+
+
+def useKeyCache(keys=1024, addresses=4096):
+    """
+    Configure public key and address derivation caches. Public keys are
+    indexed by a salted digest of the private key so secrets never stay in
+    memory. Set both sizes to `0` to disable caching.
+
+    Args:
+        keys (int): maximum number of public keys cached.
+        addresses (int): maximum number of addresses cached.
+    """
+    KEYS_CACHE.resize(keys)
+    ADDRESSES_CACHE.resize(addresses)
+
+
+def getKeyCacheStats():
+    """
+    Get hit and miss statistics of derivation caches.
+
+    Returns:
+        dict: `keys` and `addresses` cache statistics.
+    """
+    return {
+        "keys": KEYS_CACHE.stats(),
+        "addresses": ADDRESSES_CACHE.stats()
+    }
 
 
 def getWIF(seed):
@@ -217,29 +293,59 @@ def verifySignatureFromBytes(data, publicKey, signature):
     Returns:
         bool: True if signature matches the public key.
     """
+    return _verify(getScheme(signature), data, publicKey, signature)
+
+
+def getScheme(signature):
+    """
+    Get signature scheme. Raw signatures are Schnorr ones, verified with
+    `bip340` or `bcrypto410` specifications according to network, others are
+    DER-encoded ECDSA signatures.
+
+    Args:
+        signature (str): signature as hex string.
+
+    Returns:
+        str: `"ecdsa"`, `"bcrypto410"` or `"bip340"`.
+    """
+    if len(signature) == 128:
+        return "bip340" if getattr(cfg, "bip340", False) else "bcrypto410"
+    return "ecdsa"
+
+
+def _verify(scheme, data, publicKey, signature):
     puk = secp256k1.PublicKey.decode(publicKey)
     msg = secp256k1.hash_sha256(data)
-    if len(signature) == 128:
-        hS = secp256k1.HexSig.from_raw(
-            signature if isinstance(signature, bytes) else
-            signature.encode()
-        )
-        if not cfg.bip340:
-            return bool(
-                secp256k1._schnorr.bcrypto410_verify(
-                    msg, puk.x, puk.y, hS.r, hS.s
-                )
+    signature = \
+        signature if isinstance(signature, bytes) else signature.encode()
+    if scheme == "bcrypto410":
+        hS = secp256k1.HexSig.from_raw(signature)
+        return bool(
+            secp256k1._schnorr.bcrypto410_verify(
+                msg, puk.x, puk.y, hS.r, hS.s
             )
-        else:
-            return bool(secp256k1._schnorr.verify(msg, puk.x, hS.r, hS.s))
-    else:
-        hS = secp256k1.HexSig.from_der(
-            signature if isinstance(signature, bytes) else
-            signature.encode()
         )
+    elif scheme == "bip340":
+        hS = secp256k1.HexSig.from_raw(signature)
+        return bool(secp256k1._schnorr.verify(msg, puk.x, hS.r, hS.s))
+    else:
+        hS = secp256k1.HexSig.from_der(signature)
         return bool(secp256k1._ecdsa.verify(msg, puk.x, puk.y, hS.r, hS.s))
 
 
+def _verifyGroup(job):
+    # process pool entry point, all checks share the same scheme so no
+    # network configuration is needed in workers
+    scheme, checks = job
+    result = []
+    for data, publicKey, signature in checks:
+        try:
+            result.append(_verify(scheme, data, publicKey, signature))
+        except Exception:
+            result.append(False)
+    return result
+
+
 def getId(tx):
     """
     Generate transaction id.
@@ -410,3 +516,150 @@ def checkTransaction(tx, secondPublicKey=None, multiPublicKeys=[]):
             ))
 
     return False not in checks
+
+
+def _getChecks(tx, secondPublicKey=None, multiPublicKeys=[]):
+    # serialize transaction once and return id check result with the
+    # signature checks to run as (data, publicKey, signature) triplets
+    version = tx.get("version", 0x01)
+    publicKey = tx["senderPublicKey"]
+    signature = tx.get("signature", "")
+    signSignature = tx.get("signSignature", tx.get("secondSignature", ""))
+    signatures = tx.get("signatures", [])
+
+    if tx["type"] == 4 and tx.get("typeGroup", 1) == 1:
+        multiPublicKeys = tx["asset"]["multiSignature"]["publicKeys"]
+
+    # signed data are the unsigned serial followed by signature segments in
+    # the order they were issued: multisignature, signature and then second
+    # signature. Version 1 serial does not include multisignature.
+    if version >= 0x02:
+        unsigned = serializeUnsigned(tx)
+        multi = b"".join(unhexlify(sig) for sig in signatures)
+    else:
+        unsigned = getBytes(tx, exclude_sig=True, exclude_second_sig=True)
+        multi = b""
+    sig, signSig = unhexlify(signature), unhexlify(signSignature)
+
+    valid = True
+    if "id" in tx:
+        valid = getIdFromBytes(unsigned + sig + signSig + multi) == tx["id"]
+
+    checks = []
+    if len(multiPublicKeys) and len(signatures):
+        for value in signatures:
+            checks.append(
+                (unsigned, multiPublicKeys[int(value[0:2], 16)], value[2:])
+            )
+    if signature:
+        checks.append((unsigned + multi, publicKey, signature))
+        if signSignature and secondPublicKey:
+            checks.append(
+                (unsigned + sig + multi, secondPublicKey, signSignature)
+            )
+    return valid, checks
+
+
+def _typed(tx):
+    # API transactions give integer fields as strings, recipient address as
+    # `recipient` and timestamp as a dict, a typed copy is returned if needed
+    strings = [
+        key for key in ["amount", "fee", "nonce", "expiration"]
+        if isinstance(tx.get(key, None), str)
+    ]
+    asset = tx.get("asset", None) or {}
+    items = [
+        key for key in ["payments", "transfers"]
+        if any(isinstance(i.get("amount", 0), str) for i in asset.get(key, []))
+    ]
+    alias = "recipient" in tx and "recipientId" not in tx
+    timestamp = isinstance(tx.get("timestamp", None), dict)
+    if not (strings or items or alias or timestamp):
+        return tx
+    typed = dict(tx, **dict((key, int(tx[key])) for key in strings))
+    if items:
+        typed["asset"] = dict(asset, **dict(
+            (key, [dict(i, amount=int(i["amount"])) for i in asset[key]])
+            for key in items
+        ))
+    if alias:
+        typed["recipientId"] = tx["recipient"]
+    if timestamp:
+        typed["timestamp"] = tx["timestamp"]["epoch"]
+    return typed
+
+
+def checkTransactions(transactions, secondPublicKeys={}, multiPublicKeys={},
+                      processes=None, chunksize=None):
+    """
+    Verify validity of a transaction batch, ie a block or a pool snapshot.
+    Each transaction is serialized once, signature checks are grouped by
+    scheme (ECDSA, bcrypto410 Schnorr, BIP340) and run across a process pool.
+    Transactions can be given as returned by API, integer fields given as
+    strings are converted.
+
+    ```python
+    >>> txs = rest.GET.api.blocks(height, "transactions").get("data", [])
+    >>> crypto.checkTransactions(txs)
+    bytearray(b'\x01\x01\x01')
+    ```
+
+    Args:
+        transactions (iterable): transaction objects or API transactions.
+        secondPublicKeys (dict): second public key to use, indexed by sender
+            public key.
+        multiPublicKeys (dict): owners public keys (sorted according to
+            associated type-4-tx asset), indexed by sender public key.
+        processes (int): number of worker processes. Default to cpu count,
+            or `1` for less than `dposlib.ark.tx.POOL_THRESHOLD` signatures.
+            `1` verifies in the current process.
+        chunksize (int): number of signatures sent to a worker at once.
+
+    Returns:
+        bytearray: verdicts in the given order, `1` if transaction is valid
+            else `0`.
+    """
+    transactions = list(transactions)
+    verdicts = bytearray(len(transactions))
+    groups = {}
+
+    for index, tx in enumerate(transactions):
+        publicKey = tx.get("senderPublicKey", None)
+        try:
+            valid, checks = _getChecks(
+                _typed(tx), secondPublicKeys.get(publicKey, None),
+                multiPublicKeys.get(publicKey, [])
+            )
+        except Exception:
+            valid, checks = False, []
+        verdicts[index] = valid
+        for check in checks:
+            group = groups.setdefault(getScheme(check[-1]), ([], []))
+            group[0].append(index)
+            group[1].append(check)
+
+    total = sum(len(indexes) for indexes, checks in groups.values())
+    if processes is None and total < POOL_THRESHOLD:
+        processes = 1
+    processes = processes or os.cpu_count() or 1
+    chunksize = chunksize or max(1, total // (processes * 4))
+    jobs, owners = [], []
+    for scheme, (indexes, checks) in groups.items():
+        for i in range(0, len(checks), chunksize):
+            jobs.append((scheme, checks[i:i + chunksize]))
+            owners.append(indexes[i:i + chunksize])
+
+    if processes > 1 and len(jobs) > 1:
+        executor = ProcessPoolExecutor(processes)
+        try:
+            results = list(executor.map(_verifyGroup, jobs))
+        finally:
+            executor.shutdown()
+    else:
+        results = [_verifyGroup(job) for job in jobs]
+
+    for indexes, result in zip(owners, results):
+        for index, valid in zip(indexes, result):
+            if not valid:
+                verdicts[index] = 0
+    return verdicts
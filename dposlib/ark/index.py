@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local block and transaction index stored in a sqlite database. Blocks are
+fetched in parallel by height ranges until the index reaches the chain head,
+then the index can follow the chain. Forks are detected on block links and
+resolved by rolling back the index to the last common block.
+
+```python
+>>> from dposlib import rest
+>>> from dposlib.ark.index import Index
+>>> rest.use("ark")
+True
+>>> index = Index("~/.dposlib/ark.index", workers=8)
+>>> index.sync()  # catch up with chain head
+>>> event = index.follow()  # index new blocks as they are forged
+>>> index.transactions(recipient="AUahWfkfr5J4tYakugRbfow7RWVTK35GPW")
+[...]
+>>> index.votes(delegate="arky")
+[...]
+```
+"""
+
+import os
+import json
+import sqlite3
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from dposlib import rest
+from dposlib.ark.mixin import loadPages
+from dposlib.util.asynch import setInterval
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS blocks ("
+    "height INTEGER PRIMARY KEY, id TEXT, previous TEXT, generator TEXT, "
+    "timestamp INTEGER, transactions INTEGER)",
+    "CREATE TABLE IF NOT EXISTS transactions ("
+    "id TEXT PRIMARY KEY, height INTEGER, type INTEGER, typeGroup INTEGER, "
+    "sender TEXT, senderPublicKey TEXT, recipient TEXT, amount INTEGER, "
+    "fee INTEGER, vendorField TEXT, timestamp INTEGER, data TEXT)",
+    "CREATE TABLE IF NOT EXISTS recipients ("
+    "txid TEXT, height INTEGER, address TEXT, amount INTEGER)",
+    "CREATE TABLE IF NOT EXISTS votes ("
+    "txid TEXT, height INTEGER, voter TEXT, delegate TEXT, vote INTEGER)",
+    "CREATE INDEX IF NOT EXISTS tx_height ON transactions(height)",
+    "CREATE INDEX IF NOT EXISTS tx_sender ON transactions(sender)",
+    "CREATE INDEX IF NOT EXISTS tx_recipient ON transactions(recipient)",
+    "CREATE INDEX IF NOT EXISTS tx_type ON transactions(typeGroup, type)",
+    "CREATE INDEX IF NOT EXISTS tx_vendor ON transactions(vendorField)",
+    "CREATE INDEX IF NOT EXISTS rcp_address ON recipients(address)",
+    "CREATE INDEX IF NOT EXISTS rcp_height ON recipients(height)",
+    "CREATE INDEX IF NOT EXISTS vote_delegate ON votes(delegate)",
+    "CREATE INDEX IF NOT EXISTS vote_voter ON votes(voter)",
+    "CREATE INDEX IF NOT EXISTS vote_height ON votes(height)",
+]
+
+
+def _epoch(value):
+    return value.get("epoch", None) if isinstance(value, dict) else value
+
+
+def _recipients(tx):
+    # addresses credited by a transaction with credited amount, multipayment
+    # and solar-network transfers included
+    asset = tx.get("asset", None) or {}
+    result = [
+        (p.get("recipientId", None), int(p.get("amount", 0)))
+        for p in asset.get("payments", []) + asset.get("transfers", [])
+    ]
+    recipient = tx.get("recipient", tx.get("recipientId", None))
+    if recipient is not None:
+        result.append((recipient, int(tx.get("amount", 0))))
+    return [(a, v) for a, v in result if a is not None]
+
+
+def _votes(tx):
+    # delegates voted (+1) or unvoted (-1) by a transaction
+    votes = (tx.get("asset", None) or {}).get("votes", [])
+    if isinstance(votes, dict):
+        # solar-network vote dictionary {username: percent}
+        return [(k, 1) for k in votes]
+    return [(v[1:], 1 if v[0] == "+" else -1) for v in votes if len(v) > 1]
+
+
+class Index(object):
+    """
+    Blocks and transactions indexed by height, sender, recipient, type and
+    vendor field.
+
+    Args:
+        path (str): database file path.
+        workers (int): number of parallel fetches while catching up.
+        batch (int): number of blocks fetched by a worker at once.
+        depth (int): maximum number of blocks rolled back on fork.
+    """
+
+    def __init__(self, path, workers=4, batch=50, depth=102):
+        path = os.path.expanduser(path)
+        if os.path.dirname(path) and not os.path.exists(
+            os.path.dirname(path)
+        ):
+            os.makedirs(os.path.dirname(path))
+        self.path = path
+        self.workers = workers
+        self.batch = batch
+        self.depth = depth
+        self.event = None
+        self._lock = threading.RLock()
+        self._sync = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        for sql in SCHEMA:
+            self._db.execute(sql)
+        self._db.commit()
+
+    def height(self):
+        """
+        Get last indexed height.
+
+        Returns:
+            int: block height, 0 if index is empty.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT COALESCE(MAX(height), 0) FROM blocks"
+            ).fetchone()[0]
+
+    def blockId(self, height):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM blocks WHERE height=?", (height, )
+            ).fetchone()
+        return None if row is None else row[0]
+
+    @staticmethod
+    def fetch(height):
+        """
+        Get block and its transactions from blockchain.
+
+        Args:
+            height (int): block height.
+
+        Returns:
+            tuple: block and transaction list, `None` if block not found.
+        """
+        block = rest.GET.api.blocks("%d" % height).get("data", None)
+        if not isinstance(block, dict) or "id" not in block:
+            return None
+        transactions = loadPages(
+            rest.GET.api.blocks.__getattr__(block["id"]).transactions
+        ) if block.get("transactions", 0) else []
+        if len(transactions) != block.get("transactions", 0):
+            return None
+        return block, transactions
+
+    def _fetchRange(self, first, last):
+        blocks = []
+        for height in range(first, last + 1):
+            result = self.fetch(height)
+            if result is None:
+                break
+            blocks.append(result)
+        return blocks
+
+    def _write(self, block, transactions):
+        height = block["height"]
+        self._db.execute(
+            "INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?, ?)", (
+                height, block["id"], block.get("previous", None),
+                block.get("generator", {}).get("address", None),
+                _epoch(block.get("timestamp", None)), len(transactions)
+            )
+        )
+        for tx in transactions:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transactions VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+                    tx["id"], height, tx.get("type", 0),
+                    tx.get("typeGroup", 1),
+                    tx.get("sender", tx.get("senderId", None)),
+                    tx.get("senderPublicKey", None),
+                    tx.get("recipient", tx.get("recipientId", None)),
+                    int(tx.get("amount", 0)), int(tx.get("fee", 0)),
+                    tx.get("vendorField", tx.get("memo", None)),
+                    _epoch(tx.get("timestamp", None)), json.dumps(tx)
+                )
+            )
+            self._db.executemany(
+                "INSERT INTO recipients VALUES (?, ?, ?, ?)",
+                [(tx["id"], height, a, v) for a, v in _recipients(tx)]
+            )
+            self._db.executemany(
+                "INSERT INTO votes VALUES (?, ?, ?, ?, ?)", [
+                    (tx["id"], height, tx.get("sender", None), d, v)
+                    for d, v in _votes(tx)
+                ]
+            )
+
+    def rollback(self, height):
+        """
+        Remove blocks and transactions above a given height.
+
+        Args:
+            height (int): last height kept.
+        """
+        with self._lock:
+            for table in ["blocks", "transactions", "recipients", "votes"]:
+                self._db.execute(
+                    "DELETE FROM %s WHERE height>?" % table, (height, )
+                )
+            self._db.commit()
+
+    def _resolveFork(self):
+        # roll back until indexed block matches blockchain one, a failed
+        # request is not a fork so nothing is rolled back
+        height = self.height()
+        floor = max(0, height - self.depth)
+        while height > floor:
+            block = rest.GET.api.blocks("%d" % height).get("data", None)
+            if not isinstance(block, dict) or "id" not in block:
+                raise Exception("block %d not available" % height)
+            if block["id"] == self.blockId(height):
+                break
+            height -= 1
+        self.rollback(height)
+        return height
+
+    def sync(self, target=None):
+        """
+        Index blocks up to `target` height, fetching ranges in parallel.
+        Fork is resolved first if last indexed block is no more in chain.
+        An exception is raised and index is left unchanged if chain height
+        or last indexed block can not be fetched.
+
+        Args:
+            target (int): last height to index, default to chain height.
+
+        Returns:
+            int: number of blocks indexed.
+        """
+        with self._sync:
+            if target is None:
+                target = rest.GET.api.blockchain().get(
+                    "data", {}
+                ).get("block", {}).get("height", None)
+                if target is None:
+                    raise Exception("blockchain height not available")
+            start = self._resolveFork() + 1
+            ranges = [
+                (first, min(first + self.batch - 1, target))
+                for first in range(start, target + 1, self.batch)
+            ]
+            count = 0
+            executor = ThreadPoolExecutor(self.workers)
+            try:
+                # bounded window of ranges, written in height order
+                for i in range(0, len(ranges), 2 * self.workers):
+                    window = ranges[i:i + 2 * self.workers]
+                    for (first, last), blocks in zip(window, executor.map(
+                        lambda r: self._fetchRange(*r), window
+                    )):
+                        previous = self.blockId(first - 1)
+                        with self._lock:
+                            for block, transactions in blocks:
+                                # link broken, fork occured while syncing
+                                if previous is not None and \
+                                   block.get("previous", None) != previous:
+                                    self._db.commit()
+                                    return count
+                                self._write(block, transactions)
+                                previous = block["id"]
+                                count += 1
+                            self._db.commit()
+                        # missing blocks, stop to keep index contiguous
+                        if len(blocks) < last - first + 1:
+                            return count
+            finally:
+                executor.shutdown(wait=False)
+            return count
+
+    def follow(self, interval=None):
+        """
+        Synchronize index periodically.
+
+        Args:
+            interval (float): period in seconds, default to block time.
+
+        Returns:
+            threading.Event: event to set to stop following.
+        """
+        if self.event is None:
+            self.event = setInterval(
+                interval or getattr(rest.cfg, "blocktime", 8)
+            )(self._follow)()
+        return self.event
+
+    def _follow(self):
+        try:
+            self.sync()
+        except Exception:
+            pass
+
+    def stop(self):
+        if self.event is not None:
+            self.event.set()
+            self.event = None
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._db.close()
+
+    def transactions(self, sender=None, recipient=None, type=None,
+                     typeGroup=None, vendorField=None, since=None, until=None,
+                     limit=None, desc=False):
+        """
+        Search indexed transactions. Recipient matches transfer, multipayment
+        and lock recipients. Vendor field is matched with SQL `LIKE` so `%`
+        and `_` wildcards can be used.
+
+        Args:
+            sender (str): sender address.
+            recipient (str): recipient address.
+            type (int): transaction type.
+            typeGroup (int): transaction type group.
+            vendorField (str): vendor field pattern.
+            since (int): first height.
+            until (int): last height.
+            limit (int): maximum number of transactions.
+            desc (bool): sort by descending height if True.
+
+        Returns:
+            list: transactions with their block height.
+        """
+        where, values = [], []
+        for sql, value in [
+            ("sender=?", sender),
+            ("id IN (SELECT txid FROM recipients WHERE address=?)",
+             recipient),
+            ("type=?", type),
+            ("typeGroup=?", typeGroup),
+            ("vendorField LIKE ?", vendorField),
+            ("height>=?", since),
+            ("height<=?", until)
+        ]:
+            if value is not None:
+                where.append(sql)
+                values.append(value)
+        # rowid keeps block order for transactions at same height
+        sql = "SELECT height, data FROM transactions%s " \
+            "ORDER BY height %s, rowid %s" % (
+                (" WHERE " + " AND ".join(where)) if len(where) else "",
+                "DESC" if desc else "ASC", "DESC" if desc else "ASC"
+            )
+        if limit:
+            sql += " LIMIT %d" % int(limit)
+        with self._lock:
+            rows = self._db.execute(sql, values).fetchall()
+        return [dict(json.loads(data), height=height) for height, data in rows]
+
+    def votes(self, delegate=None, voter=None, since=None, until=None):
+        """
+        Search indexed votes. Delegate is identified as it appears in vote
+        transactions, public key or username according to network.
+
+        Args:
+            delegate (str): voted delegate.
+            voter (str): voter address.
+            since (int): first height.
+            until (int): last height.
+
+        Returns:
+            list: votes as dictionaries with `id`, `height`, `voter`,
+                `delegate` and `vote` (+1 or -1) fields.
+        """
+        where, values = [], []
+        for sql, value in [
+            ("delegate=?", delegate), ("voter=?", voter),
+            ("height>=?", since), ("height<=?", until)
+        ]:
+            if value is not None:
+                where.append(sql)
+                values.append(value)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT txid, height, voter, delegate, vote FROM votes%s "
+                "ORDER BY height, rowid" % (
+                    (" WHERE " + " AND ".join(where)) if len(where) else ""
+                ), values
+            ).fetchall()
+        return [
+            dict(zip(["id", "height", "voter", "delegate", "vote"], row))
+            for row in rows
+        ]
@@ -1,66 +1,328 @@
 # -*- coding: utf-8 -*-
 
+import json
+import time
+import contextvars
+
 from datetime import datetime, timezone
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
+from usrv import req
 from dposlib import rest
 from dposlib.ark import slots
 
 
+#: maximum delay in seconds between two unsuccessful requests
+BACKOFF_MAX = 16.
+
+
+class Cursor(object):
+    """
+    Serializable pagination state. It is enough to resume an interrupted
+    scan from the last page consumed.
+
+    ```python
+    >>> cursor = Cursor.loads(open("export.cursor").read())
+    >>> for record in streamPages(cursor.endpoint(), cursor=cursor):
+    ...     pass
+    ```
+
+    Args:
+        path (list): endpoint path elements.
+        params (dict): query parameters.
+        page (int): last page consumed.
+        last (str): id of the last record seen.
+        count (int): number of records seen.
+    """
+
+    def __init__(self, path, params={}, page=0, last=None, count=0):
+        self.path = list(path)
+        self.params = dict(params)
+        self.page = page
+        self.last = last
+        self.count = count
+
+    @staticmethod
+    def fromEndpoint(endpoint, **params):
+        return Cursor(endpoint.chain()[1:], params)
+
+    def endpoint(self):
+        """
+        Rebuild GET endpoint.
+
+        Returns:
+            usrv.req.EndPoint: paginated endpoint.
+        """
+        endpoint = rest.GET
+        for elem in self.path:
+            endpoint = req.EndPoint(elem, endpoint, endpoint.method)
+        return endpoint
+
+    def dumps(self):
+        return json.dumps(self.__dict__)
+
+    @staticmethod
+    def loads(data):
+        return Cursor(**json.loads(data))
+
+    def __repr__(self):
+        return "<cursor /%s page=%d count=%d>" % (
+            "/".join(self.path), self.page, self.count
+        )
+
+
+class PaginationError(Exception):
+    """
+    Raised when a page can not be fetched within allowed tries. It carries
+    the cursor to resume from and how much data is missing.
+
+    Attributes:
+        cursor (dposlib.ark.mixin.Cursor): pagination state.
+        missing_pages (int): number of pages not fetched.
+        missing_records (int): number of records not fetched.
+        error (dict): last unsuccessful response.
+    """
+
+    def __init__(self, cursor, missing_pages=None, missing_records=None,
+                 error=None):
+        self.cursor = cursor
+        self.missing_pages = missing_pages
+        self.missing_records = missing_records
+        self.error = error
+        Exception.__init__(
+            self, "page %d of /%s failed: %s pages and %s records missing "
+            "(%s)" % (
+                cursor.page + 1, "/".join(cursor.path),
+                "?" if missing_pages is None else missing_pages,
+                "?" if missing_records is None else missing_records,
+                (error or {}).get("error", "unknown error")
+            )
+        )
+
+
 class DataIterator:
+    """
+    Iterate over endpoint pages. If `prefetch` is set, up to `prefetch` next
+    pages are requested in parallel as soon as page count is known from the
+    first response, pages are still returned in order. Transport errors,
+    server errors and throttled requests are retried after an exponential
+    backoff and [`PaginationError`](
+        mixin.md#dposlib.ark.mixin.PaginationError
+    ) is raised once `tries` is exceeded. It is raised at once on other
+    client errors such as `404`.
 
-    def __init__(self, endpoint, tries=10):
+    Args:
+        endpoint (usrv.req.EndPoint): paginated endpoint.
+        tries (int): maximum number of unsuccessful requests.
+        prefetch (int): number of pages requested ahead.
+        pages (int): last page to request.
+        params (dict): query parameters.
+        page (int): last page already consumed.
+        backoff (float): delay in seconds after first unsuccessful request.
+    """
+
+    def __init__(self, endpoint, tries=10, prefetch=0, pages=None,
+                 params={}, page=0, backoff=0.25):
         if not isinstance(endpoint, rest.GET.__class__):
             raise Exception("Invalid endpoint class")
         self.endpoint = endpoint
+        self.params = dict(params)
         self.data = {}
-        self.page = 0
+        self.error = None
+        self.page = page
+        self.count = 0
+        self.last = None
         self.errors = 0
         self.tries = tries
+        self.prefetch = prefetch
+        self.pages = pages
+        self.backoff = backoff
+        self._failures = 0
+        self._futures = {}
+        self._executor = None
+
+    @property
+    def cursor(self):
+        return Cursor(
+            self.endpoint.chain()[1:], self.params, self.page, self.last,
+            self.count
+        )
+
+    def _pageCount(self):
+        # page count from meta data, computed from total count if needed
+        meta = self.data.get("meta", {})
+        if meta.get("pageCount", None):
+            count = meta["pageCount"]
+        elif meta.get("totalCount", None) and len(self.data.get("data", [])):
+            count = -(-meta["totalCount"] // len(self.data["data"]))
+        else:
+            return None
+        return min(count, self.pages) if self.pages else count
+
+    def _schedule(self):
+        # request next pages ahead without exceeding page count
+        count = self._pageCount()
+        if count is None:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.prefetch)
+        for page in range(self.page + 1, self.page + self.prefetch + 1):
+            if page > count:
+                break
+            if page not in self._futures:
+                # pages are requested within caller context, so a peer
+                # bound with rest.usePeer is kept
+                self._futures[page] = self._executor.submit(
+                    contextvars.copy_context().run, self.endpoint,
+                    page=page, **self.params
+                )
+
+    def _fetch(self, page):
+        future = self._futures.pop(page, None)
+        return self.endpoint(page=page, **self.params) if future is None \
+            else future.result()
+
+    def _missing(self):
+        # missing pages and records according to last meta data
+        count = self._pageCount()
+        total = self.data.get("meta", {}).get("totalCount", None)
+        return (
+            None if count is None else max(0, count - self.page),
+            None if total is None else max(0, total - self.count)
+        )
+
+    def close(self):
+        """Cancel pages requested ahead."""
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
 
     def __next__(self):
-        if not self.data.get("meta", {}).get("next", None) and self.page:
+        if not self.data.get("meta", {}).get("next", None) and self.data:
+            self.close()
             raise StopIteration("End of data reached")
-        else:
-            self.data = self.endpoint(page=self.page+1)
-            if self.data.get("error", False):
-                self.errors += 1
-            else:
-                self.page += 1
-        return self.data.get("data", [])
+        data = self._fetch(self.page+1)
+        if data.get("error", False) or "data" not in data:
+            # last successful page is kept so end of data is not assumed
+            self.error = data
+            self.errors += 1
+            self._failures += 1
+            # client error other than throttling will not be fixed by retry
+            status = data.get("status", 0)
+            if self.errors > self.tries or 400 <= status < 500 and \
+               status != 429:
+                self.close()
+                raise PaginationError(self.cursor, *self._missing(), data)
+            time.sleep(
+                min(BACKOFF_MAX, self.backoff * 2 ** (self._failures - 1))
+            )
+            return []
+        self.data = data
+        self._failures = 0
+        self.page += 1
+        self.count += len(data["data"])
+        if len(data["data"]):
+            self.last = data["data"][-1].get("id", self.last)
+        if self.prefetch:
+            self._schedule()
+        return data["data"]
     next = __next__
 
     def __iter__(self):
         while True:
             try:
                 yield next(self)
-            except Exception:
+            except StopIteration:
                 break
-            else:
-                if self.errors > self.tries:
-                    raise Exception("Too much unsuccesfull tries")
 
 
-def loadPages(endpoint, pages=False, nb_tries=10, limit=False, **kw):
-    data_iterator = DataIterator(endpoint, nb_tries)
-    data = []
-    while True:
-        try:
-            if limit and len(data) > limit:
+def streamPages(endpoint, pages=False, nb_tries=10, limit=False, prefetch=0,
+                checkpoint=None, cursor=None, **kw):
+    """
+    Generator variant of `loadPages` yielding records one at a time. Next
+    page is requested only when current one is consumed, so memory use stays
+    flat whatever the dataset size: at most `prefetch` pages are kept ahead.
+
+    Scan state is given to `checkpoint` as a
+    [`Cursor`](mixin.md#dposlib.ark.mixin.Cursor) after each page so a
+    crashed job can resume from it. Records of the resumed page already seen
+    because of data shifting are skipped.
+
+    ```python
+    >>> save = lambda cursor: open("export.cursor", "w").write(
+    ...     cursor.dumps()
+    ... )
+    >>> with io.open("voters.jsonl", "w") as out:
+    ...     for record in streamPages(
+    ...         rest.GET.api.delegates.arky.voters, prefetch=4,
+    ...         checkpoint=save
+    ...     ):
+    ...         out.write(json.dumps(record) + "\n")
+    ```
+
+    Args:
+        endpoint (usrv.req.EndPoint): paginated endpoint.
+        pages (int): maximum number of pages to load.
+        nb_tries (int): maximum number of unsuccessful requests.
+        limit (int): maximum number of records to yield.
+        prefetch (int): number of pages requested ahead.
+        checkpoint (callable): called with scan cursor each time a page is
+            fully consumed.
+        cursor (dposlib.ark.mixin.Cursor): cursor to resume from.
+        **kw: query parameters.
+
+    Yields:
+        dict: record.
+
+    Raises:
+        dposlib.ark.mixin.PaginationError: if `nb_tries` is exceeded.
+    """
+    if cursor is not None:
+        kw = dict(cursor.params, **kw)
+    data_iterator = DataIterator(
+        endpoint, nb_tries, prefetch, pages or None, kw,
+        0 if cursor is None else cursor.page
+    )
+    count = 0 if cursor is None else cursor.count
+    data_iterator.count, data_iterator.last = count, getattr(
+        cursor, "last", None
+    )
+    skip = data_iterator.last
+    try:
+        while True:
+            page = data_iterator.page
+            try:
+                _data = next(data_iterator)
+            except StopIteration:
                 break
-            _data = next(data_iterator)
-        except StopIteration:
-            break
-        else:
-            if not pages or data_iterator.page <= pages:
-                data.extend(_data)
-            else:
+            if pages and data_iterator.page > pages:
                 break
+            if skip is not None and data_iterator.page > page:
+                ids = [record.get("id", None) for record in _data]
+                if skip in ids:
+                    _data = _data[ids.index(skip) + 1:]
+                    data_iterator.count -= len(ids) - len(_data)
+                skip = None
+            for record in _data:
+                if limit and count >= limit:
+                    return
+                yield record
+                count += 1
+            if checkpoint is not None and data_iterator.page > page:
+                checkpoint(data_iterator.cursor)
+    finally:
+        data_iterator.close()
 
-    if limit:
-        return data[:limit]
-    else:
-        return data
+
+def loadPages(endpoint, pages=False, nb_tries=10, limit=False, prefetch=0,
+              **kw):
+    return list(
+        streamPages(endpoint, pages, nb_tries, limit, prefetch, **kw)
+    )
 
 
 def deltas():
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reward sharing computation. Forged block rewards are shared among voters in
+proportion of their vote weight at block height. Computation uses exact
+integer arithmetic in arktoshi: each share is rounded down and remaining
+arktoshis go to the largest remainders, so shares always sum to the shared
+amount.
+
+Blocks weighted by the same voter snapshot are grouped first, so cost
+depends on snapshot and voter counts, not on forged block count.
+
+```python
+>>> from dposlib.ark import payout
+>>> from dposlib.ark.replay import Ledger
+>>> ledger = Ledger()
+>>> states = ledger.replay(index.transactions(), heights=[1000, 2000])
+>>> snapshots = dict((h, s.voters("arky")) for h, s in states.items())
+>>> shares = payout.computeShares(snapshots, blocks, ratio=0.9)
+>>> txs = payout.payments(shares, vendorField="arky reward")
+>>> [tx.finalize(secret) for tx in txs]
+>>> dposlib.core.broadcastTransactions(*txs)
+```
+"""
+
+import heapq
+import bisect
+import dposlib
+
+from decimal import Decimal
+from fractions import Fraction
+
+from dposlib import cfg
+
+
+def _forged(block):
+    # (height, amount) pair from an API block or from a pair
+    if isinstance(block, dict):
+        forged = block.get("forged", {})
+        amount = forged.get("total", None)
+        if amount is None:
+            amount = int(forged.get("reward", 0)) + int(forged.get("fee", 0))
+        return int(block["height"]), int(amount)
+    height, amount = block
+    return int(height), int(amount)
+
+
+def distribute(amount, weights):
+    """
+    Share an amount proportionally to weights using largest remainder
+    method.
+
+    Args:
+        amount (int): amount to share.
+        weights (list): integer weights.
+
+    Returns:
+        list: integer shares in the weights order, summing to `amount` if
+            total weight is positive.
+    """
+    total = sum(weights)
+    if total <= 0:
+        return [0] * len(weights)
+    products = [amount * weight for weight in weights]
+    shares = [product // total for product in products]
+    remainders = [product % total for product in products]
+    for i in heapq.nlargest(
+        amount - sum(shares), range(len(weights)), key=remainders.__getitem__
+    ):
+        shares[i] += 1
+    return shares
+
+
+def computeShares(snapshots, blocks, ratio=1., exclude=[], minimum=0):
+    """
+    Compute voter shares of forged blocks. A block is weighted with the last
+    snapshot taken at or before its height, blocks forged before the first
+    snapshot are weighted with the first one.
+
+    Args:
+        snapshots (dict): voter weights `{address: weight}` indexed by height,
+            as given by `dposlib.ark.replay.Snapshot.voters`.
+        blocks (iterable): API blocks or (height, amount) pairs, amounts in
+            arktoshi.
+        ratio (float): shared part of forged amounts.
+        exclude (list): addresses excluded from sharing.
+        minimum (int): minimum vote weight to get a share.
+
+    Returns:
+        dict: shares in arktoshi indexed by voter address.
+    """
+    if not len(snapshots):
+        return {}
+    heights = sorted(snapshots)
+    # forged amounts summed per snapshot
+    amounts = [0] * len(heights)
+    for block in blocks:
+        height, amount = _forged(block)
+        amounts[max(0, bisect.bisect_right(heights, height) - 1)] += amount
+    ratio = Fraction(ratio).limit_denominator(10000)
+    exclude = set(exclude)
+    addresses = sorted(set(
+        address for height in heights for address in snapshots[height]
+        if address not in exclude
+    ))
+    totals = [0] * len(addresses)
+    for height, amount in zip(heights, amounts):
+        if not amount:
+            continue
+        voters = snapshots[height]
+        weights = [voters.get(address, 0) for address in addresses]
+        weights = [w if w >= max(minimum, 1) else 0 for w in weights]
+        shares = distribute(
+            amount * ratio.numerator // ratio.denominator, weights
+        )
+        totals = [total + share for total, share in zip(totals, shares)]
+    return dict(
+        (address, total) for address, total in zip(addresses, totals)
+        if total > 0
+    )
+
+
+def payments(shares, vendorField=None, minimum=0, chunk_size=None):
+    """
+    Build payment transactions from shares. Recipients are sorted by
+    decreasing amount and paid by chunks of `cfg.multiPaymentLimit` using
+    multipayment or, on solar networks, multi-transfer builder. Multipayment
+    needs two recipients at least, so a single recipient chunk is paid with
+    a transfer.
+
+    Args:
+        shares (dict): amounts in arktoshi indexed by address.
+        vendorField (str): vendor field message.
+        minimum (int): minimum amount paid in arktoshi.
+        chunk_size (int): maximum recipients per transaction.
+
+    Returns:
+        list: orphan transactions.
+    """
+    multiTransfer = getattr(dposlib.core, "multiTransfer", None)
+    builder = multiTransfer or dposlib.core.multiPayment
+    chunk_size = min(
+        chunk_size or getattr(cfg, "multiPaymentLimit", 64),
+        getattr(cfg, "multiPaymentLimit", 64)
+    )
+    # decimal amounts are converted back to arktoshi without rounding error
+    pairs = [
+        (Decimal(amount).scaleb(-8), address)
+        for address, amount in sorted(
+            shares.items(), key=lambda e: (-e[1], e[0])
+        ) if amount > 0 and amount >= minimum
+    ]
+    return [
+        dposlib.core.transfer(*chunk[0], vendorField=vendorField)
+        if len(chunk) == 1 and multiTransfer is None else
+        builder(*chunk, vendorField=vendorField)
+        for chunk in [
+            pairs[i:i + chunk_size] for i in range(0, len(pairs), chunk_size)
+        ]
+    ]
@@ -0,0 +1,384 @@
+# -*- coding: utf-8 -*-
+
+"""
+Offline wallet state replay. Transactions are applied in chain order to an
+in-memory wallet table so balances, nonces and votes can be computed at any
+height without asking a node. Wallets are stored in compact arrays indexed by
+address slot, a mainnet sized wallet set needs a few tens of bytes per
+wallet.
+
+Transactions can come from the API or from a local
+[`Index`](index.md#dposlib.ark.index.Index). Block rewards and fees are not
+part of transactions, use `Ledger.credit` to apply them.
+
+```python
+>>> from dposlib import rest
+>>> from dposlib.ark.index import Index
+>>> from dposlib.ark.replay import Ledger
+>>> rest.use("ark")
+True
+>>> index = Index("~/.dposlib/ark.index")
+>>> ledger = Ledger()
+>>> snapshots = ledger.replay(index.transactions(), heights=[15000000])
+>>> snapshots[15000000].balance("AUahWfkfr5J4tYakugRbfow7RWVTK35GPW")
+1234567890
+>>> snapshots[15000000].weights()["arky"]
+123456789012345
+```
+"""
+
+import decimal
+
+from array import array
+
+from dposlib.ark import crypto
+
+
+#: transaction handlers by typeGroup and type
+HANDLERS = {
+    1: {
+        0: "_transfer",
+        3: "_vote",
+        6: "_multiPayment",
+        8: "_htlcLock",
+        9: "_htlcClaim",
+        10: "_htlcRefund",
+    },
+    2: {
+        # solar
+        0: "_burn",
+        2: "_vote",
+    },
+}
+
+
+def _int(value):
+    return int(value or 0)
+
+
+def _basisPoints(percent):
+    # vote percentage as an exact integer number of basis points
+    return int(decimal.Decimal(str(percent)) * 100)
+
+
+class Snapshot(object):
+    """
+    Frozen wallet state, amounts are given in arktoshi. `height` is the
+    state height and `burned` the total burned amount.
+    """
+
+    def __init__(self, height, addresses, delegates, balances, locked,
+                 nonces, votes, split, burned=0):
+        # address and delegate tables are append-only, so a snapshot shares
+        # them and only sees slots below its own array length
+        self.height = height
+        self.burned = burned
+        self._addresses = addresses
+        self._delegates = delegates
+        self._balances = balances
+        self._locked = locked
+        self._nonces = nonces
+        self._votes = votes
+        self._split = split
+
+    def __len__(self):
+        return len(self._balances)
+
+    def _find(self, address):
+        slot = self._addresses.get(address, None)
+        return None if slot is None or slot >= len(self._balances) else slot
+
+    def balance(self, address):
+        """
+        Get wallet balance.
+
+        Args:
+            address (str): wallet address.
+
+        Returns:
+            int: balance, HTLC locked amount excluded.
+        """
+        slot = self._find(address)
+        return 0 if slot is None else self._balances[slot]
+
+    def locked(self, address):
+        """
+        Get wallet HTLC locked amount.
+
+        Args:
+            address (str): wallet address.
+
+        Returns:
+            int: locked amount.
+        """
+        slot = self._find(address)
+        return 0 if slot is None else self._locked[slot]
+
+    def nonce(self, address):
+        """
+        Get wallet nonce.
+
+        Args:
+            address (str): wallet address.
+
+        Returns:
+            int: number of transactions sent.
+        """
+        slot = self._find(address)
+        return 0 if slot is None else self._nonces[slot]
+
+    def vote(self, address):
+        """
+        Get wallet vote.
+
+        Args:
+            address (str): wallet address.
+
+        Returns:
+            dict: voted delegates with vote percentage.
+        """
+        slot = self._find(address)
+        if slot is None:
+            return {}
+        if slot in self._split:
+            return dict(
+                (self._delegates[d], bp / 100) for d, bp in self._split[slot]
+            )
+        if self._votes[slot] < 0:
+            return {}
+        return {self._delegates[self._votes[slot]]: 100.}
+
+    def weights(self):
+        """
+        Compute vote weights of all voted delegates. Weight of a voter is its
+        balance plus its HTLC locked amount.
+
+        Returns:
+            dict: vote weight indexed by delegate.
+        """
+        weights = [0] * len(self._delegates)
+        for vote, balance, locked in zip(
+            self._votes, self._balances, self._locked
+        ):
+            if vote >= 0:
+                weights[vote] += balance + locked
+        for slot, split in self._split.items():
+            if slot < len(self._balances):
+                weight = self._balances[slot] + self._locked[slot]
+                for d, bp in split:
+                    weights[d] += weight * bp // 10000
+        return dict(
+            (delegate, weight) for delegate, weight in
+            zip(self._delegates, weights) if weight
+        )
+
+    def voters(self, delegate):
+        """
+        Compute vote weights of a delegate voters.
+
+        Args:
+            delegate (str): delegate as it appears in vote transactions.
+
+        Returns:
+            dict: vote weight indexed by voter address.
+        """
+        try:
+            index = self._delegates.index(delegate)
+        except ValueError:
+            return {}
+        slots = [
+            (slot, 10000) for slot, vote in enumerate(self._votes)
+            if vote == index
+        ] + [
+            (slot, bp) for slot, split in self._split.items()
+            for d, bp in split if d == index and slot < len(self._balances)
+        ]
+        if not len(slots):
+            return {}
+        addresses = dict((slot, None) for slot, bp in slots)
+        for address, slot in list(self._addresses.items()):
+            if slot in addresses:
+                addresses[slot] = address
+        return dict(
+            (
+                addresses[slot],
+                (self._balances[slot] + self._locked[slot]) * bp // 10000
+            ) for slot, bp in slots
+        )
+
+
+class Ledger(Snapshot):
+    """
+    Mutable wallet state built by applying transactions in chain order.
+    Transfer, multipayment, vote, HTLC and burn transactions move funds and
+    votes; fee and nonce are applied for all transaction types.
+    """
+
+    def __init__(self):
+        Snapshot.__init__(
+            self, 0, {}, [], array("q"), array("q"), array("q"), array("l"),
+            {}
+        )
+        self._delegate_slots = {}
+        self._locks = {}
+
+    def _slot(self, address):
+        slot = self._addresses.get(address, None)
+        if slot is None:
+            slot = self._addresses[address] = len(self._balances)
+            self._balances.append(0)
+            self._locked.append(0)
+            self._nonces.append(0)
+            self._votes.append(-1)
+        return slot
+
+    def _delegate(self, delegate):
+        index = self._delegate_slots.get(delegate, None)
+        if index is None:
+            index = self._delegate_slots[delegate] = len(self._delegates)
+            self._delegates.append(delegate)
+        return index
+
+    def credit(self, address, amount):
+        """
+        Credit a wallet, to apply block rewards and fees or genesis balances.
+
+        Args:
+            address (str): wallet address.
+            amount (int): amount in arktoshi, negative to debit.
+        """
+        self._balances[self._slot(address)] += amount
+
+    def apply(self, tx):
+        """
+        Apply a transaction.
+
+        Args:
+            tx (dict): transaction as returned by API, amounts in arktoshi.
+        """
+        sender = tx.get("sender", tx.get("senderId", None)) or \
+            crypto.getAddress(tx["senderPublicKey"])
+        slot = self._slot(sender)
+        self._balances[slot] -= _int(tx.get("fee", 0))
+        self._nonces[slot] += 1
+        handler = HANDLERS.get(
+            _int(tx.get("typeGroup", 1)), {}
+        ).get(_int(tx.get("type", 0)), None)
+        if handler is not None:
+            getattr(self, handler)(slot, tx, tx.get("asset", None) or {})
+        height = tx.get("height", tx.get("blockHeight", None))
+        if height is not None:
+            self.height = max(self.height, int(height))
+
+    def _transfer(self, slot, tx, asset):
+        amount = _int(tx.get("amount", 0))
+        self._balances[slot] -= amount
+        self._balances[
+            self._slot(tx.get("recipient", tx.get("recipientId", None)))
+        ] += amount
+
+    def _multiPayment(self, slot, tx, asset):
+        # solar-network transfers share multipayment layout
+        payments = asset.get("payments", []) + asset.get("transfers", [])
+        for payment in payments:
+            amount = _int(payment.get("amount", 0))
+            self._balances[slot] -= amount
+            self._balances[self._slot(payment["recipientId"])] += amount
+
+    def _vote(self, slot, tx, asset):
+        votes = asset.get("votes", [])
+        if isinstance(votes, dict):
+            # solar-network vote dictionary {username: percent} replaces
+            # current votes
+            self._split.pop(slot, None)
+            self._votes[slot] = -1
+            if len(votes) == 1:
+                self._votes[slot] = self._delegate(list(votes)[0])
+            elif len(votes):
+                self._split[slot] = tuple(
+                    (self._delegate(d), _basisPoints(pct))
+                    for d, pct in votes.items()
+                )
+            return
+        for vote in votes:
+            if vote.startswith("+"):
+                self._split.pop(slot, None)
+                self._votes[slot] = self._delegate(vote[1:])
+            elif vote.startswith("-"):
+                self._split.pop(slot, None)
+                self._votes[slot] = -1
+
+    def _htlcLock(self, slot, tx, asset):
+        amount = _int(tx.get("amount", 0))
+        self._balances[slot] -= amount
+        self._locked[slot] += amount
+        self._locks[tx["id"]] = (
+            slot, tx.get("recipient", tx.get("recipientId", None)), amount
+        )
+
+    def _unlock(self, asset):
+        # lock emitted before replay start is unknown and ignored
+        return self._locks.pop(asset.get("lockTransactionId", None), None)
+
+    def _htlcClaim(self, slot, tx, asset):
+        lock = self._unlock(asset.get("claim", {}))
+        if lock is not None:
+            sender, recipient, amount = lock
+            self._locked[sender] -= amount
+            self._balances[self._slot(recipient)] += amount
+
+    def _htlcRefund(self, slot, tx, asset):
+        lock = self._unlock(asset.get("refund", {}))
+        if lock is not None:
+            sender, recipient, amount = lock
+            self._locked[sender] -= amount
+            self._balances[sender] += amount
+
+    def _burn(self, slot, tx, asset):
+        amount = _int(tx.get("amount", 0))
+        self._balances[slot] -= amount
+        self.burned += amount
+
+    def snapshot(self, height=None):
+        """
+        Freeze current state.
+
+        Args:
+            height (int): snapshot height, default to last applied
+                transaction height.
+
+        Returns:
+            dposlib.ark.replay.Snapshot: wallet state copy.
+        """
+        return Snapshot(
+            self.height if height is None else height,
+            self._addresses, self._delegates, array("q", self._balances),
+            array("q", self._locked), array("q", self._nonces),
+            array("l", self._votes), dict(self._split), self.burned
+        )
+
+    def replay(self, transactions, heights=()):
+        """
+        Apply transactions sorted by height and snapshot state at given
+        heights. A snapshot includes all transactions up to its height.
+
+        Args:
+            transactions (iterable): transactions with `height` or
+                `blockHeight` field.
+            heights (list): snapshot heights.
+
+        Returns:
+            dict: snapshots indexed by height.
+        """
+        heights = sorted(heights, reverse=True)
+        snapshots = {}
+        for tx in transactions:
+            height = int(tx.get("height", tx.get("blockHeight", 0)))
+            while len(heights) and heights[-1] < height:
+                last = heights.pop()
+                snapshots[last] = self.snapshot(last)
+            self.apply(tx)
+        while len(heights):
+            height = heights.pop()
+            snapshots[height] = self.snapshot(height)
+        return snapshots
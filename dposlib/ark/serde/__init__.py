@@ -2,8 +2,6 @@
 # © Toons
 
 import sys
-import hashlib
-import json
 from io import BytesIO
 
 # all `v<x>.py` have to be imported here
@@ -12,26 +10,13 @@ from . import v2, v3
 CACHE = {}
 
 
-def serializePayload(tx):
-    # compute a md5 hash over asset and amount
-    asset = dict(tx.get("asset", {}))
-    asset["amount"] = tx.get("amount", 0)
-    asset["expiration"] = tx.get("expiration", 0)
-    md5_asset = hashlib.md5(
-        json.dumps(asset, sort_keys=True).encode("utf-8")
-    ).hexdigest()
-    # if hash already computed and nothing modified (asset or amount or
-    # expiration) since
-    if len(asset) and md5_asset == getattr(tx, "_assetHash", ""):
-        return getattr(tx, "_serializedPayload")
-
-    name = "_%(typeGroup)d_%(type)d" % tx
-    key_name = "_%d" % tx["version"] + name
+def _getHandler(name, version):
+    key_name = "_%d" % version + name
     func = CACHE.get(key_name, False)
 
     if func is False:
-        # search decreasing versions
-        for version in range(tx['version'], 1, -1):
+        # search decreasing versions, version 1 payloads are v2 ones
+        for version in range(max(version, 2), 1, -1):
             try:
                 func = getattr(sys.modules[f"{__name__}.v{version}"], name)
             except AttributeError:
@@ -41,15 +26,50 @@ def serializePayload(tx):
                 break
         # if nothing found:
         if key_name not in CACHE:
+            typeGroup, type_ = name.split("_")[-2:]
             raise NotImplementedError(
-                "Unknown transaction %(typeGroup)d:%(type)d" % tx
+                "Unknown transaction %s:%s" % (typeGroup, type_)
             )
 
+    return func
+
+
+def serializePayload(tx):
+    # Transaction objects increment a payload version on each modification of
+    # payload fields (amount, expiration, recipientId and asset content), a
+    # cached payload is valid while version and transaction type are the same
+    counter = getattr(tx, "_payloadVersion", None)
+    key = (counter, tx["version"], tx.get("typeGroup", 1), tx["type"])
+    if counter is not None and key == getattr(tx, "_payloadKey", None):
+        return getattr(tx, "_serializedPayload")
+
+    func = _getHandler(
+        "_%d_%d" % (tx.get("typeGroup", 1), tx["type"]), tx["version"]
+    )
     buf = BytesIO()
     func(tx, buf)
     result = buf.getvalue()
     buf.close()
 
-    setattr(tx, "_serializedPayload", result)
-    setattr(tx, "_assetHash", md5_asset)
+    if counter is not None:
+        setattr(tx, "_serializedPayload", result)
+        setattr(tx, "_payloadKey", key)
     return result
+
+
+def deserializePayload(tx, reader):
+    """
+    Read transaction payload and set associated fields into `tx`.
+
+    Args:
+        tx (dict): transaction fields already read from header.
+        reader (dposlib.util.bin.BytesReader): reader positioned at payload.
+
+    Returns:
+        dict: updated transaction fields.
+    """
+    func = _getHandler(
+        "_unpack_%d_%d" % (tx.get("typeGroup", 1), tx["type"]), tx["version"]
+    )
+    func(tx, reader)
+    return tx
@@ -1,7 +1,27 @@
 # -*- coding: utf-8 -*-
 
+import struct
 import base58
-from dposlib.util.bin import unhexlify, pack, pack_bytes
+from dposlib.util.bin import unhexlify, UINT8, UINT16, UINT64
+
+# precompiled struct layouts
+AMOUNT_EXPIRATION = struct.Struct("<QI")
+MULTISIGNATURE = struct.Struct("<BB")
+PAYMENT = struct.Struct("<Q21s")
+LOCK_EXPIRATION = struct.Struct("<BI")
+ENTITY = struct.Struct("<BBBB")
+
+
+def packPayments(items):
+    # write payment count and amount-address pairs into one preallocated
+    # bytearray
+    result = bytearray(UINT16.size + PAYMENT.size * len(items))
+    UINT16.pack_into(result, 0, len(items))
+    offset = UINT16.size
+    for amount, address in items:
+        PAYMENT.pack_into(result, offset, amount, address)
+        offset += PAYMENT.size
+    return result
 
 
 # https://github.com/ArkEcosystem/AIPs/blob/master/AIPS/aip-11.md
@@ -16,13 +36,10 @@ def _1_0(tx, buf):
         recipientId = base58.b58decode_check(recipientId)
     except Exception:
         raise Exception("no recipientId defined")
-    pack(
-        "<QI", buf, (
-            int(tx.get("amount", 0)),
-            int(tx.get("expiration", 0))
-        )
-    )
-    pack_bytes(buf, recipientId)
+    buf.write(AMOUNT_EXPIRATION.pack(
+        int(tx.get("amount", 0)), int(tx.get("expiration", 0))
+    ))
+    buf.write(recipientId)
 
 
 # secondSignature registration
@@ -32,7 +49,7 @@ def _1_1(tx, buf):
         secondPublicKey = asset["signature"]["publicKey"]
     else:
         raise Exception("no secondSecret or secondPublicKey given")
-    pack_bytes(buf, unhexlify(secondPublicKey))
+    buf.write(unhexlify(secondPublicKey))
 
 
 # delegate registration
@@ -42,8 +59,8 @@ def _1_2(tx, buf):
     if username:
         length = len(username)
         if 3 <= length <= 255:
-            pack("<B", buf, (length, ))
-            pack_bytes(buf, username.encode("utf-8"))
+            buf.write(UINT8.pack(length))
+            buf.write(username.encode("utf-8"))
         else:
             raise Exception("bad username length [3-255]: %s" % username)
     else:
@@ -55,11 +72,12 @@ def _1_3(tx, buf):
     asset = tx.get("asset", {})
     delegatePublicKeys = asset.get("votes", False)
     if delegatePublicKeys:
-        pack("<B", buf, (len(delegatePublicKeys), ))
-        for delegatePublicKey in delegatePublicKeys:
-            delegatePublicKey = delegatePublicKey.replace("+", "01") \
-                                .replace("-", "00")
-            pack_bytes(buf, unhexlify(delegatePublicKey))
+        buf.write(UINT8.pack(len(delegatePublicKeys)))
+        buf.write(b"".join(
+            unhexlify(
+                delegatePublicKey.replace("+", "01").replace("-", "00")
+            ) for delegatePublicKey in delegatePublicKeys
+        ))
     else:
         raise Exception("no up/down vote given")
 
@@ -69,17 +87,12 @@ def _1_4(tx, buf):
     asset = tx.get("asset", {})
     multiSignature = asset.get("multiSignature", False)
     if multiSignature:
-        pack(
-            "<BB", buf, (
-                multiSignature["min"],
-                len(multiSignature["publicKeys"])
-            )
-        )
-        pack_bytes(
-            buf, b"".join(
-                [unhexlify(sig) for sig in multiSignature["publicKeys"]]
-            )
-        )
+        buf.write(MULTISIGNATURE.pack(
+            multiSignature["min"], len(multiSignature["publicKeys"])
+        ))
+        buf.write(b"".join(
+            [unhexlify(sig) for sig in multiSignature["publicKeys"]]
+        ))
 
 
 # IPFS
@@ -92,7 +105,7 @@ def _1_5(tx, buf):
             else asset["ipfs"]
     except Exception as e:
         raise Exception("bad ipfs hash\n%r" % e)
-    pack_bytes(buf, base58.b58decode(ipfs))
+    buf.write(base58.b58decode(ipfs))
 
 
 # multipayment
@@ -108,10 +121,7 @@ def _1_6(tx, buf):
         ]
     except Exception:
         raise Exception("error in recipientId address list")
-    pack("<H", buf, (len(items), ))
-    for amount, address in items:
-        pack("<Q", buf, (amount, ))
-        pack_bytes(buf, address)
+    buf.write(packPayments(items))
 
 
 # delegate resignation
@@ -136,10 +146,12 @@ def _1_8(tx, buf):
     expiration = lock.get("expiration", False)
     if not lock or not expiration:
         raise Exception("no lock nor expiration data found")
-    pack("<Q", buf, (int(tx.get("amount", 0)),))
-    pack_bytes(buf, unhexlify(lock["secretHash"]))
-    pack("<BI", buf, (int(expiration["type"]), int(expiration["value"])))
-    pack_bytes(buf, recipientId)
+    buf.write(UINT64.pack(int(tx.get("amount", 0))))
+    buf.write(unhexlify(lock["secretHash"]))
+    buf.write(LOCK_EXPIRATION.pack(
+        int(expiration["type"]), int(expiration["value"])
+    ))
+    buf.write(recipientId)
 
 
 # HTLC claim
@@ -148,8 +160,8 @@ def _1_9(tx, buf):
     claim = asset.get("claim", False)
     if not claim:
         raise Exception("no claim data found")
-    pack_bytes(buf, unhexlify(claim["lockTransactionId"]))
-    pack_bytes(buf, unhexlify(claim["unlockSecret"]))
+    buf.write(unhexlify(claim["lockTransactionId"]))
+    buf.write(unhexlify(claim["unlockSecret"]))
 
 
 # HTLC refund
@@ -158,13 +170,13 @@ def _1_10(tx, buf):
     refund = asset.get("refund", False)
     if not refund:
         raise Exception("no refund data found")
-    pack_bytes(buf, unhexlify(refund["lockTransactionId"]))
+    buf.write(unhexlify(refund["lockTransactionId"]))
 
 
 # solar-network burn transaction
 def _2_0(tx, buf):
     dict.__setitem__(tx, "fee", 0)
-    pack("<Q", buf, (int(tx.get("amount", 0)), ))
+    buf.write(UINT64.pack(int(tx.get("amount", 0))))
 
 
 # https://ark.dev/docs/core/transactions/transaction-types/entity
@@ -189,16 +201,143 @@ def _2_6(tx, buf):
     except Exception as e:
         raise Exception("bad entity name\n%r" % e)
 
-    pack(
-        "<BBBB", buf, (
-            int(asset.get("type", 0)),
-            int(asset.get("subType", 0)),
-            int(asset.get("action", 0)),
-            len(registrationId)
-        )
-    )
-    pack_bytes(buf, registrationId)
-    pack("<B", buf, (len(name), ))
-    pack_bytes(buf, name)
-    pack("<B", buf, (len(ipfs), ))
-    pack_bytes(buf, ipfs)
+    buf.write(ENTITY.pack(
+        int(asset.get("type", 0)),
+        int(asset.get("subType", 0)),
+        int(asset.get("action", 0)),
+        len(registrationId)
+    ))
+    buf.write(registrationId)
+    buf.write(UINT8.pack(len(name)))
+    buf.write(name)
+    buf.write(UINT8.pack(len(ipfs)))
+    buf.write(ipfs)
+
+
+# deserializers
+def readAddress(reader):
+    # read 21-bytes address and return its base58 representation
+    address = base58.b58encode_check(bytes(reader.read(21)))
+    return address.decode("utf-8") if isinstance(address, bytes) else address
+
+
+def readPayments(reader):
+    # read payment count and amount-address pairs
+    count, = reader.unpack(UINT16)
+    result = []
+    for i in range(count):
+        amount, address = reader.unpack(PAYMENT)
+        address = base58.b58encode_check(address)
+        result.append({
+            "amount": amount,
+            "recipientId": address.decode("utf-8")
+            if isinstance(address, bytes) else address
+        })
+    return result
+
+
+# transfer
+def _unpack_1_0(tx, reader):
+    tx["amount"], tx["expiration"] = reader.unpack(AMOUNT_EXPIRATION)
+    tx["recipientId"] = readAddress(reader)
+
+
+# secondSignature registration
+def _unpack_1_1(tx, reader):
+    tx["asset"] = {"signature": {"publicKey": reader.read(33).hex()}}
+
+
+# delegate registration
+def _unpack_1_2(tx, reader):
+    length, = reader.unpack(UINT8)
+    tx["asset"] = {
+        "delegate": {"username": str(reader.read(length), "utf-8")}
+    }
+
+
+# vote
+def _unpack_1_3(tx, reader):
+    count, = reader.unpack(UINT8)
+    votes = []
+    for i in range(count):
+        vote = reader.read(34)
+        votes.append(("+" if vote[0] else "-") + vote[1:].hex())
+    tx["asset"] = {"votes": votes}
+
+
+# Multisignature registration
+def _unpack_1_4(tx, reader):
+    minimum, count = reader.unpack(MULTISIGNATURE)
+    tx["asset"] = {
+        "multiSignature": {
+            "min": minimum,
+            "publicKeys": [reader.read(33).hex() for i in range(count)]
+        }
+    }
+
+
+# IPFS
+def _unpack_1_5(tx, reader):
+    # multihash: hash function, digest length and digest
+    length = reader.view[reader.offset + 1]
+    ipfs = base58.b58encode(bytes(reader.read(length + 2)))
+    tx["asset"] = {
+        "ipfs": ipfs.decode("utf-8") if isinstance(ipfs, bytes) else ipfs
+    }
+
+
+# multipayment
+def _unpack_1_6(tx, reader):
+    tx["asset"] = {"payments": readPayments(reader)}
+
+
+# delegate resignation
+def _unpack_1_7(tx, reader):
+    pass
+
+
+# HTLC lock
+def _unpack_1_8(tx, reader):
+    tx["amount"], = reader.unpack(UINT64)
+    secretHash = reader.read(32).hex()
+    type_, value = reader.unpack(LOCK_EXPIRATION)
+    tx["recipientId"] = readAddress(reader)
+    tx["asset"] = {
+        "lock": {
+            "secretHash": secretHash,
+            "expiration": {"type": type_, "value": value}
+        }
+    }
+
+
+# HTLC claim
+def _unpack_1_9(tx, reader):
+    tx["asset"] = {
+        "claim": {
+            "lockTransactionId": reader.read(32).hex(),
+            "unlockSecret": reader.read(32).hex()
+        }
+    }
+
+
+# HTLC refund
+def _unpack_1_10(tx, reader):
+    tx["asset"] = {"refund": {"lockTransactionId": reader.read(32).hex()}}
+
+
+# solar-network burn transaction
+def _unpack_2_0(tx, reader):
+    tx["amount"], = reader.unpack(UINT64)
+
+
+# entity
+def _unpack_2_6(tx, reader):
+    type_, subType, action, length = reader.unpack(ENTITY)
+    asset = {"type": type_, "subType": subType, "action": action, "data": {}}
+    if length:
+        asset["registrationId"] = reader.read(length).hex()
+    for key in ["name", "ipfsData"]:
+        length, = reader.unpack(UINT8)
+        if length:
+            asset["data"][key] = str(reader.read(length), "utf-8")
+    tx["asset"] = asset
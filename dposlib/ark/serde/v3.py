@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import struct
 import base58
 import decimal
-from dposlib.util.bin import unhexlify, hexlify, pack, pack_bytes
+from dposlib.util.bin import unhexlify, hexlify, UINT8, UINT16, UINT64
+from .v2 import packPayments, readPayments, readAddress, LOCK_EXPIRATION
+
+# precompiled struct layouts
+AMOUNT_LENGTH = struct.Struct("<QB")
+VOTE = struct.Struct("<BB")
 
 
 # solar legacy vote transaction
@@ -10,13 +16,14 @@ def _1_3(tx, buf):
     asset = tx.get("asset", {})
     usernames = asset.get("votes", False)
     if usernames:
-        pack("<B", buf, (len(usernames), ))
+        buf.write(UINT8.pack(len(usernames)))
         for username in usernames:
-            pack_bytes(buf, unhexlify(
-                ("%02x" % len(username)) +
-                ("01" if username.startswith("+") else "00") +
-                hexlify(username[1:])
-            ))
+            # length includes the vote sign byte
+            name = username[1:].encode("utf-8")
+            buf.write(
+                VOTE.pack(len(name) + 1, 1 if username.startswith("+") else 0)
+            )
+            buf.write(name)
     else:
         raise Exception("no up/down vote given")
 
@@ -26,11 +33,13 @@ def _2_2(tx, buf):
     asset = tx.get("asset", {})
     usernames = asset.get("votes", False)
     if usernames:
-        pack("<B", buf, (len(usernames), ))
+        buf.write(UINT8.pack(len(usernames)))
         for user, percent in usernames.items():
-            pack("<B", buf, (len(user), ))
-            pack_bytes(buf, user.encode("utf-8"))
-            pack("<H", buf, (int(decimal.Decimal(str(percent)) * 100), ))
+            buf.write(UINT8.pack(len(user)))
+            buf.write(user.encode("utf-8"))
+            buf.write(
+                UINT16.pack(int(decimal.Decimal(str(percent)) * 100))
+            )
     else:
         raise Exception("no up/down vote given")
 
@@ -48,10 +57,7 @@ def _1_6(tx, buf):
         ]
     except Exception:
         raise Exception("error in recipientId address list")
-    pack("<H", buf, (len(items), ))
-    for amount, address in items:
-        pack("<Q", buf, (amount, ))
-        pack_bytes(buf, address)
+    buf.write(packPayments(items))
 
 
 # HTLC lock
@@ -70,10 +76,12 @@ def _1_8(tx, buf):
     if not lock or not expiration:
         raise Exception("no lock nor expiration data found")
     secretHash = unhexlify(lock["secretHash"])
-    pack("<QB", buf, (int(tx.get("amount", 0)), len(secretHash)))
-    pack_bytes(buf, secretHash)
-    pack("<BI", buf, (int(expiration["type"]), int(expiration["value"])))
-    pack_bytes(buf, recipientId)
+    buf.write(AMOUNT_LENGTH.pack(int(tx.get("amount", 0)), len(secretHash)))
+    buf.write(secretHash)
+    buf.write(LOCK_EXPIRATION.pack(
+        int(expiration["type"]), int(expiration["value"])
+    ))
+    buf.write(recipientId)
 
 
 # HTLC claim
@@ -83,13 +91,71 @@ def _1_9(tx, buf):
     if not claim:
         raise Exception("no claim data found")
     unlockSecret = unhexlify(claim["unlockSecret"])
-    pack("<B", buf, (claim["hashType"],))
-    pack_bytes(buf, unhexlify(claim["lockTransactionId"]))
-    pack("<B", buf, (len(unlockSecret),))
-    pack_bytes(buf, unlockSecret)
+    buf.write(UINT8.pack(claim["hashType"]))
+    buf.write(unhexlify(claim["lockTransactionId"]))
+    buf.write(UINT8.pack(len(unlockSecret)))
+    buf.write(unlockSecret)
 
 
 # solar-network burn transaction
 def _2_0(tx, buf):
     dict.__setitem__(tx, "fee", 0)
-    pack("<Q", buf, (int(tx.get("amount", 0)), ))
+    buf.write(UINT64.pack(int(tx.get("amount", 0))))
+
+
+# deserializers
+# solar legacy vote transaction
+def _unpack_1_3(tx, reader):
+    count, = reader.unpack(UINT8)
+    votes = []
+    for i in range(count):
+        length, sign = reader.unpack(VOTE)
+        votes.append(
+            ("+" if sign else "-") + str(reader.read(length - 1), "utf-8")
+        )
+    tx["asset"] = {"votes": votes}
+
+
+# solar multivote transaction
+def _unpack_2_2(tx, reader):
+    count, = reader.unpack(UINT8)
+    votes = {}
+    for i in range(count):
+        length, = reader.unpack(UINT8)
+        username = str(reader.read(length), "utf-8")
+        percent, = reader.unpack(UINT16)
+        votes[username] = percent / 100
+    tx["asset"] = {"votes": votes}
+
+
+# solar transfer
+def _unpack_1_6(tx, reader):
+    tx["asset"] = {"transfers": readPayments(reader)}
+
+
+# HTLC lock
+def _unpack_1_8(tx, reader):
+    tx["amount"], length = reader.unpack(AMOUNT_LENGTH)
+    secretHash = reader.read(length).hex()
+    type_, value = reader.unpack(LOCK_EXPIRATION)
+    tx["recipientId"] = readAddress(reader)
+    tx["asset"] = {
+        "lock": {
+            "secretHash": secretHash,
+            "expiration": {"type": type_, "value": value}
+        }
+    }
+
+
+# HTLC claim
+def _unpack_1_9(tx, reader):
+    hashType, = reader.unpack(UINT8)
+    lockTransactionId = reader.read(32).hex()
+    length, = reader.unpack(UINT8)
+    tx["asset"] = {
+        "claim": {
+            "hashType": hashType,
+            "lockTransactionId": lockTransactionId,
+            "unlockSecret": reader.read(length).hex()
+        }
+    }
@@ -1,20 +1,40 @@
 # -*- coding: utf-8 -*-
 
+import os
 import re
 import json
+import struct
+import hashlib
 import dposlib
 from io import BytesIO
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 from dposlib import cfg
 from dposlib.ark import slots, serde
 from dposlib.util.bin import hexlify, unhexlify, pack, pack_bytes, checkAddress
+from dposlib.util.bin import BytesReader, UINT32
+from dposlib.util.data import observe
+
+# precompiled header layouts
+HEADER_V1 = struct.Struct("<BBBBI")
+HEADER_V2 = struct.Struct("<BBBIHQ")
+FEE_VENDORFIELD = struct.Struct("<QB")
+
+#: batches smaller than this are processed in the current process by
+#: default, worker start-up would cost more than it saves
+POOL_THRESHOLD = 32
 
 
 def setSenderPublicKey(cls, publicKey):
     # load information from blockchain
     address = dposlib.core.crypto.getAddress(publicKey)
     data = dposlib.rest.GET.api.wallets(address).get("data", {})
+    setSenderData(cls, publicKey, address, data)
+
+
+def setSenderData(cls, publicKey, address, data):
+    # initialize sender fields from wallet data already loaded
     attributes = data.get("attributes", {})
     # keep original nonce
     cls._nonce = int(data.get("nonce", 0))
@@ -155,32 +175,56 @@ def setTimestamp(cls, value):
 
 # Reference:
 # - https://github.com/ArkEcosystem/AIPs/blob/master/AIPS/aip-11.md
-def serialize(tx, **options):
+def serializeUnsigned(tx):
     """
-    Serialize transaction.
+    Serialize the unsigned part of a transaction (header, vendor field and
+    payload). Signatures are computed over this prefix.
 
     Args:
         tx (dict or Transaction): transaction object.
 
     Returns:
-        bytes: transaction serial representation.
+        bytes: unsigned transaction serial representation.
     """
     buf = BytesIO()
     vendorField = tx.get("vendorField", "").encode("utf-8")[:255]
     version = tx.get("version", 1)
 
     # common part
-    pack("<BBB", buf, (0xff, version, cfg.pubkeyHash))
     if version >= 2:
-        pack("<IHQ", buf, (tx.get("typeGroup", 1), tx["type"], tx["nonce"],))
+        buf.write(HEADER_V2.pack(
+            0xff, version, cfg.pubkeyHash,
+            tx.get("typeGroup", 1), tx["type"], tx["nonce"]
+        ))
     else:
-        pack("<BI", buf, (tx["type"], tx["timestamp"],))
-    pack_bytes(buf, unhexlify(tx["senderPublicKey"]))
-    pack("<QB", buf, (tx["fee"], len(vendorField)))
-    pack_bytes(buf, vendorField)
+        buf.write(HEADER_V1.pack(
+            0xff, version, cfg.pubkeyHash, tx["type"], tx["timestamp"]
+        ))
+    buf.write(unhexlify(tx["senderPublicKey"]))
+    buf.write(FEE_VENDORFIELD.pack(tx["fee"], len(vendorField)))
+    buf.write(vendorField)
 
     # custom part
-    pack_bytes(buf, serde.serializePayload(tx))
+    buf.write(serde.serializePayload(tx))
+
+    result = buf.getvalue()
+    buf.close()
+    return result
+
+
+def serializeSignatures(tx, **options):
+    """
+    Serialize the signature segments of a transaction. Appended to
+    [`serializeUnsigned`](tx.md#dposlib.ark.tx.serializeUnsigned) output, it
+    gives the full transaction serial representation.
+
+    Args:
+        tx (dict or Transaction): transaction object.
+
+    Returns:
+        bytes: signatures serial representation.
+    """
+    buf = BytesIO()
 
     # signatures part
     if not options.get("exclude_sig", False):
@@ -188,7 +232,7 @@ def serialize(tx, **options):
     if not options.get("exclude_second_sig", False):
         pack_bytes(buf, unhexlify(tx.get("signSignature", "")))
     if "signatures" in tx and not options.get("exclude_multi_sig", False):
-        if version == 1:
+        if tx.get("version", 1) == 1:
             pack("<B", buf, (0xff,))
         pack_bytes(buf, b"".join([unhexlify(sig) for sig in tx["signatures"]]))
 
@@ -201,6 +245,156 @@ def serialize(tx, **options):
     return result
 
 
+def serialize(tx, **options):
+    """
+    Serialize transaction.
+
+    Args:
+        tx (dict or Transaction): transaction object.
+
+    Returns:
+        bytes: transaction serial representation.
+    """
+    return serializeUnsigned(tx) + serializeSignatures(tx, **options)
+
+
+def _readDER(reader):
+    # ECDSA signature length is encoded in DER second byte
+    return reader.read(reader.view[reader.offset + 1] + 2).hex()
+
+
+def _isSchnorr(reader):
+    # guess signature scheme from remaining length
+    remaining = len(reader)
+    return \
+        remaining in [64, 128] or \
+        remaining % 65 == 0 or \
+        (remaining - 64) % 65 == 0 or \
+        (remaining - 128) % 65 == 0
+
+
+def _readSignatures(tx, reader):
+    if tx["version"] >= 2 and _isSchnorr(reader):
+        # signature and second signature are 64-bytes long, multisignature
+        # ones are 65-bytes long (public key index + signature)
+        for key in ["signature", "signSignature"]:
+            remaining = len(reader)
+            if remaining and (remaining % 64 == 0 or remaining % 65 != 0):
+                tx[key] = reader.read(64).hex()
+        if len(reader):
+            if len(reader) % 65:
+                raise Exception("signature buffer not exhausted")
+            tx["signatures"] = [
+                reader.read(65).hex() for i in range(len(reader) // 65)
+            ]
+    else:
+        if len(reader):
+            tx["signature"] = _readDER(reader)
+        if len(reader) and reader.peek() != 0xff:
+            tx["signSignature"] = _readDER(reader)
+        if len(reader):
+            if reader.peek() != 0xff:
+                raise Exception("signature buffer not exhausted")
+            reader.read(1)
+            tx["signatures"] = []
+            while len(reader):
+                tx["signatures"].append(_readDER(reader))
+
+
+def deserialize(data):
+    """
+    Deserialize a transaction from its serial representation as sent by
+    peers or included in blocks (id is not part of it). Data is parsed
+    straight from a `memoryview` without copying it. Sender wallet is not
+    fetched from blockchain.
+
+    Args:
+        data (bytes or memoryview or hex): transaction serial.
+
+    Returns:
+        dposlib.ark.tx.Transaction: deserialized transaction.
+    """
+    reader = BytesReader(unhexlify(data) if isinstance(data, str) else data)
+    if reader.peek() != 0xff:
+        raise Exception("unknown serialization format")
+
+    # common part
+    tx = {}
+    if reader.view[reader.offset + 1] >= 2:
+        _, tx["version"], tx["network"], tx["typeGroup"], tx["type"], \
+            tx["nonce"] = reader.unpack(HEADER_V2)
+    else:
+        _, tx["version"], tx["network"], tx["type"], tx["timestamp"] = \
+            reader.unpack(HEADER_V1)
+        tx["typeGroup"] = 1
+    tx["senderPublicKey"] = reader.read(33).hex()
+    tx["fee"], length = reader.unpack(FEE_VENDORFIELD)
+    if length:
+        tx["vendorField"] = str(reader.read(length), "utf-8")
+
+    # custom part
+    serde.deserializePayload(tx, reader)
+
+    # signatures and id part
+    _readSignatures(tx, reader)
+    tx["id"] = hashlib.sha256(reader.view).hexdigest()
+
+    # senderPublicKey property would load sender wallet from blockchain
+    result = Transaction(
+        version=tx.pop("version"), typeGroup=tx.pop("typeGroup"),
+        type=tx.pop("type"), amount=tx.pop("amount", 0),
+        asset=tx.pop("asset", {})
+    )
+    for key, value in tx.items():
+        dict.__setitem__(result, key, value)
+    return result
+
+
+def deserializeMany(data):
+    """
+    Iterate over transactions from a block payload, where each serial is
+    prefixed by its length as 4-bytes unsigned integer. Serials are parsed
+    as they are reached.
+
+    Args:
+        data (bytes or memoryview): length-prefixed transaction serials.
+
+    Yields:
+        dposlib.ark.tx.Transaction: deserialized transaction.
+    """
+    reader = BytesReader(data)
+    while len(reader):
+        length, = reader.unpack(UINT32)
+        yield deserialize(reader.read(length))
+
+
+def signAndIdentify(tx, privateKey, secondPrivateKey=None):
+    """
+    Generate `signature`, `signSignature` and `id` fields serializing the
+    transaction only once. Signature segments are appended to the unsigned
+    bytes to issue the second signature and then the id.
+
+    Args:
+        tx (Transaction): transaction with `fee` and `senderPublicKey` set.
+        privateKey (str): private key as hex string.
+        secondPrivateKey (str): second private key as hex string.
+
+    Returns:
+        dposlib.ark.tx.Transaction: signed transaction.
+    """
+    crypto = dposlib.core.crypto
+    tx._reset()
+    data = crypto.getBytes(tx)
+    tx["signature"] = crypto.getSignatureFromBytes(data, privateKey)
+    data += unhexlify(tx["signature"])
+    if secondPrivateKey is not None:
+        tx["signSignature"] = \
+            crypto.getSignatureFromBytes(data, secondPrivateKey)
+        data += unhexlify(tx["signSignature"])
+    tx["id"] = crypto.getIdFromBytes(data)
+    return tx
+
+
 class Transaction(dict):
     """
     A python `dict` that implements all the necessities to manually generate
@@ -209,6 +403,8 @@ class Transaction(dict):
 
     FMULT = None
     FEESL = None
+    #: fields read by payload serializers
+    PAYLOAD_FIELDS = ["amount", "expiration", "recipientId", "asset"]
 
     # custom properties definitions
     secret = property(
@@ -326,8 +522,16 @@ class Transaction(dict):
         else:
             if not isinstance(value, cast):
                 value = cast(value)
+            if item in Transaction.PAYLOAD_FIELDS:
+                value = observe(value, self._payloadChanged)
+                self._payloadChanged()
             dict.__setitem__(self, item, value)
 
+    def _payloadChanged(self):
+        """invalidate cached payload."""
+        version = self.__dict__.get("_payloadVersion", 0)
+        dict.__setattr__(self, "_payloadVersion", version + 1)
+
     def _reset(self):
         """remove data linked to validation process."""
         self.pop("signature", False)
@@ -342,6 +546,7 @@ class Transaction(dict):
         self.FMULT = kwargs.pop("FMULT", Transaction.FMULT)
         # initialize a void dict
         dict.__init__(self)
+        dict.__setattr__(self, "_payloadVersion", 0)
         data = dict(*args, **kwargs)
         last_to_be_set = [
             (k, data.pop(k, None)) for k in [
@@ -356,7 +561,10 @@ class Transaction(dict):
         dict.__setitem__(self, "typeGroup", data.pop("typeGroup", 1))
         dict.__setitem__(self, "amount", int(data.pop("amount", 0)))
         dict.__setitem__(self, "type", data.pop("type", 0))
-        dict.__setitem__(self, "asset", data.pop("asset", {}))
+        dict.__setitem__(
+            self, "asset",
+            observe(data.pop("asset", {}), self._payloadChanged)
+        )
         # initialize all non-void fields
         for key, value in [
             (k, v) for k, v in list(data.items()) + last_to_be_set
@@ -376,6 +584,33 @@ class Transaction(dict):
             object.__setattr__(self, item, value)
     __setattr__ = __setitem__
 
+    def __delitem__(self, item):
+        if item in Transaction.PAYLOAD_FIELDS:
+            self._payloadChanged()
+        dict.__delitem__(self, item)
+
+    def pop(self, item, *default):
+        if item in Transaction.PAYLOAD_FIELDS:
+            self._payloadChanged()
+        return dict.pop(self, item, *default)
+
+    def popitem(self):
+        self._payloadChanged()
+        return dict.popitem(self)
+
+    def clear(self):
+        self._payloadChanged()
+        dict.clear(self)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, item, default=None):
+        if item not in self:
+            self[item] = default
+        return dict.__getitem__(self, item)
+
     def __getattr__(self, attr):
         try:
             return dict.__getitem__(self, attr)
@@ -636,11 +871,136 @@ class Transaction(dict):
         if "fee" not in self or fee is not None:
             self.fee = fee
         self.feeIncluded = fee_included
-        # sign with private keys
+        # sign with private keys and generate the id serializing only once
         # if transaction is not from a multisignature wallet
+        if not self._multisignature and self["type"] != 4:
+            if not hasattr(self, "_privateKey"):
+                raise Exception("orphan transaction can not sign itsef")
+            if self._secondPublicKey and \
+               not hasattr(self, "_secondPrivateKey"):
+                raise Exception("second signature is missing")
+            signAndIdentify(
+                self, self._privateKey,
+                getattr(self, "_secondPrivateKey", None)
+            )
+            return
         if not self._multisignature:
             self.sign()
             if hasattr(self, "_secondPrivateKey"):
                 self.signSign()
         # generate the id
         self.identify()
+
+
+def _signBytes(job):
+    # process pool entry point, network flags are given with the job because
+    # spawned workers do not share the parent cfg module
+    data, privateKey, bip340 = job
+    from dposlib.ark import crypto
+    cfg.bip340 = bip340
+    return crypto.getSignatureFromBytes(data, privateKey)
+
+
+def _signAll(executor, data, privateKey, chunksize=None):
+    jobs = [(d, privateKey, getattr(cfg, "bip340", False)) for d in data]
+    if executor is None:
+        return [_signBytes(job) for job in jobs]
+    return list(executor.map(_signBytes, jobs, chunksize=chunksize or 1))
+
+
+def finalizeMany(transactions, secret, secondSecret=None, fee=None,
+                 fee_included=False, nonce=None, processes=None,
+                 chunksize=None):
+    """
+    Finalize a batch of transactions issued by the same wallet. Keys and
+    wallet data are loaded once, nonces are assigned consecutively and
+    signatures are computed across a process pool.
+
+    ```python
+    >>> txs = [dposlib.core.transfer(1, address) for address in addresses]
+    >>> txs = dposlib.ark.tx.finalizeMany(txs, "first secret")
+    ```
+
+    Args:
+        transactions (iterable): orphan transactions.
+        secret (str): passphrase.
+        secondSecret (str): second passphrase.
+        fee (int): manually set fee value in `arktoshi`.
+        fee_included (bool): see `dposlib.ark.tx.Transaction.feeIncluded`.
+        nonce (int): nonce of the first transaction. Default to wallet nonce
+            plus one.
+        processes (int): number of worker processes. Default to cpu count,
+            or `1` for less than `POOL_THRESHOLD` transactions. `1` signs in
+            the current process.
+        chunksize (int): number of transactions sent to a worker at once.
+
+    Returns:
+        list: finalized transactions in the given order.
+    """
+    transactions = list(transactions)
+    if not len(transactions):
+        return transactions
+
+    # derive keys and load wallet data only once
+    crypto = dposlib.core.crypto
+    keys = crypto.getKeys(secret)
+    privateKey, publicKey = keys["privateKey"], keys["publicKey"]
+    secondPrivateKey = \
+        crypto.getKeys(secondSecret)["privateKey"] if secondSecret else None
+    address = crypto.getAddress(publicKey)
+    data = dposlib.rest.GET.api.wallets(address).get("data", {})
+    attributes = data.get("attributes", {})
+    if attributes.get("multiSignature", {}):
+        raise Exception("multisignature wallet can not finalize batches")
+    if attributes.get("secondPublicKey", None) and secondPrivateKey is None:
+        raise Exception("second signature is missing")
+    nonce = int(data.get("nonce", 0)) + 1 if nonce is None else int(nonce)
+
+    for index, tx in enumerate(transactions):
+        setSenderData(tx, publicKey, address, data)
+        tx["nonce"] = nonce + index
+        tx._privateKey = privateKey
+        if secondPrivateKey is not None:
+            tx._secondPrivateKey = secondPrivateKey
+        # automatically set fees if needed
+        if "fee" not in tx or fee is not None:
+            tx.fee = fee
+        tx.feeIncluded = fee_included
+        tx._reset()
+
+    if processes is None and len(transactions) < POOL_THRESHOLD:
+        processes = 1
+    processes = processes or os.cpu_count() or 1
+    if processes > 1 and len(transactions) > 1:
+        executor = ProcessPoolExecutor(processes)
+        chunksize = chunksize or max(1, len(transactions) // (processes * 4))
+    else:
+        executor = None
+
+    try:
+        # unsigned bytes are computed once and signature segments appended
+        data = [crypto.getBytes(tx) for tx in transactions]
+        for tx, signature in zip(
+            transactions, _signAll(executor, data, privateKey, chunksize)
+        ):
+            tx["signature"] = signature
+        data = [
+            d + unhexlify(tx["signature"])
+            for d, tx in zip(data, transactions)
+        ]
+        if secondPrivateKey is not None:
+            for tx, signature in zip(transactions, _signAll(
+                executor, data, secondPrivateKey, chunksize
+            )):
+                tx["signSignature"] = signature
+            data = [
+                d + unhexlify(tx["signSignature"])
+                for d, tx in zip(data, transactions)
+            ]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for tx, d in zip(transactions, data):
+        tx["id"] = crypto.getIdFromBytes(d)
+    return transactions
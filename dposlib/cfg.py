@@ -10,6 +10,14 @@ name     |description
 headers  |headers used on each HTTP request
 timeout  |HTTP request timeout response
 peers    |list of blockchain peer to be used
+poolsize |idle HTTP connections kept per peer
+poolidle |idle HTTP connection timeout in seconds
+concurrency|asyncio HTTP requests in flight
+retries  |failover retries on another peer
+hedge    |delay in seconds before hedging a GET request, 0 to disable
+ratelimit|requests per second for all peers, 0 for no limit
+peerratelimit|requests per second and per peer, 0 for no limit
+maxinflight|concurrent threaded HTTP requests, 0 for no limit
 txversion|global transaction version
 """
 
@@ -20,4 +28,12 @@ headers = {
 
 timeout = 5
 peers = []
+poolsize = 10
+poolidle = 30
+concurrency = 100
+retries = 2
+hedge = 0
+ratelimit = 0
+peerratelimit = 0
+maxinflight = 0
 txversion = 1
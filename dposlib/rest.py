@@ -4,6 +4,43 @@
 `rest` module provides network loaders and [`usrv.req.EndPoint`](
     https://github.com/Moustikitos/micro-server/blob/master/usrv/req.py#L38
 ) root class to implement `GET`, `POST`, `PUT` and `DELETE` HTTP requests.
+Requests are sent over persistent connections pooled per peer, see
+`dposlib.util.pool` to get connection reuse statistics.
+
+`AGET`, `APOST`, `APUT` and `ADELETE` are asyncio counterparts returning
+awaitables, the number of requests in flight within an event loop is bounded
+by `cfg.concurrency`.
+
+Peer is selected per request, either given with `peer` keyword, set for a
+thread or an asyncio task with `usePeer` or chosen from `cfg.peers`, so
+requests can be sent from concurrent threads safely.
+
+Requests failing on transport or server error are retried on another peer up
+to `cfg.retries` times. Retry is safe for idempotent methods and opt-in for
+`POST` with `retry=True` keyword. Slow `GET` requests can be hedged: if no
+response came within `cfg.hedge` seconds, same request is sent to a second
+peer and first successful response is kept. Retries and hedged requests are
+limited by a global budget, see `dposlib.util.retry`.
+
+Request rate can be limited globally with `cfg.ratelimit` and per peer with
+`cfg.peerratelimit` (requests per second), threaded requests in flight are
+bounded by `cfg.maxinflight`. Peers answering `429` or advertising an
+exhausted quota are paused as long as asked, see `dposlib.util.limit`.
+
+Responses of immutable resources such as final blocks and confirmed
+transactions can be stored in a persistent cache enabled with `useCache`.
+Identical `GET` requests sent concurrently from several threads are merged
+into a single network call, `FLIGHTS.stats()` reports coalescing counters.
+Merging is bypassed for a single request with `coalesce=False` keyword.
+
+```python
+>>> import asyncio
+>>> async def main(addresses):
+...     return await asyncio.gather(
+...         *[rest.AGET.api.wallets(address) for address in addresses]
+...     )
+>>> wallets = asyncio.run(main(addresses))
+```
 
 When a specific blockchain package is loaded through `rest.use` definition, a
 `dposlib.core` module is available to provide necessary classes and
@@ -11,60 +48,401 @@ definitions.
 """
 
 import sys
-import random
+import copy
+import asyncio
+import json
+import time
 import traceback
+import threading
+import contextlib
+import contextvars
 from importlib import import_module
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from usrv import req
 from dposlib import net, cfg
+from dposlib.util import pool, asynch, scoreboard, retry, cache, limit
 from dposlib.util.data import filter_dic
 from datetime import datetime, timezone
 
+#: methods retried without explicit agreement
+IDEMPOTENT = ["GET", "HEAD", "OPTIONS", "PUT", "DELETE"]
+#: hedged requests executor sized by `_hedgeExecutor`
+HEDGE_EXECUTOR = None
+HEDGE_LOCK = threading.Lock()
+#: persistent response cache, see `useCache`
+CACHE = None
+#: GET requests coalescing, see `dposlib.util.asynch.SingleFlight`
+FLIGHTS = asynch.SingleFlight(copy.deepcopy)
+#: peer set by `usePeer` within current thread or asyncio task
+PEER = contextvars.ContextVar("peer", default=None)
+
+
+def _manage_response(status, text):
+    # same output as usrv.req.EndPoint._manage_response
+    try:
+        data = json.loads(text)
+    except Exception as err:
+        data = {
+            "success": True, "except": True,
+            "raw": text.decode("utf-8") if isinstance(text, bytes) else text,
+            "error": "%r" % err
+        }
+    if isinstance(data, dict):
+        data["status"] = status
+    return data
+
+
+def _governor():
+    # pacing limits read from cfg module
+    limit.GOVERNOR.configure(
+        getattr(cfg, "ratelimit", 0), getattr(cfg, "peerratelimit", 0),
+        getattr(cfg, "maxinflight", 0)
+    )
+    return limit.GOVERNOR
+
+
+def _open(request):
+    # send request through the persistent connection pool of the peer
+    if request is False:
+        return {"success": False}
+    connections = pool.getPool(
+        request.full_url,
+        getattr(cfg, "poolsize", 10), getattr(cfg, "poolidle", 30)
+    )
+    governor = _governor()
+    try:
+        semaphore = governor.acquire(connections.peer, cfg.timeout)
+    except Exception as error:
+        return {"success": False, "error": "%r" % error, "except": True}
+    start = time.time()
+    try:
+        status, headers, text = connections.request(
+            request.get_method(), request.selector, request.data,
+            dict(request.header_items()), timeout=cfg.timeout
+        )
+    except Exception as error:
+        scoreboard.SCOREBOARD.record(
+            connections.peer, time.time() - start, False
+        )
+        return {"success": False, "error": "%r" % error, "except": True}
+    finally:
+        if semaphore is not None:
+            semaphore.release()
+    scoreboard.SCOREBOARD.record(
+        connections.peer, time.time() - start, status < 500 and status != 429
+    )
+    governor.feedback(connections.peer, status, headers)
+    return _manage_response(status, text)
+
+
+def _failed(response):
+    # transport, server or throttling error worth a try on another peer
+    return isinstance(response, dict) and (
+        (response.get("except", False) and not response.get("success", True))
+        or response.get("status", 200) >= 500
+        or response.get("status", 200) == 429
+    )
+
+
+def _select_peer(tried=[]):
+    # best of two random untried peers according to scoreboard, peers paused
+    # by rate limits are used only if there is no other choice
+    peers = [peer for peer in cfg.peers if peer not in tried]
+    available = [peer for peer in peers if not limit.GOVERNOR.paused(peer)]
+    return scoreboard.choose(available or peers)
+
+
+def _hedgeExecutor():
+    # a hedged call holds two workers at most, so executor is sized to let
+    # all requests allowed in flight be hedged at the same time, a replaced
+    # executor is not shut down so callers still holding it can submit and
+    # its workers exit once it is released
+    global HEDGE_EXECUTOR
+    size = 2 * (
+        getattr(cfg, "maxinflight", 0) or getattr(cfg, "concurrency", 100)
+    )
+    with HEDGE_LOCK:
+        if HEDGE_EXECUTOR is None or HEDGE_EXECUTOR._max_workers != size:
+            HEDGE_EXECUTOR = ThreadPoolExecutor(size, "hedge")
+        return HEDGE_EXECUTOR
+
+
+def _hedged(method, args, kwargs, tried):
+    # send request to a second peer if first one is too slow to answer
+    executor = _hedgeExecutor()
+    futures = [
+        executor.submit(
+            _open, req.EndPoint.build_req(method, *args, **kwargs)
+        )
+    ]
+    done, pending = wait(futures, cfg.hedge)
+    if not done:
+        peer = _select_peer(tried)
+        if peer is not None and retry.BUDGET.withdraw(hedge=True):
+            tried.append(peer)
+            futures.append(executor.submit(
+                _open, req.EndPoint.build_req(
+                    method, *args, **dict(kwargs, peer=peer)
+                )
+            ))
+    while True:
+        done, pending = wait(futures, return_when=FIRST_COMPLETED)
+        # both requests may complete at once, a success is kept first
+        responses = [future.result() for future in done]
+        for response in responses:
+            if not _failed(response):
+                return response
+        if not pending:
+            return responses[0]
+        futures = list(pending)
+
+
+def _requestKey(args, kwargs):
+    # endpoint path and sorted query string
+    path = "/" + "/".join(str(a) for a in args if a)
+    query = sorted(
+        (k, v) for k, v in kwargs.items()
+        if k not in ["headers", "peer", "retry"]
+    )
+    return path, urlencode(query)
+
+
+def _cacheKey(method, args, kwargs):
+    # network, endpoint path and sorted query string of a GET request
+    use = kwargs.pop("cache", True)
+    if method != "GET" or CACHE is None or not use:
+        return None, None
+    path, query = _requestKey(args, kwargs)
+    return "%s:%s?%s" % (getattr(cfg, "network", ""), path, query), path
+
+
+def _send(method, args, kwargs):
+    # send request with failover on other peers
+    retries = getattr(cfg, "retries", 2) if kwargs.pop(
+        "retry", method in IDEMPOTENT
+    ) else 0
+    # no failover if peer is given
+    peer = kwargs.pop("peer", None)
+    if peer is not None:
+        retries = 0
+    else:
+        peer = _select_peer()
+    tried = [peer]
+    retry.BUDGET.deposit()
+    for attempt in range(retries + 1):
+        if attempt:
+            peer = _select_peer(tried)
+            if peer is None or not retry.BUDGET.withdraw():
+                break
+            tried.append(peer)
+        if retries and method == "GET" and getattr(cfg, "hedge", 0):
+            response = _hedged(method, args, dict(kwargs, peer=peer), tried)
+        else:
+            response = _open(
+                req.EndPoint.build_req(method, *args, peer=peer, **kwargs)
+            )
+        if not _failed(response):
+            break
+    return response
+
 
 def _call(method="GET", *args, **kwargs):
     returnKey = kwargs.pop("returnKey", False)
-    response = req.EndPoint._open(
-        req.EndPoint.build_req(method, *args, **kwargs)
-    )
+    coalesce = kwargs.pop("coalesce", True)
+    kwargs["peer"] = kwargs.get("peer", None) or PEER.get()
+    key, path = _cacheKey(method, args, kwargs)
+    response = None if key is None else CACHE.get(key)
+    if response is not None:
+        return filter_dic(response[returnKey]) \
+            if returnKey and returnKey in response else response
+    # identical GET requests in flight share a single network call
+    shared = False
+    if method == "GET" and coalesce:
+        response, shared = FLIGHTS.do(
+            (method, kwargs.get("peer", None)) + _requestKey(args, kwargs),
+            _send, method, args, kwargs
+        )
+    else:
+        response = _send(method, args, kwargs)
+    if key is not None and not shared:
+        CACHE.store(key, path, response)
     if returnKey and returnKey in response:
         return filter_dic(response[returnKey])
     else:
         return response
 
 
-def _random_peer(kwargs):
-    return kwargs.pop("peer", None) or (
-        random.choice(cfg.peers) if len(cfg.peers) else None
+async def _aopen(request):
+    # asyncio counterpart of _open, bounded by cfg.concurrency
+    if request is False:
+        return {"success": False}
+    connections = pool.getAsyncPool(
+        request.full_url,
+        getattr(cfg, "poolsize", 10), getattr(cfg, "poolidle", 30)
     )
+    governor = _governor()
+    async with asynch.getSemaphore(getattr(cfg, "concurrency", 100)):
+        try:
+            wait = governor.reserve(connections.peer, cfg.timeout)
+        except Exception as error:
+            return {"success": False, "error": "%r" % error, "except": True}
+        if wait > 0:
+            await asyncio.sleep(wait)
+        start = time.time()
+        try:
+            status, headers, text = await connections.request(
+                request.get_method(), request.selector, request.data,
+                dict(request.header_items()), timeout=cfg.timeout
+            )
+        except Exception as error:
+            scoreboard.SCOREBOARD.record(
+                connections.peer, time.time() - start, False
+            )
+            return {"success": False, "error": "%r" % error, "except": True}
+    scoreboard.SCOREBOARD.record(
+        connections.peer, time.time() - start, status < 500 and status != 429
+    )
+    governor.feedback(connections.peer, status, headers)
+    return _manage_response(status, text)
+
+
+async def _acall(method="GET", *args, **kwargs):
+    returnKey = kwargs.pop("returnKey", False)
+    kwargs.pop("coalesce", None)
+    kwargs["peer"] = kwargs.get("peer", None) or PEER.get()
+    key, path = _cacheKey(method, args, kwargs)
+    response = None if key is None else CACHE.get(key)
+    if response is not None:
+        return filter_dic(response[returnKey]) \
+            if returnKey and returnKey in response else response
+    retries = getattr(cfg, "retries", 2) if kwargs.pop(
+        "retry", method in IDEMPOTENT
+    ) else 0
+    peer = kwargs.pop("peer", None)
+    if peer is not None:
+        retries = 0
+    else:
+        peer = _select_peer()
+    tried = [peer]
+    retry.BUDGET.deposit()
+    for attempt in range(retries + 1):
+        if attempt:
+            peer = _select_peer(tried)
+            if peer is None or not retry.BUDGET.withdraw():
+                break
+            tried.append(peer)
+        response = await _aopen(
+            req.EndPoint.build_req(method, *args, peer=peer, **kwargs)
+        )
+        if not _failed(response):
+            break
+    if key is not None:
+        CACHE.store(key, path, response)
+    if returnKey and returnKey in response:
+        return filter_dic(response[returnKey])
+    else:
+        return response
+
+
+@contextlib.contextmanager
+def usePeer(peer):
+    """
+    Send requests to a given peer within a `with` block. Peer is bound to
+    current thread or asyncio task so concurrent requests are not affected.
+    Explicit `peer` keyword still has priority and there is no failover.
+
+    ```python
+    >>> with rest.usePeer("http://127.0.0.1:4003"):
+    ...     rest.GET.api.node.status()
+    ...     rest.GET.api.node.syncing()
+    ```
+
+    Args:
+        peer (str): peer url.
+    """
+    token = PEER.set(peer)
+    try:
+        yield peer
+    finally:
+        PEER.reset(token)
+
+
+def useCache(path, maxsize=64 * 1024**2, rules=None):
+    """
+    Store immutable GET responses in a persistent sqlite cache. Responses are
+    indexed by network, so a single database can be used for all networks.
+    Cache is bypassed for a single request with `cache=False` keyword.
+    Records served from cache have no `confirmations` field.
+
+    Args:
+        path (str): database file path or `None` to disable cache.
+        maxsize (int): maximum size of stored responses in bytes.
+        rules (list): cacheability rules as (path regex, condition) pairs,
+            default to `dposlib.util.cache.RULES`.
+
+    Returns:
+        dposlib.util.cache.ResponseCache: cache in use.
+    """
+    global CACHE
+    if CACHE is not None:
+        CACHE.close()
+        CACHE = None
+    if path is not None:
+        CACHE = cache.ResponseCache(path, maxsize, rules)
+    return CACHE
 
 
 #: HTTP GET request builder
 GET = req.EndPoint(
-    method=lambda *a, **kw: [
-        setattr(req.EndPoint, "peer", _random_peer(kw)),
-        _call("GET", *a, **dict(kw, headers=cfg.headers))
-    ][-1]
+    method=lambda *a, **kw: _call(
+        "GET", *a, **dict(kw, headers=cfg.headers)
+    )
 )
 #: HTTP POST request builder
 POST = req.EndPoint(
-    method=lambda *a, **kw: [
-        setattr(req.EndPoint, "peer", _random_peer(kw)),
-        _call("POST", *a, **dict(kw, headers=cfg.headers))
-    ][-1]
+    method=lambda *a, **kw: _call(
+        "POST", *a, **dict(kw, headers=cfg.headers)
+    )
 )
 #: HTTP PUT request builder
 PUT = req.EndPoint(
-    method=lambda *a, **kw: [
-        setattr(req.EndPoint, "peer", _random_peer(kw)),
-        _call("PUT", *a, **dict(kw, headers=cfg.headers))
-    ][-1]
+    method=lambda *a, **kw: _call(
+        "PUT", *a, **dict(kw, headers=cfg.headers)
+    )
 )
 #: HTTP DELETE request builder
 DELETE = req.EndPoint(
-    method=lambda *a, **kw: [
-        setattr(req.EndPoint, "peer", _random_peer(kw)),
-        _call("DELETE", *a, **dict(kw, headers=cfg.headers))
-    ][-1]
+    method=lambda *a, **kw: _call(
+        "DELETE", *a, **dict(kw, headers=cfg.headers)
+    )
+)
+
+
+#: asyncio HTTP GET request builder
+AGET = req.EndPoint(
+    method=lambda *a, **kw: _acall(
+        "GET", *a, **dict(kw, headers=cfg.headers)
+    )
+)
+#: asyncio HTTP POST request builder
+APOST = req.EndPoint(
+    method=lambda *a, **kw: _acall(
+        "POST", *a, **dict(kw, headers=cfg.headers)
+    )
+)
+#: asyncio HTTP PUT request builder
+APUT = req.EndPoint(
+    method=lambda *a, **kw: _acall(
+        "PUT", *a, **dict(kw, headers=cfg.headers)
+    )
+)
+#: asyncio HTTP DELETE request builder
+ADELETE = req.EndPoint(
+    method=lambda *a, **kw: _acall(
+        "DELETE", *a, **dict(kw, headers=cfg.headers)
+    )
 )
 
 
@@ -123,8 +501,11 @@ def use(network, **kwargs):
     Raises:
         Exception: if blockchain not defined or if initialization failed.
     """
-    # clear data in cfg module
+    # clear data in cfg module and close connections
     [cfg.__dict__.pop(k) for k in list(cfg.__dict__) if not k.startswith("_")]
+    pool.closePools()
+    scoreboard.SCOREBOARD.clear()
+    retry.BUDGET.reset()
     # initialize minimum values
     cfg.begintime = datetime(1970, 1, 1, tzinfo=timezone.utc)
     cfg.headers = {
@@ -136,6 +517,14 @@ def use(network, **kwargs):
     cfg.hotmode = False    # offline mode set
     cfg.network = network  # network name set
     cfg.peers = []         # peer list
+    cfg.poolsize = 10      # idle connections kept per peer
+    cfg.poolidle = 30      # idle connection timeout
+    cfg.concurrency = 100  # asyncio requests in flight
+    cfg.retries = 2        # failover retries on another peer
+    cfg.hedge = 0          # hedged GET delay in seconds, 0 to disable
+    cfg.ratelimit = 0      # requests per second, 0 for no limit
+    cfg.peerratelimit = 0  # requests per second and per peer
+    cfg.maxinflight = 0    # concurrent threaded requests, 0 for no limit
     # load network.net configuration
     data = dict(getattr(net, network))
     # override some options if given
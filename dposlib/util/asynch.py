@@ -1,6 +1,17 @@
 # -*- coding: utf-8 -*-
 
+import time
+import heapq
+import random
+import asyncio
+import weakref
 import threading
+import contextvars
+
+from concurrent.futures import ThreadPoolExecutor
+
+# asyncio semaphores indexed by event loop
+SEMAPHORES = weakref.WeakKeyDictionary()
 
 
 def setInterval(interval):
@@ -40,3 +51,371 @@ def setInterval(interval):
         return wrapper
 
     return decorator
+
+
+class SingleFlight(object):
+    """
+    Collapse identical concurrent calls into a single one. First caller of a
+    given key runs the function while followers wait for its result.
+
+    If `copy` is given, a result shared with followers is copied for every
+    caller, leader included, before any of them gets it back, so callers
+    can modify their result freely.
+
+    ```python
+    >>> flights = SingleFlight(copy.deepcopy)
+    >>> result, shared = flights.do("key", function, *args, **kwargs)
+    ```
+
+    Args:
+        copy (callable): function copying a shared result.
+    """
+
+    def __init__(self, copy=None):
+        self.copy = copy
+        self.calls = self.leaders = self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, *args, **kwargs):
+        """
+        Call `function` or wait for the result of an identical call in
+        flight. Exception raised by the leading call is raised for all.
+
+        Args:
+            key (hashable): call identifier.
+            function (callable): function to run.
+            *args: function arguments.
+            **kwargs: function keyword arguments.
+
+        Returns:
+            tuple: result and True if it comes from another call.
+        """
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key, None)
+            leader = flight is None
+            if leader:
+                # event, result, exception, follower count
+                flight = self._flights[key] = [
+                    threading.Event(), None, None, 0
+                ]
+                self.leaders += 1
+            else:
+                flight[3] += 1
+                self.shared += 1
+
+        if leader:
+            result = None
+            try:
+                result = flight[1] = function(*args, **kwargs)
+            except BaseException as error:
+                flight[2] = error
+                raise
+            finally:
+                with self._lock:
+                    self._flights.pop(key, None)
+                # no follower can join once flight is forgotten, shared
+                # result is copied before followers are released
+                if flight[3] and self.copy is not None and \
+                   flight[2] is None:
+                    result = self.copy(result)
+                flight[0].set()
+            return result, False
+        flight[0].wait()
+        if flight[2] is not None:
+            raise flight[2]
+        return (
+            flight[1] if self.copy is None else self.copy(flight[1])
+        ), True
+
+    def stats(self):
+        """
+        Get coalescing statistics.
+
+        Returns:
+            dict: call, leading call, shared result and in flight counts.
+        """
+        return {
+            "calls": self.calls,
+            "leaders": self.leaders,
+            "shared": self.shared,
+            "inflight": len(self._flights)
+        }
+
+
+def _contextKey(context):
+    # objects added within equal contexts can be refreshed together
+    try:
+        return frozenset(context.items())
+    except TypeError:
+        return id(context)
+
+
+class Scheduler(object):
+    """
+    Refresh objects periodically with a bounded pool of workers. Each object
+    has its own interval, randomly shifted by `jitter` ratio so refreshes
+    are spread over time. Objects are weakly referenced and forgotten once
+    garbage collected.
+
+    If object class defines `updateMany(objects)`, due objects of this class
+    are refreshed together by batches of `batch` objects, else `update()` is
+    called for each one. If `height` callable is given, refresh of an object
+    is skipped while returned height did not change since its last refresh.
+    Refreshes run within the context objects were added in, so a peer bound
+    with `dposlib.rest.usePeer` is kept.
+
+    ```python
+    >>> scheduler = Scheduler(30, jitter=0.1, workers=8)
+    >>> scheduler.add(wallet, interval=10)
+    >>> scheduler.stats()
+    {'objects': 1, 'refreshed': 0, 'batches': 0, 'skipped': 0, 'errors': 0}
+    ```
+
+    Args:
+        interval (float): default refresh interval in seconds.
+        jitter (float): interval ratio randomly added or removed.
+        workers (int): maximum number of concurrent refreshes.
+        batch (int): maximum number of objects refreshed together.
+        height (callable): returns current blockchain height.
+    """
+
+    def __init__(self, interval=30., jitter=0.1, workers=8, batch=100,
+                 height=None):
+        self.interval = interval
+        self.jitter = jitter
+        self.workers = workers
+        self.batch = batch
+        self.height = height
+        self.refreshed = self.batches = self.skipped = self.errors = 0
+        self._heap = []
+        self._items = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def _delay(self, interval):
+        return interval * (1 + self.jitter * (2 * random.random() - 1))
+
+    def add(self, obj, interval=None):
+        """
+        Schedule object refresh.
+
+        Args:
+            obj (object): object with `update` method.
+            interval (float): refresh interval in seconds, default to
+                scheduler interval.
+        """
+        interval = self.interval if interval is None else interval
+        with self._lock:
+            former = self._items.get(id(obj), None)
+            if former is not None:
+                former[2] = None
+            # [due, order, reference, interval, last height, in flight, key,
+            #  context]
+            item = [time.time() + self._delay(interval), self._count,
+                    weakref.ref(obj), interval, None, False, id(obj),
+                    contextvars.copy_context()]
+            self._count += 1
+            self._items[id(obj)] = item
+            heapq.heappush(self._heap, item)
+            if self._thread is None:
+                self._event.clear()
+                self._thread = threading.Thread(target=self._loop)
+                self._thread.daemon = True
+                self._thread.start()
+        self._event.set()
+
+    def remove(self, obj):
+        """Unschedule object refresh."""
+        with self._lock:
+            item = self._items.pop(id(obj), None)
+            if item is not None:
+                item[2] = None
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                # forget removed and garbage collected objects
+                while len(self._heap) and (
+                    self._heap[0][2] is None or self._heap[0][2]() is None
+                ):
+                    self._forget(heapq.heappop(self._heap))
+                if not len(self._heap):
+                    self._thread = None
+                    return
+                timeout = self._heap[0][0] - time.time()
+            if timeout > 0:
+                self._event.wait(timeout)
+                self._event.clear()
+            else:
+                self.tick()
+
+    def _forget(self, item):
+        if self._items.get(item[6], None) is item:
+            self._items.pop(item[6])
+
+    def tick(self):
+        """
+        Dispatch due refreshes to workers and reschedule them.
+        """
+        now, due = time.time(), []
+        with self._lock:
+            while len(self._heap) and self._heap[0][0] <= now:
+                item = heapq.heappop(self._heap)
+                if item[2] is None:
+                    continue
+                obj = item[2]()
+                if obj is None:
+                    self._forget(item)
+                    continue
+                item[0] = now + self._delay(item[3])
+                heapq.heappush(self._heap, item)
+                # refresh still running from previous dispatch
+                if not item[5]:
+                    due.append((item, obj))
+        if not len(due):
+            return
+
+        height = None
+        if self.height is not None:
+            try:
+                height = self.height()
+            except Exception:
+                height = None
+        self._dispatch(due, height, True)
+
+    def refresh(self, select=None, height=None):
+        """
+        Refresh immediately objects selected by `select` callable, all if
+        `None`. Objects not selected are considered up to date at `height`.
+
+        Args:
+            select (callable): object filter.
+            height (int): blockchain height.
+        """
+        due = []
+        with self._lock:
+            items = list(self._items.values())
+        for item in items:
+            obj = item[2]() if item[2] is not None else None
+            if obj is None:
+                continue
+            if select is None or select(obj):
+                if not item[5]:
+                    due.append((item, obj))
+            elif height is not None:
+                item[4] = height
+        self._dispatch(due, height, False)
+
+    def _dispatch(self, due, height, skip):
+        groups = {}
+        for item, obj in due:
+            if skip and height is not None and item[4] == height:
+                with self._lock:
+                    self.skipped += 1
+                continue
+            item[4], item[5] = height, True
+            groups.setdefault(
+                (type(obj), _contextKey(item[7])), []
+            ).append((item, obj))
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers)
+        for (cls, key), group in groups.items():
+            # a context can not be entered by two threads at once
+            context = group[0][0][7]
+            if hasattr(cls, "updateMany"):
+                for i in range(0, len(group), self.batch):
+                    self._executor.submit(
+                        context.copy().run, self._refresh, cls.updateMany,
+                        group[i:i + self.batch]
+                    )
+            else:
+                for entry in group:
+                    self._executor.submit(
+                        context.copy().run, self._refresh, None, [entry]
+                    )
+
+    def _refresh(self, function, group):
+        objects = [obj for item, obj in group]
+        try:
+            if function is None:
+                objects[0].update()
+            else:
+                function(objects)
+            with self._lock:
+                self.batches += function is not None
+                self.refreshed += len(objects)
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            # height not reached for objects not refreshed
+            for item, obj in group:
+                item[4] = None
+        finally:
+            for item, obj in group:
+                item[5] = False
+
+    def objects(self):
+        """
+        Get scheduled objects.
+
+        Returns:
+            list: objects still alive.
+        """
+        with self._lock:
+            references = [item[2] for item in self._items.values()]
+        return [
+            obj for obj in [ref() for ref in references if ref is not None]
+            if obj is not None
+        ]
+
+    def stop(self):
+        """Unschedule all objects and stop workers."""
+        with self._lock:
+            for item in self._heap:
+                item[2] = None
+            self._items.clear()
+        self._event.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self):
+        """
+        Get refresh statistics.
+
+        Returns:
+            dict: scheduled object, refresh, batch, skip and error counts.
+        """
+        return {
+            "objects": len(self._items),
+            "refreshed": self.refreshed,
+            "batches": self.batches,
+            "skipped": self.skipped,
+            "errors": self.errors
+        }
+
+
+def getSemaphore(value):
+    """
+    Get the `asyncio.Semaphore` bounding concurrency within the running event
+    loop. A new one is created if `value` changes.
+
+    Args:
+        value (int): maximum number of concurrent holders.
+
+    Returns:
+        asyncio.Semaphore: loop semaphore.
+    """
+    loop = asyncio.get_running_loop()
+    size, semaphore = SEMAPHORES.get(loop, (None, None))
+    if size != value:
+        semaphore = asyncio.Semaphore(value)
+        SEMAPHORES[loop] = (value, semaphore)
+    return semaphore
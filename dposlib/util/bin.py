@@ -2,6 +2,7 @@
 
 import re
 import struct
+import hashlib
 import binascii
 import base58
 
@@ -10,6 +11,16 @@ import base58
 HEX = re.compile("^[0-9a-fA-F]*$")
 BHEX = re.compile(b"^[0-9a-fA-F]*$")
 
+# base58 alphabet and digit pairs, encoding two digits per division
+B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+B58_PAIRS = [a + b for a in B58_ALPHABET for b in B58_ALPHABET]
+
+# precompiled little endian integer layouts
+UINT8 = struct.Struct("<B")
+UINT16 = struct.Struct("<H")
+UINT32 = struct.Struct("<I")
+UINT64 = struct.Struct("<Q")
+
 
 def intasb(i):
     # int as byte conversion
@@ -37,8 +48,8 @@ def unpack_bytes(f, n):
 
 
 def pack_bytes(f, v):
-    # write bytes into buffer
-    return pack("<%ss" % len(v), f, (v,))
+    # write bytes into buffer, struct.pack("<%ss" % len(v), v) is v itself
+    return f.write(v)
 
 
 def hexlify(data):
@@ -63,9 +74,65 @@ def unhexlify(data):
     return result if isinstance(result, bytes) else result.encode()
 
 
+def b58encode(data):
+    # base58 encoding using 58**2 divisor and digit pairs lookup, it halves
+    # the number of big integer divisions
+    n = int.from_bytes(data, "big")
+    pairs = []
+    while n:
+        n, r = divmod(n, 3364)
+        pairs.append(B58_PAIRS[r])
+    # leading zero bytes are encoded as "1"
+    pad = len(data) - len(data.lstrip(b"\x00"))
+    return "1" * pad + "".join(reversed(pairs)).lstrip("1")
+
+
+def b58encode_check(data):
+    # base58 encoding with 4-bytes double sha256 checksum
+    checksum = hashlib.sha256(hashlib.sha256(data).digest()).digest()[:4]
+    return b58encode(data + checksum)
+
+
 def checkAddress(address, awaited_marker=None):
     decoded = base58.b58decode_check(address)
     if decoded:
         if awaited_marker is not None:
             assert decoded[0] == awaited_marker, "wrong network address"
         return address
+
+
+class BytesReader(object):
+    """
+    Read binary data from a `memoryview` without copying it. Slices returned
+    by `read` share memory with the source buffer.
+
+    Args:
+        data (bytes or bytearray or memoryview): source buffer.
+        offset (int): starting read position.
+    """
+
+    def __init__(self, data, offset=0):
+        self.view = data if isinstance(data, memoryview) else memoryview(data)
+        self.offset = offset
+
+    def __len__(self):
+        # remaining bytes to read
+        return len(self.view) - self.offset
+
+    def peek(self):
+        # next byte value without moving read position
+        return self.view[self.offset]
+
+    def read(self, n):
+        # read n bytes as memoryview slice
+        start, end = self.offset, self.offset + n
+        if end > len(self.view):
+            raise Exception("unexpected end of data")
+        self.offset = end
+        return self.view[start:end]
+
+    def unpack(self, layout):
+        # read values using precompiled struct layout
+        values = layout.unpack_from(self.view, self.offset)
+        self.offset += layout.size
+        return values
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache for immutable REST responses, stored in a sqlite database.
+A response is stored only if its endpoint path matches a rule and if the
+rule condition holds on response, so only final blocks and confirmed
+transactions are kept. Confirmation counts keep changing so they are
+removed from stored records. Database size is capped and least recently
+used responses are evicted first. Access times of cache hits are kept in
+memory and written by batches, so reading does not cost a disk commit.
+
+```python
+>>> from dposlib import rest
+>>> cache = rest.useCache("~/.dposlib/ark.cache", maxsize=256 * 1024**2)
+>>> block = rest.GET.api.blocks(1)  # fetched from peer and stored
+>>> block = rest.GET.api.blocks(1)  # read from cache
+>>> cache.stats()["hits"]
+1
+```
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+
+from dposlib import cfg
+
+
+def _final(record):
+    # enough confirmations to consider block or transaction irreversible
+    return isinstance(record, dict) and record.get("confirmations", 0) >= \
+        getattr(cfg, "activeDelegates", 51)
+
+
+#: record fields changing over time, not stored
+VOLATILE = ["confirmations"]
+
+
+def _immutable(response):
+    # response copy without volatile fields in its records
+    def strip(record):
+        return dict(
+            (k, v) for k, v in record.items() if k not in VOLATILE
+        ) if isinstance(record, dict) else record
+
+    data = response.get("data", None)
+    return dict(
+        response, data=[strip(r) for r in data]
+        if isinstance(data, list) else strip(data)
+    ) if "data" in response else response
+
+
+#: default cacheability rules as (path regex, condition on response) pairs
+RULES = [
+    # block by id or height
+    (r"^/api/blocks/(\d+|[0-9a-fA-F]{64})$",
+     lambda r: _final(r.get("data"))),
+    # transactions of a block
+    (r"^/api/blocks/(\d+|[0-9a-fA-F]{64})/transactions$",
+     lambda r: len(r.get("data", [])) > 0 and all(
+         _final(record) for record in r["data"]
+     )),
+    # transaction by id
+    (r"^/api/transactions/[0-9a-fA-F]{64}$",
+     lambda r: _final(r.get("data"))),
+]
+
+
+class ResponseCache(object):
+    """
+    Thread-safe sqlite response cache with LRU eviction.
+
+    Args:
+        path (str): database file path.
+        maxsize (int): maximum size of stored responses in bytes.
+        rules (list): cacheability rules as (path regex, condition) pairs.
+        batch (int): number of access times kept in memory before they are
+            written.
+    """
+
+    def __init__(self, path, maxsize=64 * 1024**2, rules=None, batch=256):
+        path = os.path.expanduser(path)
+        if os.path.dirname(path) and not os.path.exists(
+            os.path.dirname(path)
+        ):
+            os.makedirs(os.path.dirname(path))
+        self.path = path
+        self.maxsize = maxsize
+        self.rules = [
+            (re.compile(pattern), condition)
+            for pattern, condition in (RULES if rules is None else rules)
+        ]
+        self.batch = batch
+        self.hits = self.misses = self.stores = self.evictions = 0
+        self._used = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT, size INTEGER, used REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS used_index ON responses(used)"
+        )
+        self._db.commit()
+        self.size = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def cacheable(self, path, response):
+        """
+        Check if a response can be stored.
+
+        Args:
+            path (str): endpoint path.
+            response (dict): response.
+
+        Returns:
+            bool: True if a rule matches path and its condition holds.
+        """
+        if not isinstance(response, dict) or \
+           response.get("status", 200) != 200:
+            return False
+        for regexp, condition in self.rules:
+            if regexp.match(path):
+                try:
+                    return bool(condition(response))
+                except Exception:
+                    return False
+        return False
+
+    def get(self, key):
+        """
+        Get a stored response and mark it as recently used.
+
+        Args:
+            key (str): request key.
+
+        Returns:
+            dict: response or `None` if not found.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM responses WHERE key=?", (key, )
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._used[key] = time.time()
+            if len(self._used) >= self.batch:
+                self._flush()
+                self._db.commit()
+        return json.loads(row[0])
+
+    def _flush(self):
+        # write access times of cache hits
+        if len(self._used):
+            self._db.executemany(
+                "UPDATE responses SET used=? WHERE key=?",
+                [(used, key) for key, used in self._used.items()]
+            )
+            self._used.clear()
+
+    def store(self, key, path, response):
+        """
+        Store a response if cacheable, evicting least recently used ones if
+        size cap is reached. Volatile fields are not stored.
+
+        Args:
+            key (str): request key.
+            path (str): endpoint path.
+            response (dict): response.
+
+        Returns:
+            bool: True if response is stored.
+        """
+        if not self.cacheable(path, response):
+            return False
+        value = json.dumps(_immutable(response))
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size FROM responses WHERE key=?", (key, )
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+            self.size += len(value) - (0 if row is None else row[0])
+            self.stores += 1
+            self._used.pop(key, None)
+            self._evict()
+            self._db.commit()
+        return True
+
+    def _evict(self):
+        # delete least recently used responses until size fits the cap
+        if self.size > self.maxsize:
+            self._flush()
+        while self.size > self.maxsize:
+            rows = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY used LIMIT 64"
+            ).fetchall()
+            if not len(rows):
+                self.size = 0
+                break
+            for key, size in rows:
+                self._db.execute("DELETE FROM responses WHERE key=?", (key, ))
+                self._used.pop(key, None)
+                self.size -= size
+                self.evictions += 1
+                if self.size <= self.maxsize:
+                    break
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._used.clear()
+            self.size = 0
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.commit()
+            self._db.close()
+
+    def stats(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: hit, miss, store and eviction counts with stored size and
+                response count.
+        """
+        with self._lock:
+            count = self._db.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "size": self.size,
+            "count": count
+        }
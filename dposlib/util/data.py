@@ -4,6 +4,8 @@ import re
 import os
 import io
 import json
+import threading
+import collections
 
 # from dposlib import PY3
 
@@ -66,3 +68,196 @@ def filter_dic(value):
         )
     else:
         return value
+
+
+def _notify(obj):
+    # call observer callback if any and return it
+    callback = getattr(obj, "_callback", None)
+    if callback is not None:
+        callback()
+    return callback
+
+
+def observe(value, callback):
+    """
+    Wrap `dict` and `list` values, recursively, so `callback` is called on
+    each modification. Other values are returned as is.
+    """
+    if callback is None:
+        return value
+    elif isinstance(value, dict):
+        return ObservableDict(callback, value)
+    elif isinstance(value, list):
+        return ObservableList(callback, value)
+    else:
+        return value
+
+
+class ObservableDict(dict):
+    """
+    A python `dict` calling `callback` when modified. Nested `dict` and `list`
+    values are observed with the same callback.
+    """
+
+    def __init__(self, callback, *args, **kwargs):
+        dict.__init__(self)
+        self._callback = callback
+        dict.update(self, [
+            (k, observe(v, callback))
+            for k, v in dict(*args, **kwargs).items()
+        ])
+
+    def __setitem__(self, item, value):
+        dict.__setitem__(self, item, observe(value, _notify(self)))
+
+    def __delitem__(self, item):
+        dict.__delitem__(self, item)
+        _notify(self)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def update(self, *args, **kwargs):
+        callback = _notify(self)
+        dict.update(self, [
+            (k, observe(v, callback))
+            for k, v in dict(*args, **kwargs).items()
+        ])
+
+    def setdefault(self, item, default=None):
+        if item not in self:
+            self[item] = default
+        return dict.__getitem__(self, item)
+
+    def pop(self, *args):
+        _notify(self)
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        _notify(self)
+        return dict.popitem(self)
+
+    def clear(self):
+        _notify(self)
+        dict.clear(self)
+
+
+class ObservableList(list):
+    """
+    A python `list` calling `callback` when modified. Nested `dict` and `list`
+    values are observed with the same callback.
+    """
+
+    def __init__(self, callback, iterable=()):
+        list.__init__(self, [observe(v, callback) for v in iterable])
+        self._callback = callback
+
+    def __setitem__(self, index, value):
+        callback = _notify(self)
+        if isinstance(index, slice):
+            value = [observe(v, callback) for v in value]
+        else:
+            value = observe(value, callback)
+        list.__setitem__(self, index, value)
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        _notify(self)
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __imul__(self, other):
+        _notify(self)
+        return list.__imul__(self, other)
+
+    def append(self, value):
+        list.append(self, observe(value, _notify(self)))
+
+    def extend(self, values):
+        callback = _notify(self)
+        list.extend(self, [observe(v, callback) for v in values])
+
+    def insert(self, index, value):
+        list.insert(self, index, observe(value, _notify(self)))
+
+    def pop(self, *args):
+        _notify(self)
+        return list.pop(self, *args)
+
+    def remove(self, value):
+        list.remove(self, value)
+        _notify(self)
+
+    def clear(self):
+        _notify(self)
+        list.clear(self)
+
+    def sort(self, *args, **kwargs):
+        _notify(self)
+        list.sort(self, *args, **kwargs)
+
+    def reverse(self):
+        _notify(self)
+        list.reverse(self)
+
+
+class LRUCache(object):
+    """
+    Bounded and thread-safe least recently used cache with hit and miss
+    statistics. A `maxsize` of `0` disables it.
+
+    Args:
+        maxsize (int): maximum number of items stored.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def resize(self, maxsize):
+        # a lower size drops least recently used items
+        with self._lock:
+            self.maxsize = max(0, maxsize or 0)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize
+        }
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+"""
+Request pacing. Token buckets limit request rate globally and per peer, a
+semaphore bounds the number of requests in flight. Peers answering `429` or
+advertising an exhausted quota through rate limit headers are paused until
+quota reset. Paused peers are avoided by peer selection and a request is
+not delayed longer than `cfg.timeout`, it fails over to another peer.
+
+```python
+>>> from dposlib import cfg
+>>> cfg.ratelimit = 20      # requests per second, all peers
+>>> cfg.peerratelimit = 5   # requests per second and per peer
+>>> cfg.maxinflight = 8     # concurrent requests
+>>> from dposlib.util import limit
+>>> limit.GOVERNOR.stats()["throttled"]
+0
+```
+"""
+
+import time
+import threading
+
+from urllib.parse import urlparse
+from email.utils import parsedate_to_datetime
+
+
+def _key(peer):
+    url = urlparse(peer)
+    return "%s://%s" % (url.scheme, url.netloc)
+
+
+def _seconds(value, now):
+    # delay from a delta in seconds, an epoch in s or ms or an HTTP date
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        try:
+            return parsedate_to_datetime(value).timestamp() - now
+        except Exception:
+            return None
+    if value > 1e12:
+        return value / 1000. - now
+    if value > 1e9:
+        return value - now
+    return value
+
+
+class TokenBucket(object):
+    """
+    Thread-safe token bucket. Tokens are reserved in advance so caller knows
+    how long to wait, blocking or not.
+
+    Args:
+        rate (float): tokens per second, 0 for no limit.
+        burst (float): bucket capacity, default to one second of tokens.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1., rate)
+        self.tokens = float(self.burst)
+        self.last = time.time()
+        self.paused = 0.
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token.
+
+        Returns:
+            float: seconds to wait before using it.
+        """
+        with self._lock:
+            now = time.time()
+            wait = max(0., self.paused - now)
+            if self.rate > 0:
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.last) * self.rate
+                ) - 1
+                if self.tokens < 0:
+                    wait = max(wait, -self.tokens / self.rate)
+            self.last = now
+            return wait
+
+    def refund(self):
+        """Give back a token reserved but not used."""
+        with self._lock:
+            if self.rate > 0:
+                self.tokens = min(self.burst, self.tokens + 1)
+
+    def pause(self, seconds):
+        """Delay next tokens of `seconds` from now."""
+        with self._lock:
+            self.paused = max(self.paused, time.time() + seconds)
+
+
+class Governor(object):
+    """
+    Global and per peer rate limits with a bound on requests in flight.
+
+    Args:
+        rate (float): global requests per second, 0 for no limit.
+        peerrate (float): requests per second and per peer, 0 for no limit.
+        inflight (int): maximum concurrent requests, 0 for no limit.
+    """
+
+    def __init__(self, rate=0, peerrate=0, inflight=0):
+        self.rate = self.peerrate = self.inflight = None
+        self.waited = 0.
+        self.requests = self.throttled = self.rejected = 0
+        self._buckets = {}
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self.configure(rate, peerrate, inflight)
+
+    def configure(self, rate=0, peerrate=0, inflight=0):
+        """
+        Change limits, buckets and semaphore are reset only if values change.
+        """
+        with self._lock:
+            if rate != self.rate:
+                self.rate = rate
+                self._global = TokenBucket(rate)
+            if peerrate != self.peerrate:
+                self.peerrate = peerrate
+                self._buckets = dict(
+                    (peer, TokenBucket(peerrate))
+                    for peer in self._buckets
+                )
+            if inflight != self.inflight:
+                self.inflight = inflight
+                self._semaphore = threading.BoundedSemaphore(inflight) \
+                    if inflight else None
+
+    def _bucket(self, peer):
+        key = _key(peer)
+        with self._lock:
+            bucket = self._buckets.get(key, None)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.peerrate)
+        return bucket
+
+    def paused(self, peer):
+        """
+        Get remaining pause of a peer.
+
+        Args:
+            peer (str): peer url.
+
+        Returns:
+            float: seconds before peer accepts requests again.
+        """
+        return max(0., self._bucket(peer).paused - time.time())
+
+    def reserve(self, peer, timeout=None):
+        """
+        Take global and peer tokens.
+
+        Args:
+            peer (str): peer url.
+            timeout (float): maximum wait in seconds, tokens are given back
+                and an exception is raised beyond.
+
+        Returns:
+            float: seconds to wait before sending request.
+        """
+        buckets = [self._global, self._bucket(peer)]
+        wait = max([bucket.reserve() for bucket in buckets])
+        if timeout is not None and wait > timeout:
+            for bucket in buckets:
+                bucket.refund()
+            with self._lock:
+                self.rejected += 1
+            raise Exception("%s paused for %.1f seconds" % (_key(peer), wait))
+        with self._lock:
+            self.requests += 1
+            self.waited += wait
+        return wait
+
+    def acquire(self, peer, timeout=None):
+        """
+        Wait for a free slot and then for tokens, so tokens are not spent
+        while waiting for the slot.
+
+        Args:
+            peer (str): peer url.
+            timeout (float): maximum wait for tokens in seconds.
+
+        Returns:
+            threading.BoundedSemaphore: semaphore to release once response
+                received or `None`.
+        """
+        semaphore = self._semaphore
+        if semaphore is not None:
+            semaphore.acquire()
+        try:
+            wait = self.reserve(peer, timeout)
+        except Exception:
+            if semaphore is not None:
+                semaphore.release()
+            raise
+        if wait > 0:
+            time.sleep(wait)
+        return semaphore
+
+    def feedback(self, peer, status, headers):
+        """
+        Pause peer according to `Retry-After` or rate limit headers.
+
+        Args:
+            peer (str): peer url.
+            status (int): response status.
+            headers (dict): response headers.
+        """
+        now = time.time()
+        headers = dict((k.lower(), v) for k, v in headers.items())
+        delay = None
+        if status in [429, 503] and "retry-after" in headers:
+            delay = _seconds(headers["retry-after"], now)
+        for prefix in ["x-ratelimit-", "ratelimit-", "x-rate-limit-"]:
+            remaining = headers.get(prefix + "remaining", None)
+            if remaining is not None:
+                try:
+                    exhausted = float(remaining) <= 0
+                except ValueError:
+                    exhausted = False
+                if exhausted and prefix + "reset" in headers:
+                    delay = max(
+                        delay or 0.,
+                        _seconds(headers[prefix + "reset"], now) or 0.
+                    )
+                break
+        if status == 429:
+            with self._lock:
+                self.throttled += 1
+            # no hint given, back off one second
+            delay = 1. if delay is None else delay
+        if delay is not None and delay > 0:
+            self._bucket(peer).pause(delay)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._global = TokenBucket(self.rate)
+
+    def stats(self):
+        """
+        Get pacing statistics.
+
+        Returns:
+            dict: limits, request, throttled and rejected counts, total
+                waiting time and paused peers with remaining pause in
+                seconds.
+        """
+        now = time.time()
+        return {
+            "rate": self.rate,
+            "peerrate": self.peerrate,
+            "inflight": self.inflight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "rejected": self.rejected,
+            "waited": self.waited,
+            "paused": dict(
+                (peer, bucket.paused - now)
+                for peer, bucket in list(self._buckets.items())
+                if bucket.paused > now
+            )
+        }
+
+
+#: governor used by `dposlib.rest` requests
+GOVERNOR = Governor()
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+
+"""
+Persistent HTTP/1.1 connection pools. Each peer gets its own pool of
+keep-alive connections so TCP and TLS handshakes are paid once per
+connection instead of once per request.
+
+```python
+>>> from dposlib.util.pool import getPool
+>>> pool = getPool("https://api.ark.io")
+>>> status, headers, body = pool.request("GET", "/api/blockchain")
+>>> pool.stats()["reuse"]
+0.0
+```
+"""
+
+import ssl
+import time
+import asyncio
+import weakref
+import threading
+import collections
+
+from http import client
+from urllib.parse import urlparse
+
+CTX = ssl.create_default_context()
+CTX.check_hostname = False
+CTX.verify_mode = ssl.CERT_NONE
+
+# errors raised when a kept-alive connection was closed by peer
+STALE = (
+    client.RemoteDisconnected, client.CannotSendRequest,
+    client.BadStatusLine, ConnectionResetError, BrokenPipeError
+)
+
+POOLS = {}
+LOCK = threading.Lock()
+# asyncio pools indexed by event loop
+ASYNC_POOLS = weakref.WeakKeyDictionary()
+
+
+class ConnectionPool(object):
+    """
+    Keep-alive connections to a single peer. Connections are created on
+    demand, at most `size` idle ones are kept and those idle for more than
+    `idle` seconds are closed. Peer health is tracked with consecutive
+    failures.
+
+    Args:
+        peer (str): peer url as `scheme://host:port`.
+        size (int): maximum number of idle connections kept.
+        idle (float): idle timeout in seconds.
+        threshold (int): consecutive failures before peer is unhealthy.
+    """
+
+    def __init__(self, peer, size=10, idle=30., threshold=3):
+        url = urlparse(peer)
+        self.peer = "%s://%s" % (url.scheme, url.netloc)
+        self.netloc = url.netloc
+        self.https = url.scheme == "https"
+        self.host = url.hostname
+        self.port = url.port
+        self.size = size
+        self.idle = idle
+        self.threshold = threshold
+        self.requests = self.reused = self.created = self.errors = 0
+        self.failures = 0
+        self.last_error = None
+        self._idle = collections.deque()
+        self._lock = threading.Lock()
+
+    @property
+    def healthy(self):
+        return self.failures < self.threshold
+
+    def _connect(self, timeout):
+        with self._lock:
+            self.created += 1
+        if self.https:
+            return client.HTTPSConnection(
+                self.host, self.port, timeout=timeout, context=CTX
+            )
+        return client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _get(self, timeout):
+        # most recently used connection first, expired ones are closed
+        now = time.time()
+        with self._lock:
+            while len(self._idle):
+                conn, last = self._idle.pop()
+                if now - last < self.idle:
+                    self.reused += 1
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+        return self._connect(timeout), False
+
+    def _put(self, conn):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((conn, time.time()))
+                return
+        conn.close()
+
+    def request(self, method, path, body=None, headers={}, timeout=5):
+        """
+        Send an HTTP request using a pooled connection. A reused connection
+        found closed by peer is replaced once by a new one.
+
+        Args:
+            method (str): HTTP method.
+            path (str): url path with query string.
+            body (bytes): request body.
+            headers (dict): request headers.
+            timeout (float): socket timeout in seconds.
+
+        Returns:
+            tuple: status code, response headers as `dict` and body as
+                `bytes`.
+        """
+        with self._lock:
+            self.requests += 1
+        conn, reused = self._get(timeout)
+        try:
+            try:
+                conn.request(method, path, body, headers)
+                res = conn.getresponse()
+            except STALE:
+                conn.close()
+                if not reused:
+                    raise
+                conn = self._connect(timeout)
+                conn.request(method, path, body, headers)
+                res = conn.getresponse()
+            data = res.read()
+        except Exception as error:
+            conn.close()
+            with self._lock:
+                self.errors += 1
+                self.failures += 1
+                self.last_error = "%r" % error
+            raise
+
+        with self._lock:
+            self.failures = 0
+        if res.will_close:
+            conn.close()
+        else:
+            self._put(conn)
+        return res.status, dict(res.getheaders()), data
+
+    def close(self):
+        with self._lock:
+            while len(self._idle):
+                self._idle.pop()[0].close()
+
+    def stats(self):
+        """
+        Get pool statistics.
+
+        Returns:
+            dict: request, connection, reuse rate and health values.
+        """
+        return {
+            "requests": self.requests,
+            "created": self.created,
+            "reused": self.reused,
+            "reuse": (self.reused / self.requests) if self.requests else 0.,
+            "idle": len(self._idle),
+            "errors": self.errors,
+            "failures": self.failures,
+            "healthy": self.healthy,
+            "last_error": self.last_error
+        }
+
+
+def getPool(peer, size=10, idle=30.):
+    """
+    Get the connection pool associated to a peer, creating it if needed.
+
+    Args:
+        peer (str): peer url.
+        size (int): maximum number of idle connections kept.
+        idle (float): idle timeout in seconds.
+
+    Returns:
+        dposlib.util.pool.ConnectionPool: peer connection pool.
+    """
+    url = urlparse(peer)
+    key = "%s://%s" % (url.scheme, url.netloc)
+    pool = POOLS.get(key, None)
+    if pool is None:
+        with LOCK:
+            pool = POOLS.setdefault(key, ConnectionPool(key, size, idle))
+    pool.size, pool.idle = size, idle
+    return pool
+
+
+def closePools():
+    """
+    Close all idle connections and forget pools, asyncio ones included.
+    Asyncio pools of an event loop running in another thread are closed
+    within that loop.
+    """
+    with LOCK:
+        for pool in POOLS.values():
+            pool.close()
+        POOLS.clear()
+    try:
+        current = asyncio.get_running_loop()
+    except RuntimeError:
+        current = None
+    for loop, pools in list(ASYNC_POOLS.items()):
+        # streams of a closed loop are already released
+        if loop.is_closed():
+            continue
+        for pool in pools.values():
+            if loop.is_running() and loop is not current:
+                loop.call_soon_threadsafe(pool.close)
+            else:
+                pool.close()
+    ASYNC_POOLS.clear()
+
+
+def stats():
+    """
+    Get statistics of all pools.
+
+    Returns:
+        dict: pool statistics indexed by peer.
+    """
+    return dict((peer, pool.stats()) for peer, pool in list(POOLS.items()))
+
+
+class AsyncConnectionPool(ConnectionPool):
+    """
+    Asyncio counterpart of
+    [`ConnectionPool`](pool.md#dposlib.util.pool.ConnectionPool), built on
+    `asyncio` streams. A pool is bound to the event loop it was created in.
+    """
+
+    async def _aconnect(self):
+        with self._lock:
+            self.created += 1
+        return await asyncio.open_connection(
+            self.host, self.port or (443 if self.https else 80),
+            ssl=CTX if self.https else None,
+            server_hostname=self.host if self.https else None
+        )
+
+    def _aget(self):
+        # most recently used stream pair first, expired ones are closed
+        now = time.time()
+        with self._lock:
+            while len(self._idle):
+                streams, last = self._idle.pop()
+                if now - last < self.idle and not streams[0].at_eof():
+                    self.reused += 1
+                    return streams
+                streams[1].close()
+        return None
+
+    def _aput(self, streams):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((streams, time.time()))
+                return
+        streams[1].close()
+
+    async def _exchange(self, streams, method, path, body, headers):
+        reader, writer = streams
+        lines = ["%s %s HTTP/1.1" % (method, path), "Host: %s" % self.netloc]
+        lines.extend("%s: %s" % item for item in headers.items())
+        if body is not None:
+            lines.append("Content-Length: %d" % len(body))
+        writer.write(
+            ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b"")
+        )
+        await writer.drain()
+        return await _readResponse(reader, method)
+
+    async def request(self, method, path, body=None, headers={}, timeout=5):
+        """
+        Send an HTTP request using a pooled stream pair. A reused connection
+        found closed by peer is replaced once by a new one.
+
+        Args:
+            method (str): HTTP method.
+            path (str): url path with query string.
+            body (bytes): request body.
+            headers (dict): request headers.
+            timeout (float): request timeout in seconds.
+
+        Returns:
+            tuple: status code, response headers as `dict` and body as
+                `bytes`.
+        """
+        with self._lock:
+            self.requests += 1
+        streams = self._aget()
+        try:
+            reused = streams is not None
+            if not reused:
+                streams = await asyncio.wait_for(self._aconnect(), timeout)
+            try:
+                status, res_headers, data, keep = await asyncio.wait_for(
+                    self._exchange(streams, method, path, body, headers),
+                    timeout
+                )
+            except STALE + (asyncio.IncompleteReadError, ):
+                streams[1].close()
+                if not reused:
+                    raise
+                streams = await asyncio.wait_for(self._aconnect(), timeout)
+                status, res_headers, data, keep = await asyncio.wait_for(
+                    self._exchange(streams, method, path, body, headers),
+                    timeout
+                )
+        except BaseException as error:
+            if streams is not None:
+                streams[1].close()
+            with self._lock:
+                self.errors += 1
+                self.failures += 1
+                self.last_error = "%r" % error
+            raise
+
+        with self._lock:
+            self.failures = 0
+        if keep:
+            self._aput(streams)
+        else:
+            streams[1].close()
+        return status, res_headers, data
+
+    def close(self):
+        with self._lock:
+            while len(self._idle):
+                self._idle.pop()[0][1].close()
+
+
+async def _readResponse(reader, method):
+    # parse HTTP/1.x status line, headers and body
+    line = await reader.readline()
+    if not line:
+        raise client.RemoteDisconnected("connection closed by peer")
+    version, status = line.decode("latin-1").split(None, 2)[:2]
+    status = int(status)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in [b"\r\n", b"\n", b""]:
+            break
+        key, value = line.decode("latin-1").split(":", 1)
+        headers[key.strip()] = value.strip()
+    lower = dict((k.lower(), v.lower()) for k, v in headers.items())
+
+    keep = version == "HTTP/1.1" and lower.get("connection") != "close"
+    if method == "HEAD" or status in [204, 304] or 100 <= status < 200:
+        body = b""
+    elif "chunked" in lower.get("transfer-encoding", ""):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # skip trailers
+                while (await reader.readline()) not in [b"\r\n", b"\n", b""]:
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        body = b"".join(chunks)
+    elif "content-length" in lower:
+        body = await reader.readexactly(int(lower["content-length"]))
+    else:
+        body, keep = await reader.read(), False
+    return status, headers, body, keep
+
+
+def getAsyncPool(peer, size=10, idle=30.):
+    """
+    Get the asyncio connection pool associated to a peer within the running
+    event loop, creating it if needed.
+
+    Args:
+        peer (str): peer url.
+        size (int): maximum number of idle connections kept.
+        idle (float): idle timeout in seconds.
+
+    Returns:
+        dposlib.util.pool.AsyncConnectionPool: peer connection pool.
+    """
+    url = urlparse(peer)
+    key = "%s://%s" % (url.scheme, url.netloc)
+    pools = ASYNC_POOLS.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(key, None)
+    if pool is None:
+        pool = pools[key] = AsyncConnectionPool(key, size, idle)
+    pool.size, pool.idle = size, idle
+    return pool
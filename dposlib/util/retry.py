@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""
+Retry budget shared by all HTTP requests. Each request deposits a fraction
+of token and each retry or hedged request withdraws a whole one, so retries
+can not exceed a given ratio of the traffic once the reserve is exhausted.
+A network outage does not turn into a retry storm.
+
+```python
+>>> from dposlib.util import retry
+>>> retry.BUDGET.stats()
+{'requests': 0, 'retries': 0, 'hedges': 0, 'rejected': 0, 'balance': 10.0}
+```
+"""
+
+import threading
+
+
+class RetryBudget(object):
+    """
+    Thread-safe retry token bucket.
+
+    Args:
+        ratio (float): token deposited per request.
+        reserve (float): initial and maximum token balance.
+    """
+
+    def __init__(self, ratio=0.1, reserve=10.):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = float(reserve)
+        self.requests = self.retries = self.hedges = self.rejected = 0
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """Record a request."""
+        with self._lock:
+            self.requests += 1
+            self.balance = min(self.reserve, self.balance + self.ratio)
+
+    def withdraw(self, hedge=False):
+        """
+        Ask for a retry or a hedged request.
+
+        Args:
+            hedge (bool): hedged request if True, retry otherwise.
+
+        Returns:
+            bool: True if allowed.
+        """
+        with self._lock:
+            if self.balance < 1:
+                self.rejected += 1
+                return False
+            self.balance -= 1
+            if hedge:
+                self.hedges += 1
+            else:
+                self.retries += 1
+            return True
+
+    def reset(self):
+        with self._lock:
+            self.balance = float(self.reserve)
+            self.requests = self.retries = self.hedges = self.rejected = 0
+
+    def stats(self):
+        """
+        Get budget statistics.
+
+        Returns:
+            dict: request, retry, hedge and rejection counts with current
+                balance.
+        """
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "rejected": self.rejected,
+            "balance": self.balance
+        }
+
+
+#: budget used by `dposlib.rest` requests
+BUDGET = RetryBudget()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+"""
+Peer scoreboard used to route HTTP requests. Each peer is scored on its
+latency and error rate, both smoothed with an exponentially weighted moving
+average, and on its height lag behind the highest known peer. Requests are
+routed with the power-of-two-choices policy: two eligible peers are drawn at
+random and the best scored one is used.
+
+Peers failing `threshold` times in a row are ejected for a cooldown period
+doubling on each consecutive ejection. Once cooldown expired they get
+traffic again and recover completely on first success.
+
+```python
+>>> from dposlib.util import scoreboard
+>>> scoreboard.SCOREBOARD.record("http://127.0.0.1:4003", 0.120, True)
+>>> scoreboard.choose(cfg.peers)
+'http://127.0.0.1:4003'
+>>> scoreboard.stats()["http://127.0.0.1:4003"]["latency"]
+0.12
+```
+"""
+
+import time
+import random
+import threading
+
+from urllib.parse import urlparse
+
+
+def _key(peer):
+    url = urlparse(peer)
+    return "%s://%s" % (url.scheme, url.netloc)
+
+
+class PeerScore(object):
+    """
+    Score values of a single peer.
+    """
+
+    def __init__(self):
+        self.latency = None
+        self.errors = 0.
+        self.height = None
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected = 0.
+
+
+class Scoreboard(object):
+    """
+    Thread-safe peer scoreboard.
+
+    Args:
+        alpha (float): EWMA smoothing factor.
+        threshold (int): consecutive failures before peer ejection.
+        cooldown (float): first ejection duration in seconds.
+        maxcooldown (float): maximum ejection duration in seconds.
+        penalty (float): cost factor applied per block of height lag.
+    """
+
+    def __init__(self, alpha=0.3, threshold=3, cooldown=5., maxcooldown=300.,
+                 penalty=1.):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.maxcooldown = maxcooldown
+        self.penalty = penalty
+        self._peers = {}
+        self._lock = threading.Lock()
+
+    def _get(self, peer):
+        key = _key(peer)
+        score = self._peers.get(key, None)
+        if score is None:
+            score = self._peers[key] = PeerScore()
+        return score
+
+    def record(self, peer, latency, success=True):
+        """
+        Record a request result.
+
+        Args:
+            peer (str): peer url.
+            latency (float): request duration in seconds.
+            success (bool): request outcome.
+        """
+        with self._lock:
+            score = self._get(peer)
+            score.requests += 1
+            score.errors += self.alpha * ((not success) - score.errors)
+            if success:
+                score.latency = latency if score.latency is None else \
+                    score.latency + self.alpha * (latency - score.latency)
+                score.failures = score.ejections = 0
+                score.ejected = 0.
+            else:
+                score.failures += 1
+                if score.failures >= self.threshold:
+                    score.failures = 0
+                    score.ejections += 1
+                    score.ejected = time.time() + min(
+                        self.maxcooldown,
+                        self.cooldown * 2 ** (score.ejections - 1)
+                    )
+
+    def setHeight(self, peer, height):
+        """
+        Record peer height.
+
+        Args:
+            peer (str): peer url.
+            height (int): peer blockchain height.
+        """
+        with self._lock:
+            self._get(peer).height = height
+
+    def _cost(self, score, prior, top):
+        # expected latency penalized by error rate and height lag
+        latency = prior if score.latency is None else score.latency
+        lag = 0 if score.height is None or top is None else \
+            top - score.height
+        return latency * (1 + 10 * score.errors) * (1 + self.penalty * lag)
+
+    def _context(self):
+        # latency prior for unknown peers and highest known height
+        latencies = [
+            s.latency for s in self._peers.values() if s.latency is not None
+        ]
+        heights = [
+            s.height for s in self._peers.values() if s.height is not None
+        ]
+        return (
+            sum(latencies) / len(latencies) if latencies else 1.,
+            max(heights) if heights else None
+        )
+
+    def rank(self, peers):
+        """
+        Sort peers from best to worst, peers still ejected last.
+
+        Args:
+            peers (list): peer urls.
+
+        Returns:
+            list: sorted peer urls.
+        """
+        now = time.time()
+        with self._lock:
+            prior, top = self._context()
+            scores = [(peer, self._get(peer)) for peer in peers]
+            return [
+                peer for peer, score in sorted(
+                    scores, key=lambda e: (
+                        e[1].ejected > now,
+                        self._cost(e[1], prior, top)
+                    )
+                )
+            ]
+
+    def choose(self, peers):
+        """
+        Select a peer using power-of-two-choices policy. If all peers are
+        ejected, the one recovering first is returned.
+
+        Args:
+            peers (list): peer urls.
+
+        Returns:
+            str: peer url or `None` if `peers` is empty.
+        """
+        if not len(peers):
+            return None
+        now = time.time()
+        with self._lock:
+            eligible = [p for p in peers if self._get(p).ejected <= now]
+            if not len(eligible):
+                return min(peers, key=lambda p: self._get(p).ejected)
+            if len(eligible) == 1:
+                return eligible[0]
+            prior, top = self._context()
+            return min(
+                random.sample(eligible, 2),
+                key=lambda p: self._cost(self._get(p), prior, top)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._peers.clear()
+
+    def stats(self):
+        """
+        Get scoreboard state.
+
+        Returns:
+            dict: latency, error rate, height lag, ejection and cost values
+                indexed by peer.
+        """
+        now = time.time()
+        with self._lock:
+            prior, top = self._context()
+            return dict(
+                (peer, {
+                    "latency": score.latency,
+                    "errors": score.errors,
+                    "height": score.height,
+                    "lag": None if score.height is None or top is None
+                    else top - score.height,
+                    "requests": score.requests,
+                    "ejected": max(0., score.ejected - now),
+                    "cost": self._cost(score, prior, top)
+                }) for peer, score in self._peers.items()
+            )
+
+
+#: scoreboard used by `dposlib.rest` requests
+SCOREBOARD = Scoreboard()
+
+
+def choose(peers):
+    """
+    Select a peer from `SCOREBOARD` using `Scoreboard.choose`.
+    """
+    return SCOREBOARD.choose(peers)
+
+
+def stats():
+    """
+    Get `SCOREBOARD` state using `Scoreboard.stats`.
+    """
+    return SCOREBOARD.stats()
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""
+Serialization throughput per transaction type. Payload handlers from
+`dposlib.ark.serde` and full unsigned serialization are timed on the
+AIP11 fixtures and on a few solar v3 transactions, next to a legacy
+implementation packing each field with a format string through `pack` and
+`pack_bytes` as serializers did before struct layouts were precompiled.
+Both are timed in the same process, legacy output is checked against
+current one first.
+
+```bash
+$ python test/bench_serde.py 20000
+```
+"""
+
+import os
+import sys
+import struct
+import decimal
+import timeit
+
+from io import BytesIO
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+import base58  # noqa: E402
+
+from dposlib import cfg  # noqa: E402
+from dposlib.ark import serde, tx as tx_  # noqa: E402
+from dposlib.util import data  # noqa: E402
+from dposlib.util.bin import unhexlify, hexlify  # noqa: E402
+
+
+class _Tx(dict):
+    # serde stores cache values as attributes
+    pass
+
+
+def _fixtures():
+    txs = []
+    for tx in data.loadJson(os.path.join(
+        os.path.abspath(os.path.dirname(__file__)), "fixtures.json"
+    )):
+        for key in [k for k in ["amount", "fee", "nonce"] if k in tx]:
+            tx[key] = int(tx.pop(key))
+        for key in ["serialized", "id", "signature", "signatures"]:
+            tx.pop(key, None)
+        tx.setdefault("typeGroup", 1)
+        txs.append(_Tx(tx))
+
+    # large multipayment
+    multipayment = [tx for tx in txs if tx["type"] == 6][0]
+    payments = multipayment["asset"]["payments"]
+    txs.append(_Tx(multipayment, asset={
+        "payments": [
+            {"amount": i + 1, "recipientId": payments[i % len(payments)][
+                "recipientId"
+            ]} for i in range(64)
+        ]
+    }))
+
+    # solar v3 transactions
+    header = dict(
+        (k, v) for k, v in txs[0].items()
+        if k in ["network", "nonce", "senderPublicKey", "fee"]
+    )
+    recipientId = txs[0]["recipientId"]
+    txs.extend([
+        _Tx(header, version=3, typeGroup=1, type=3, asset={
+            "votes": ["-alpha", "+bravo"]
+        }),
+        _Tx(header, version=3, typeGroup=2, type=2, asset={
+            "votes": {"alpha": 33.34, "bravo": 33.33, "charlie": 33.33}
+        }),
+        _Tx(header, version=3, typeGroup=1, type=6, asset={
+            "transfers": [
+                {"amount": i + 1, "recipientId": recipientId}
+                for i in range(64)
+            ]
+        }),
+        _Tx(header, version=3, typeGroup=1, type=8, amount=1,
+            recipientId=recipientId, asset={"lock": {
+                "secretHash": "09b9a28393efd02fcd76a21b0f0f55ba"
+                              "2aad8f3640ff8cae86de033a9cfbd78c",
+                "expiration": {"type": 1, "value": 78740307}
+            }}),
+        _Tx(header, version=3, typeGroup=2, type=0, amount=1),
+    ])
+    return txs
+
+
+def _handler(tx, modules):
+    name = "_%(typeGroup)d_%(type)d" % tx
+    for version in range(tx["version"], 1, -1):
+        func = getattr(modules[version], name, None)
+        if func is not None:
+            return func
+
+
+# legacy serializers, a format string is built and parsed for every field
+def pack(fmt, buf, values):
+    buf.write(struct.pack(fmt, *values))
+
+
+def pack_bytes(buf, value):
+    pack("<%ss" % len(value), buf, (value,))
+
+
+def _address(value):
+    return base58.b58decode_check(
+        str(value) if not isinstance(value, bytes) else value
+    )
+
+
+class _V2(object):
+
+    def _1_0(tx, buf):
+        pack("<QI", buf, (
+            int(tx.get("amount", 0)), int(tx.get("expiration", 0))
+        ))
+        pack_bytes(buf, _address(tx["recipientId"]))
+
+    def _1_1(tx, buf):
+        pack_bytes(buf, unhexlify(tx["asset"]["signature"]["publicKey"]))
+
+    def _1_2(tx, buf):
+        username = tx["asset"]["delegate"]["username"]
+        pack("<B", buf, (len(username), ))
+        pack_bytes(buf, username.encode("utf-8"))
+
+    def _1_3(tx, buf):
+        votes = tx["asset"]["votes"]
+        pack("<B", buf, (len(votes), ))
+        for vote in votes:
+            pack_bytes(
+                buf, unhexlify(vote.replace("+", "01").replace("-", "00"))
+            )
+
+    def _1_4(tx, buf):
+        multiSignature = tx["asset"]["multiSignature"]
+        pack("<BB", buf, (
+            multiSignature["min"], len(multiSignature["publicKeys"])
+        ))
+        pack_bytes(buf, b"".join(
+            [unhexlify(key) for key in multiSignature["publicKeys"]]
+        ))
+
+    def _1_5(tx, buf):
+        ipfs = tx["asset"]["ipfs"]
+        pack_bytes(buf, base58.b58decode(
+            str(ipfs) if not isinstance(ipfs, bytes) else ipfs
+        ))
+
+    def _1_6(tx, buf, key="payments"):
+        items = [
+            (p["amount"], _address(p["recipientId"]))
+            for p in tx["asset"][key]
+        ]
+        pack("<H", buf, (len(items), ))
+        for amount, address in items:
+            pack("<Q", buf, (amount, ))
+            pack_bytes(buf, address)
+
+    def _1_7(tx, buf):
+        pass
+
+    def _1_8(tx, buf):
+        lock = tx["asset"]["lock"]
+        pack("<Q", buf, (int(tx.get("amount", 0)),))
+        pack_bytes(buf, unhexlify(lock["secretHash"]))
+        pack("<BI", buf, (
+            int(lock["expiration"]["type"]), int(lock["expiration"]["value"])
+        ))
+        pack_bytes(buf, _address(tx["recipientId"]))
+
+    def _1_9(tx, buf):
+        claim = tx["asset"]["claim"]
+        pack_bytes(buf, unhexlify(claim["lockTransactionId"]))
+        pack_bytes(buf, unhexlify(claim["unlockSecret"]))
+
+    def _1_10(tx, buf):
+        pack_bytes(buf, unhexlify(tx["asset"]["refund"]["lockTransactionId"]))
+
+    def _2_0(tx, buf):
+        dict.__setitem__(tx, "fee", 0)
+        pack("<Q", buf, (int(tx.get("amount", 0)), ))
+
+
+class _V3(object):
+
+    def _1_3(tx, buf):
+        votes = tx["asset"]["votes"]
+        pack("<B", buf, (len(votes), ))
+        for vote in votes:
+            pack_bytes(buf, unhexlify(
+                ("%02x" % len(vote)) + ("01" if vote[0] == "+" else "00") +
+                hexlify(vote[1:])
+            ))
+
+    def _2_2(tx, buf):
+        votes = tx["asset"]["votes"]
+        pack("<B", buf, (len(votes), ))
+        for user, percent in votes.items():
+            pack("<B", buf, (len(user), ))
+            pack_bytes(buf, user.encode("utf-8"))
+            pack("<H", buf, (int(decimal.Decimal(str(percent)) * 100), ))
+
+    def _1_6(tx, buf):
+        _V2._1_6(tx, buf, "transfers")
+
+    def _1_8(tx, buf):
+        lock = tx["asset"]["lock"]
+        secretHash = unhexlify(lock["secretHash"])
+        pack("<QB", buf, (int(tx.get("amount", 0)), len(secretHash)))
+        pack_bytes(buf, secretHash)
+        pack("<BI", buf, (
+            int(lock["expiration"]["type"]), int(lock["expiration"]["value"])
+        ))
+        pack_bytes(buf, _address(tx["recipientId"]))
+
+
+def _legacySerial(tx, func):
+    buf = BytesIO()
+    vendorField = tx.get("vendorField", "").encode("utf-8")[:255]
+    pack("<BBB", buf, (0xff, tx["version"], cfg.pubkeyHash))
+    pack("<IHQ", buf, (tx["typeGroup"], tx["type"], tx["nonce"]))
+    pack_bytes(buf, unhexlify(tx["senderPublicKey"]))
+    pack("<QB", buf, (tx["fee"], len(vendorField)))
+    pack_bytes(buf, vendorField)
+    payload = BytesIO()
+    func(tx, payload)
+    pack_bytes(buf, payload.getvalue())
+    return buf.getvalue()
+
+
+def _rate(number, function):
+    return number / timeit.timeit(function, number=number)
+
+
+def main(number=20000):
+    cfg.pubkeyHash = 23
+    current = dict(
+        (v, sys.modules["dposlib.ark.serde.v%d" % v]) for v in [2, 3]
+    )
+    legacy = {2: _V2, 3: _V3}
+    sys.stdout.write(
+        "%-18s %8s %14s %14s %14s %14s %8s\n" % (
+            "transaction", "items", "payload tx/s", "legacy tx/s",
+            "serial tx/s", "legacy tx/s", "speedup"
+        )
+    )
+    for tx in _fixtures():
+        func, old = _handler(tx, current), _handler(tx, legacy)
+        # handlers may set header fields such as burn fee
+        func(tx, BytesIO())
+        serial = tx_.serialize(tx, exclude_sig=True, exclude_second_sig=True)
+        if serial != _legacySerial(tx, old):
+            raise Exception(
+                "legacy serial mismatch for type %(typeGroup)d:%(type)d" % tx
+            )
+        payload = _rate(number, lambda: func(tx, BytesIO()))
+        payload_ = _rate(number, lambda: old(tx, BytesIO()))
+        serial = _rate(number, lambda: (
+            tx.__dict__.clear(),
+            tx_.serialize(tx, exclude_sig=True, exclude_second_sig=True)
+        ))
+        serial_ = _rate(number, lambda: _legacySerial(tx, old))
+        asset = tx.get("asset", {})
+        items = len(asset.get("payments", asset.get("transfers", [])))
+        sys.stdout.write(
+            "v%d %3d:%-10d %8s %14.0f %14.0f %14.0f %14.0f %7.1fx\n" % (
+                tx["version"], tx["typeGroup"], tx["type"], items or "",
+                payload, payload_, serial, serial_, serial / serial_
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
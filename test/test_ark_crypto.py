@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import base58
 import unittest
 import dposlib
 
@@ -187,3 +188,86 @@ class TestArkCrypto(unittest.TestCase):
         self.assertEqual(dposlib.core.crypto.checkTransaction(
             TestArkCrypto.signSigned_tx0_dict, keys["publicKey"]
         ), True)
+
+    def test_transactions_check(self):
+        keys = dposlib.core.crypto.getKeys(self.secondSecret)
+        signed = dict(TestArkCrypto.signSigned_tx0_dict)
+        tampered = dict(TestArkCrypto.signSigned_tx0_dict, amount=1)
+        secondPublicKeys = {signed["senderPublicKey"]: keys["publicKey"]}
+        transactions = [
+            TestArkCrypto.signed_tx0_dict, signed, tampered
+        ] * 4
+        for processes in [1, 2]:
+            verdicts = dposlib.core.crypto.checkTransactions(
+                transactions,
+                secondPublicKeys=secondPublicKeys,
+                processes=processes, chunksize=2
+            )
+            self.assertEqual(bytearray([1, 1, 0] * 4), verdicts)
+        # transactions as returned by API
+        fields = dict(
+            (k, v) for k, v in signed.items() if k != "recipientId"
+        )
+        api = dict(
+            fields, amount="100000000", fee="216000",
+            recipient=signed["recipientId"],
+            timestamp={"epoch": signed["timestamp"]}
+        )
+        self.assertEqual(
+            bytearray([1, 0]), dposlib.core.crypto.checkTransactions(
+                [api, dict(api, amount="1")],
+                secondPublicKeys=secondPublicKeys
+            )
+        )
+        # small batches are verified without worker processes by default
+        crypto = dposlib.core.crypto
+        executor, crypto.ProcessPoolExecutor = \
+            crypto.ProcessPoolExecutor, None
+        cpu_count, crypto.os.cpu_count = crypto.os.cpu_count, lambda: 4
+        try:
+            verdicts = crypto.checkTransactions(
+                transactions, secondPublicKeys=secondPublicKeys, chunksize=2
+            )
+        finally:
+            crypto.ProcessPoolExecutor = executor
+            crypto.os.cpu_count = cpu_count
+        self.assertEqual(bytearray([1, 1, 0] * 4), verdicts)
+
+    def test_key_cache(self):
+        crypto = dposlib.core.crypto
+        crypto.KEYS_CACHE.clear()
+        keys = crypto.getKeys(self.secret)
+        self.assertEqual(keys, crypto.getKeys(self.secret))
+        stats = crypto.getKeyCacheStats()["keys"]
+        self.assertEqual((1, 1), (stats["hits"], stats["misses"]))
+        self.assertNotIn(
+            bin_.unhexlify(keys["privateKey"]), crypto.KEYS_CACHE._data
+        )
+        crypto.useKeyCache(0, 0)
+        try:
+            self.assertEqual(keys, crypto.getKeys(self.secret))
+            self.assertEqual(0, len(crypto.KEYS_CACHE))
+            self.assertEqual(
+                crypto.getAddress(keys["publicKey"]),
+                crypto.getAddress(keys["publicKey"])
+            )
+            self.assertEqual(0, len(crypto.ADDRESSES_CACHE))
+        finally:
+            crypto.useKeyCache()
+
+    def test_get_addresses(self):
+        crypto = dposlib.core.crypto
+        publicKeys = [
+            crypto.getKeys(self.secret)["publicKey"],
+            crypto.getKeys(self.secondSecret)["publicKey"],
+        ]
+        for marker in [None, 23]:
+            self.assertEqual(
+                [crypto.getAddress(puk, marker) for puk in publicKeys],
+                crypto.getAddresses(publicKeys, marker)
+            )
+        for data in [b"\x00\x00\x01\x02", b"\x17" * 25, b""]:
+            self.assertEqual(
+                base58.b58encode_check(data).decode(),
+                bin_.b58encode_check(data)
+            )
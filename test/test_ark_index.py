@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+
+from dposlib import cfg
+from dposlib.ark.index import Index
+from test.test_rest import StubHandler, StubPeer
+
+
+def forge(height, fork=""):
+    # block with a transfer from s<height % 3> to r<height % 5>, every fifth
+    # block also holds a vote for d<height % 2> and a multipayment, every
+    # seventh block holds a solar-network transfer
+    block_id = "%s%d" % (fork, height)
+    transactions = [{
+        "id": "t%s" % block_id, "type": 0, "typeGroup": 1,
+        "sender": "s%d" % (height % 3), "recipient": "r%d" % (height % 5),
+        "amount": "%d" % height, "fee": "10", "vendorField": "pay %d" % height
+    }]
+    if height % 5 == 0:
+        transactions.append({
+            "id": "v%s" % block_id, "type": 3, "typeGroup": 1,
+            "sender": "s0", "fee": "10",
+            "asset": {"votes": ["+d%d" % (height % 2)]}
+        })
+        transactions.append({
+            "id": "m%s" % block_id, "type": 6, "typeGroup": 1,
+            "sender": "s1", "fee": "10", "asset": {"payments": [
+                {"recipientId": "r0", "amount": "1"},
+                {"recipientId": "x", "amount": "2"}
+            ]}
+        })
+    if height % 7 == 0:
+        transactions.append({
+            "id": "s%s" % block_id, "type": 6, "typeGroup": 1,
+            "sender": "s2", "fee": "10", "asset": {"transfers": [
+                {"recipientId": "y", "amount": "3"}
+            ]}
+        })
+    return {
+        "id": block_id, "height": height, "transactions": len(transactions),
+        "generator": {"address": "gen"}
+    }, transactions
+
+
+class ChainHandler(StubHandler):
+
+    def do_GET(self):
+        chain = self.server.chain
+        path = self.path.split("?")[0].split("/")[1:]
+        if path == ["api", "blockchain"]:
+            self._send(200, {"data": {"block": {"height": len(chain)}}})
+        elif len(path) == 3:
+            height = int(path[2])
+            if height > len(chain):
+                self._send(404, {"error": "Not Found"})
+            else:
+                self._send(200, {"data": chain[height - 1][0]})
+        else:
+            transactions = [
+                txs for block, txs in chain if block["id"] == path[2]
+            ][0]
+            self._send(200, {
+                "meta": {"pageCount": 1, "count": len(transactions)},
+                "data": transactions
+            })
+
+
+class TestArkIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.stub = StubPeer(ChainHandler)
+        self.peers, cfg.peers = cfg.peers, [self.stub.peer]
+
+    @classmethod
+    def tearDownClass(self):
+        cfg.peers = self.peers
+        self.stub.stop()
+
+    def setUp(self):
+        self.stub.chain = []
+        for height in range(1, 121):
+            self.extend(height)
+        self.index = Index(
+            os.path.join(tempfile.mkdtemp(), "test.index"),
+            workers=4, batch=10
+        )
+
+    def tearDown(self):
+        self.index.close()
+
+    def extend(self, height, fork=""):
+        block, transactions = forge(height, fork)
+        if height > 1:
+            block["previous"] = self.stub.chain[height - 2][0]["id"]
+        self.stub.chain.append((block, transactions))
+
+    def test_sync(self):
+        self.assertEqual(120, self.index.sync())
+        self.assertEqual(120, self.index.height())
+        self.assertEqual(0, self.index.sync())
+        txs = self.index.transactions(sender="s1", type=0)
+        self.assertEqual(list(range(1, 121, 3)), [tx["height"] for tx in txs])
+        # transfer and multipayment recipients
+        txs = self.index.transactions(recipient="r0", since=100, desc=True)
+        self.assertEqual(
+            ["m120", "t120", "m115", "t115", "m110", "t110", "m105", "t105",
+             "m100", "t100"],
+            [tx["id"] for tx in txs]
+        )
+        self.assertEqual(
+            ["t42"], [tx["id"] for tx in self.index.transactions(
+                vendorField="pay 42"
+            )]
+        )
+        self.assertEqual(
+            ["s7", "s14", "s21"],
+            [tx["id"] for tx in self.index.transactions(
+                recipient="y", limit=3
+            )]
+        )
+        votes = self.index.votes(delegate="d1")
+        self.assertEqual(list(range(5, 121, 10)), [v["height"] for v in votes])
+        self.assertEqual({"s0"}, set(v["voter"] for v in votes))
+
+    def test_unreachable_peer(self):
+        self.index.sync()
+        peers, cfg.peers = cfg.peers, ["http://127.0.0.1:1"]
+        try:
+            self.assertRaises(Exception, self.index.sync)
+            self.assertRaises(Exception, self.index.sync, 130)
+        finally:
+            cfg.peers = peers
+        self.assertEqual(120, self.index.height())
+        self.assertEqual("t120", self.index.transactions(since=120)[0]["id"])
+
+    def test_reorg(self):
+        self.index.sync()
+        # last three blocks replaced by a longer fork
+        del self.stub.chain[117:]
+        for height in range(118, 126):
+            self.extend(height, fork="f")
+        self.assertEqual(8, self.index.sync())
+        self.assertEqual("f118", self.index.blockId(118))
+        ids = [tx["id"] for tx in self.index.transactions(since=117)]
+        self.assertNotIn("t120", ids)
+        self.assertIn("tf120", ids)
+        self.assertEqual("t117", ids[0])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from dposlib import rest, cfg
+from dposlib.ark import payout
+
+
+class TestArkPayout(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        rest.use("ark")
+
+    def test_distribute(self):
+        self.assertEqual([34, 33, 33], payout.distribute(100, [1, 1, 1]))
+        self.assertEqual([0, 0], payout.distribute(100, [0, 0]))
+        weights = [10**16 + i for i in range(1000)]
+        shares = payout.distribute(123456789, weights)
+        self.assertEqual(123456789, sum(shares))
+        self.assertTrue(max(shares) - min(shares) <= 1)
+
+    def test_compute_shares(self):
+        snapshots = {
+            10: {"a": 300, "b": 100},
+            20: {"a": 100, "b": 100, "c": 200, "x": 1000},
+        }
+        blocks = [
+            (5, 100), (12, 100),
+            {"height": 20, "forged": {"reward": "150", "fee": "50"}},
+            {"height": 25, "forged": {"total": "200"}},
+        ]
+        # 200 shared 3:1 then 400 shared 1:1:2, x excluded
+        self.assertEqual(
+            {"a": 250, "b": 150, "c": 200},
+            payout.computeShares(snapshots, blocks, exclude=["x"])
+        )
+        shares = payout.computeShares(snapshots, blocks, ratio=0.9)
+        self.assertEqual(540, sum(shares.values()))
+        self.assertEqual(
+            {"a": 200},
+            payout.computeShares(snapshots, blocks[:2], minimum=200)
+        )
+        self.assertEqual({}, payout.computeShares({}, blocks))
+
+    def test_payments(self):
+        shares = dict(
+            ("AJWRd23HNEhPLkK1ymMnwnDBX2a7QBZqff"[:-3] + "%03d" % i, 29 + i)
+            for i in range(100)
+        )
+        limit = getattr(cfg, "multiPaymentLimit", 64)
+        cfg.multiPaymentLimit = 64
+        try:
+            txs = payout.payments(shares, vendorField="reward", minimum=30)
+            chunks = payout.payments(dict(
+                list(shares.items())[:20],
+                AJWRd23HNEhPLkK1ymMnwnDBX2a7QBZqff=1
+            ), chunk_size=10)
+        finally:
+            cfg.multiPaymentLimit = limit
+        self.assertEqual([64, 35], [
+            len(tx["asset"]["payments"]) for tx in txs
+        ])
+        payments = txs[0]["asset"]["payments"] + txs[1]["asset"]["payments"]
+        self.assertEqual(
+            list(range(128, 29, -1)), [p["amount"] for p in payments]
+        )
+        self.assertEqual("reward", txs[0]["vendorField"])
+        # single recipient left is paid with a transfer
+        self.assertEqual([6, 6, 0], [tx["type"] for tx in chunks])
+        self.assertEqual(10, len(chunks[1]["asset"]["payments"]))
+        self.assertEqual(
+            ("AJWRd23HNEhPLkK1ymMnwnDBX2a7QBZqff", 1),
+            (chunks[2]["recipientId"], chunks[2]["amount"])
+        )
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from dposlib.ark.replay import Ledger
+
+
+def tx(id, height, sender, type=0, typeGroup=1, fee="10", **kw):
+    return dict(
+        id=id, height=height, sender=sender, type=type, typeGroup=typeGroup,
+        fee=fee, **kw
+    )
+
+
+TRANSACTIONS = [
+    tx("t1", 1, "genesis", recipient="a", amount="1000", fee="0"),
+    tx("t2", 1, "genesis", recipient="b", amount="500", fee="0"),
+    tx("v1", 2, "a", type=3, asset={"votes": ["+alpha"]}),
+    tx("m1", 3, "b", type=6, amount="0", asset={"payments": [
+        {"recipientId": "a", "amount": "100"},
+        {"recipientId": "c", "amount": "50"}
+    ]}),
+    tx("v2", 3, "b", typeGroup=2, type=2, asset={
+        "votes": {"alpha": 25., "beta": 75.}
+    }),
+    tx("l1", 4, "a", type=8, amount="200", recipient="c", asset={
+        "lock": {"secretHash": "00"}
+    }),
+    tx("l2", 4, "a", type=8, amount="300", recipient="c", asset={
+        "lock": {"secretHash": "00"}
+    }),
+    tx("c1", 5, "c", type=9, fee="0", asset={
+        "claim": {"lockTransactionId": "l1", "unlockSecret": "00"}
+    }),
+    tx("r1", 6, "a", type=10, fee="0", asset={
+        "refund": {"lockTransactionId": "l2"}
+    }),
+    tx("b1", 7, "c", typeGroup=2, type=0, amount="40"),
+    tx("v3", 8, "a", type=3, asset={"votes": ["-alpha", "+beta"]}),
+]
+
+
+class TestArkReplay(unittest.TestCase):
+
+    def test_replay(self):
+        ledger = Ledger()
+        snapshots = ledger.replay(TRANSACTIONS, heights=[2, 4, 6, 100])
+        self.assertEqual(8, ledger.height)
+        self.assertEqual(4, len(ledger))
+        # genesis wallet is not funded by any transaction
+        self.assertEqual(-1500, ledger.balance("genesis"))
+        self.assertEqual(2, ledger.nonce("genesis"))
+        self.assertEqual(990, snapshots[2].balance("a"))
+        self.assertEqual({"alpha": 990}, snapshots[2].weights())
+        self.assertEqual(0, snapshots[2].balance("c"))
+        # locked amounts still count in vote weight
+        self.assertEqual(570, snapshots[4].balance("a"))
+        self.assertEqual(500, snapshots[4].locked("a"))
+        self.assertEqual(
+            {"alpha": 1070 + 82, "beta": 247}, snapshots[4].weights()
+        )
+        self.assertEqual({"a": 1070, "b": 82}, snapshots[4].voters("alpha"))
+        self.assertEqual({"alpha": 25., "beta": 75.}, snapshots[4].vote("b"))
+        # claimed lock goes to recipient, refunded one back to sender
+        self.assertEqual(870, snapshots[6].balance("a"))
+        self.assertEqual(0, snapshots[6].locked("a"))
+        self.assertEqual(250, snapshots[6].balance("c"))
+        self.assertEqual(200, ledger.balance("c"))
+        self.assertEqual(40, ledger.burned)
+        self.assertEqual(0, snapshots[6].burned)
+        self.assertEqual({"beta": 100.}, ledger.vote("a"))
+        self.assertEqual({"a": 860, "b": 247}, ledger.voters("beta"))
+        self.assertEqual({"b": 82}, ledger.voters("alpha"))
+        self.assertEqual(100, snapshots[100].height)
+        self.assertEqual(ledger.weights(), snapshots[100].weights())
+        # several snapshots taken before a single transaction
+        snapshots = Ledger().replay(
+            TRANSACTIONS[:2] + TRANSACTIONS[-1:], heights=[2, 3]
+        )
+        self.assertEqual(1000, snapshots[2].balance("a"))
+        self.assertEqual(1000, snapshots[3].balance("a"))
+
+    def test_solar(self):
+        ledger = Ledger()
+        ledger.credit("a", 10**18)
+        ledger.replay([
+            tx("s1", 1, "a", type=6, asset={"transfers": [
+                {"recipientId": "b", "amount": "300"},
+                {"recipientId": "c", "amount": "700"}
+            ]}),
+            tx("v1", 2, "a", typeGroup=2, type=2, asset={
+                "votes": {"alpha": 33.33, "beta": 66.67}
+            }),
+        ])
+        self.assertEqual(300, ledger.balance("b"))
+        self.assertEqual(700, ledger.balance("c"))
+        balance = 10**18 - 1000 - 20
+        self.assertEqual(balance, ledger.balance("a"))
+        self.assertEqual({"alpha": 33.33, "beta": 66.67}, ledger.vote("a"))
+        # exact integer weights above float precision
+        self.assertEqual({
+            "alpha": balance * 3333 // 10000,
+            "beta": balance * 6667 // 10000
+        }, ledger.weights())
+        self.assertEqual(
+            {"a": balance * 3333 // 10000}, ledger.voters("alpha")
+        )
+
+    def test_snapshot_isolation(self):
+        ledger = Ledger()
+        snapshot = ledger.replay(TRANSACTIONS[:3], heights=[2])[2]
+        ledger.credit("d", 10)
+        ledger.replay(TRANSACTIONS[3:])
+        self.assertEqual(0, snapshot.balance("d"))
+        self.assertEqual(3, len(snapshot))
+        self.assertEqual({"alpha": 990}, snapshot.weights())
+        self.assertEqual({}, snapshot.vote("b"))
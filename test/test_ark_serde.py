@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import os
+import struct
+import unittest
+
+from dposlib import rest
+from dposlib.ark import tx as tx_
+from dposlib.util import data
+
+
+class TestArkSerde(unittest.TestCase):
+
+    publicKey = \
+        "03a02b9d5fdd1307c2ee4652ba54d492d1fd11a7d1bb3f3a44c4a05e79f19de933"
+    recipientId = "AJWRd23HNEhPLkK1ymMnwnDBX2a7QBZqff"
+    ecdsa = "30440220" + "11" * 32 + "0220" + "22" * 32
+
+    @classmethod
+    def setUpClass(self):
+        self.fixtures = data.loadJson(os.path.join(
+            os.path.abspath(os.path.dirname(__file__)),
+            "fixtures.json"
+        ))
+        rest.use("ark")
+
+    def _check(self, tx):
+        serial = tx_.serialize(tx)
+        result = tx_.deserialize(memoryview(serial))
+        for key, value in tx.items():
+            self.assertEqual(value, result[key])
+        result.pop("id")
+        self.assertEqual(serial, tx_.serialize(result))
+
+    def test_fixtures(self):
+        for fixture in self.fixtures:
+            tx = tx_.deserialize(fixture["serialized"])
+            self.assertEqual(fixture["id"], tx["id"])
+            self.assertEqual(fixture["signature"], tx["signature"])
+            self.assertEqual(
+                fixture.get("asset", {}).keys(), tx["asset"].keys()
+            )
+            tx.pop("id")
+            self.assertEqual(
+                fixture["serialized"], tx_.serialize(tx).hex()
+            )
+
+    def test_signatures(self):
+        tx = dict(
+            version=2, network=23, typeGroup=1, type=0, nonce=1, fee=1,
+            amount=1, expiration=0, vendorField=u"sparkles ✨",
+            recipientId=self.recipientId, senderPublicKey=self.publicKey
+        )
+        for signatures in [
+            dict(signature="aa" * 64, signSignature="bb" * 64),
+            dict(signature="aa" * 64, signatures=["00" + "cc" * 64]),
+            dict(signature=self.ecdsa, signSignature=self.ecdsa),
+        ]:
+            self._check(dict(tx, **signatures))
+        # AIP-11 version 1 header with ECDSA multisignature
+        tx.pop("nonce")
+        self._check(dict(
+            tx, version=1, timestamp=1000,
+            signature=self.ecdsa, signatures=[self.ecdsa] * 2
+        ))
+
+    def test_v3(self):
+        common = dict(
+            version=3, network=23, nonce=1, fee=1, signature="aa" * 64,
+            senderPublicKey=self.publicKey
+        )
+        for tx in [
+            dict(typeGroup=1, type=3, asset={"votes": ["+arkmoon", "-toons"]}),
+            dict(typeGroup=2, type=2, asset={
+                "votes": {"arkmoon": 33.33, "toons": 66.67}
+            }),
+            dict(typeGroup=1, type=6, asset={
+                "transfers": [{"amount": 3, "recipientId": self.recipientId}]
+            }),
+            dict(typeGroup=1, type=8, amount=4, recipientId=self.recipientId,
+                 asset={"lock": {
+                     "secretHash": "ab" * 32,
+                     "expiration": {"type": 1, "value": 7}
+                 }}),
+            dict(typeGroup=1, type=9, asset={"claim": {
+                "hashType": 0, "lockTransactionId": "cd" * 32,
+                "unlockSecret": "ef" * 32
+            }}),
+        ]:
+            self._check(dict(common, **tx))
+
+    def test_solar_vote(self):
+        # solar legacy vote as written by solar core: vote count then, for
+        # each vote, length of the signed username, sign byte and username
+        serial = (
+            "ff0317010000000300050000000000000003a02b9d5fdd1307c2ee4652ba54d4"
+            "92d1fd11a7d1bb3f3a44c4a05e79f19de933405489000000000000"
+            "02" "08" "00" "61726b6d6f6f6e" "06" "01" "746f6f6e73" +
+            "aa" * 64
+        )
+        tx = tx_.deserialize(serial)
+        self.assertEqual(["-arkmoon", "+toons"], tx["asset"]["votes"])
+        tx.pop("id")
+        self.assertEqual(serial, tx_.serialize(tx).hex())
+
+    def test_deserialize_many(self):
+        serials = [bytes.fromhex(f["serialized"]) for f in self.fixtures]
+        payload = b"".join(
+            struct.pack("<I", len(serial)) + serial for serial in serials
+        )
+        self.assertEqual(
+            [f["id"] for f in self.fixtures],
+            [tx["id"] for tx in tx_.deserializeMany(payload)]
+        )
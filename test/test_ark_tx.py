@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import dposlib
+
+from dposlib import rest
+from dposlib.ark import tx as tx_
+from dposlib.ark.serde import serializePayload
+
+
+class TestArkTx(unittest.TestCase):
+
+    recipients = [
+        "AJWRd23HNEhPLkK1ymMnwnDBX2a7QBZqff",
+        "AMLFBUUXs8ss9iq4k5fLLnZJ5TV757dUFV",
+        "ATNGUiu6sYRb7MXtdcVc7KjoyM6TdfuoC1"
+    ]
+
+    @classmethod
+    def setUpClass(self):
+        # secrets used for testing
+        self.secret = "secret"
+        self.secondSecret = "secondSecret"
+        rest.use("ark")
+
+    def _transfers(self):
+        return [
+            dposlib.core.transfer(i + 1, address, "batch %d" % i)
+            for i, address in enumerate(TestArkTx.recipients * 4)
+        ]
+
+    def test_finalize_single_pass(self):
+        tx = self._transfers()[0]
+        tx.finalize(self.secret, self.secondSecret, fee=10000000)
+        signature, signSignature, id_ = \
+            tx["signature"], tx["signSignature"], tx["id"]
+        tx.sign()
+        tx.signSign()
+        tx.identify()
+        self.assertEqual(signature, tx["signature"])
+        self.assertEqual(signSignature, tx["signSignature"])
+        self.assertEqual(id_, tx["id"])
+        self.assertEqual(
+            tx_.serialize(tx),
+            tx_.serializeUnsigned(tx) + tx_.serializeSignatures(tx)
+        )
+        # sender known but no private key
+        tx = self._transfers()[0]
+        tx.senderPublicKey = dposlib.core.crypto.getKeys(
+            self.secret
+        )["publicKey"]
+        with self.assertRaisesRegex(Exception, "orphan transaction"):
+            tx.finalize(fee=10000000)
+
+    def test_finalize_many(self):
+        expected = self._transfers()
+        for i, tx in enumerate(expected):
+            tx["nonce"] = i + 1
+            tx.finalize(self.secret, self.secondSecret, fee=10000000)
+        finalized = tx_.finalizeMany(
+            self._transfers(), self.secret, self.secondSecret,
+            fee=10000000, nonce=1, processes=2
+        )
+        self.assertEqual(len(expected), len(finalized))
+        for tx0, tx1 in zip(expected, finalized):
+            self.assertEqual(tx0["nonce"], tx1["nonce"])
+            self.assertEqual(tx0["signature"], tx1["signature"])
+            self.assertEqual(tx0["signSignature"], tx1["signSignature"])
+            self.assertEqual(tx0["id"], tx1["id"])
+        # small batches are signed without worker processes by default
+        executor, tx_.ProcessPoolExecutor = tx_.ProcessPoolExecutor, None
+        cpu_count, tx_.os.cpu_count = tx_.os.cpu_count, lambda: 4
+        try:
+            finalized = tx_.finalizeMany(
+                self._transfers(), self.secret, self.secondSecret,
+                fee=10000000, nonce=1
+            )
+        finally:
+            tx_.ProcessPoolExecutor = executor
+            tx_.os.cpu_count = cpu_count
+        self.assertEqual(
+            [tx["id"] for tx in expected], [tx["id"] for tx in finalized]
+        )
+
+    def test_payload_cache(self):
+        tx = dposlib.core.multiPayment(
+            [1, TestArkTx.recipients[0]], [2, TestArkTx.recipients[1]]
+        )
+        serial = serializePayload(tx)
+        self.assertEqual(serial, serializePayload(tx))
+        tx.asset["payments"][0]["amount"] = 10
+        self.assertNotEqual(serial, serializePayload(tx))
+        tx.asset["payments"].pop()
+        self.assertEqual(
+            len(serializePayload(tx)), len(serial) - 29
+        )
+        tx["asset"] = {"payments": [{
+            "amount": 3, "recipientId": TestArkTx.recipients[2]
+        }]}
+        tx.asset["payments"].append(
+            {"amount": 4, "recipientId": TestArkTx.recipients[0]}
+        )
+        self.assertEqual(len(serializePayload(tx)), len(serial))
+        # dict methods changing payload fields
+        serial = serializePayload(tx)
+        tx.update(asset={"payments": [
+            {"amount": 5, "recipientId": TestArkTx.recipients[1]}
+        ]})
+        self.assertEqual(len(serializePayload(tx)), len(serial) - 29)
+        tx.asset["payments"][0]["amount"] = 6
+        self.assertIn((6).to_bytes(8, "little"), serializePayload(tx))
+        transfer = dposlib.core.transfer(1, TestArkTx.recipients[0])
+        serial = serializePayload(transfer)
+        transfer.update({"amount": 200000000})
+        self.assertNotEqual(serial, serializePayload(transfer))
+        serial = serializePayload(transfer)
+        transfer.pop("recipientId")
+        transfer.setdefault("recipientId", TestArkTx.recipients[1])
+        self.assertNotEqual(serial, serializePayload(transfer))
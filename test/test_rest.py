@@ -0,0 +1,829 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import tempfile
+import asyncio
+import threading
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dposlib import rest, cfg
+from dposlib.util import pool, scoreboard, retry, cache, asynch, limit
+from dposlib.ark import mixin, builders, api
+
+
+def until(condition, timeout=5.):
+    # poll condition until true or deadline reached
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # keep-alive json server echoing request path
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, data, headers={}):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.active += 1
+            self.server.peak = max(self.server.peak, self.server.active)
+        if "delay" in self.path:
+            time.sleep(0.01)
+        with self.server.lock:
+            self.server.active -= 1
+        if self.path.startswith("/api/pages"):
+            self._send(*self._page())
+        elif self.path == "/api/throttle":
+            self._send(429, {"error": "Too Many Requests"}, {
+                "Retry-After": "60"
+            })
+        elif self.path == "/api/blockchain":
+            self._send(200, {
+                "data": {"block": {"height": self.server.height}}
+            })
+        elif self.path.startswith("/api/blocks/") and self.server.broken \
+                and "/transactions" in self.path:
+            self._send(500, {"error": "Internal Server Error"})
+        elif self.path.startswith("/api/blocks/"):
+            self._send(200, self._block(self.path.split("/")[3:]))
+        elif self.path.startswith("/api/wallets/"):
+            self._send(200, {"data": {
+                "path": self.path, "address": self.path.split("/")[-1]
+            }})
+        else:
+            self._send(200, {
+                "data": {"path": self.path, "peer": self.server.peer}
+            })
+
+    def _block(self, path):
+        # block at height n forged by gen with a single w1 to w2 transfer
+        if len(path) == 1:
+            return {"data": {
+                "id": "b" + path[0], "transactions": 1,
+                "generator": {"address": "gen"}
+            }}
+        return {
+            "meta": {"pageCount": 1, "count": 1, "next": None},
+            "data": [{"sender": "w1", "recipient": "w2"}]
+        }
+
+    def _page(self):
+        # 10 pages of 5 records, `fail` page is unavailable and `missing`
+        # page is not found
+        query = parse_qs(urlparse(self.path).query)
+        page = int(query.get("page", [1])[0])
+        if query.get("fail", [None])[0] == str(page):
+            return 500, {"error": "Internal Server Error"}
+        if query.get("missing", [None])[0] == str(page):
+            return 404, {"error": "Not Found"}
+        return 200, {
+            "meta": {
+                "pageCount": 10, "totalCount": 50, "count": 5,
+                "next": "/api/pages?page=%d" % (page + 1)
+                if page < 10 else None
+            },
+            "data": [{"id": i} for i in range(5 * (page - 1), 5 * page)]
+        }
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        data = json.loads(self.rfile.read(length))
+        if self.path == "/api/transactions" and all(
+            isinstance(tx, dict) for tx in data.get("transactions", [1])
+        ):
+            self._send(200, self._report(data["transactions"]))
+        elif self.path == "/api/wallets/search":
+            self._send(200, {"data": [
+                {"address": address, "balance": "7"}
+                for address in data["addresses"]
+            ]})
+        else:
+            self._send(200, {"data": data})
+
+    def _report(self, transactions):
+        # ids starting with x are invalid
+        accept = [tx["id"] for tx in transactions if tx["id"][0] != "x"]
+        invalid = [tx["id"] for tx in transactions if tx["id"][0] == "x"]
+        return {
+            "data": {
+                "accept": accept, "broadcast": accept, "excess": [],
+                "invalid": invalid
+            },
+            "errors": dict((i, {"type": "ERR_BAD_DATA"}) for i in invalid)
+        }
+
+
+class StubPeer(ThreadingHTTPServer):
+    # local peer listening on a random port
+    daemon_threads = True
+
+    def __init__(self, handler=StubHandler):
+        ThreadingHTTPServer.__init__(self, ("127.0.0.1", 0), handler)
+        self.lock = threading.Lock()
+        self.connections = self.requests = self.active = self.peak = 0
+        self.height = 1
+        self.broken = False
+        self.peer = "http://127.0.0.1:%d" % self.server_address[1]
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class TestRest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        self.stub = StubPeer()
+
+    @classmethod
+    def tearDownClass(self):
+        pool.closePools()
+        self.stub.stop()
+
+    def test_keep_alive(self):
+        pool.closePools()
+        connections = self.stub.connections
+        for i in range(20):
+            resp = rest.GET.api.wallets("w%d" % i, peer=self.stub.peer)
+            self.assertEqual("/api/wallets/w%d" % i, resp["data"]["path"])
+        resp = rest.POST.api.transactions(
+            peer=self.stub.peer, transactions=[1, 2]
+        )
+        self.assertEqual({"transactions": [1, 2]}, resp["data"])
+        stats = pool.stats()[self.stub.peer]
+        self.assertEqual(21, stats["requests"])
+        self.assertEqual(1, stats["created"])
+        self.assertEqual(20, stats["reused"])
+        self.assertTrue(stats["healthy"])
+        self.assertEqual(1, self.stub.connections - connections)
+
+    def test_idle_timeout(self):
+        pool.closePools()
+        connections = pool.getPool(self.stub.peer, size=1, idle=0)
+        connections.request("GET", "/api/node")
+        connections.request("GET", "/api/node")
+        self.assertEqual(2, connections.stats()["created"])
+        self.assertEqual(0, connections.stats()["reused"])
+
+    def test_asyncio(self):
+        async def main(n):
+            return await asyncio.gather(*[
+                rest.AGET.api.delay("w%d" % i, peer=self.stub.peer)
+                for i in range(n)
+            ])
+
+        concurrency = getattr(cfg, "concurrency", 100)
+        cfg.concurrency = 8
+        try:
+            self.stub.peak = 0
+            result = asyncio.run(main(100))
+        finally:
+            cfg.concurrency = concurrency
+        self.assertEqual(
+            ["/api/delay/w%d" % i for i in range(100)],
+            [resp["data"]["path"] for resp in result]
+        )
+        self.assertLessEqual(self.stub.peak, 8)
+
+    def test_close_async_pools(self):
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(
+                rest.AGET.api.node(peer=self.stub.peer)
+            )
+            connections = pool.ASYNC_POOLS[loop][self.stub.peer]
+            self.assertEqual(1, len(connections._idle))
+            pool.closePools()
+            self.assertEqual(0, len(connections._idle))
+            self.assertNotIn(loop, pool.ASYNC_POOLS)
+        finally:
+            loop.close()
+
+    def test_prefetch(self):
+        peers, cfg.peers = cfg.peers, [self.stub.peer]
+        try:
+            for prefetch in [0, 4]:
+                self.stub.peak = 0
+                data = mixin.loadPages(
+                    rest.GET.api.pages.delay, prefetch=prefetch
+                )
+                self.assertEqual(list(range(50)), [r["id"] for r in data])
+        finally:
+            cfg.peers = peers
+        self.assertGreater(self.stub.peak, 1)
+
+    def test_stream(self):
+        checkpoints = []
+        peers, cfg.peers = cfg.peers, [self.stub.peer]
+        try:
+            requests = self.stub.requests
+            stream = mixin.streamPages(
+                rest.GET.api.pages, prefetch=2,
+                checkpoint=lambda cursor: checkpoints.append(
+                    (cursor.page, cursor.count)
+                )
+            )
+            self.assertEqual({"id": 0}, next(stream))
+            # first page and at most prefetch pages ahead
+            time.sleep(0.1)
+            self.assertLessEqual(self.stub.requests - requests, 3)
+            data = [0] + [r["id"] for r in stream]
+            limited = mixin.streamPages(rest.GET.api.pages, limit=12)
+            self.assertEqual(list(range(12)), [r["id"] for r in limited])
+        finally:
+            cfg.peers = peers
+        self.assertEqual(list(range(50)), data)
+        self.assertEqual([(p, 5 * p) for p in range(1, 11)], checkpoints)
+
+    def test_not_found(self):
+        peers, cfg.peers = cfg.peers, [self.stub.peer]
+        try:
+            # client error is not retried
+            requests = self.stub.requests
+            with self.assertRaises(mixin.PaginationError) as context:
+                mixin.loadPages(rest.GET.api.pages, nb_tries=5, missing="2")
+            self.assertEqual(2, self.stub.requests - requests)
+        finally:
+            cfg.peers = peers
+        error = context.exception
+        self.assertEqual((9, 45, 404), (
+            error.missing_pages, error.missing_records, error.error["status"]
+        ))
+
+    def test_resume(self):
+        peers, cfg.peers = cfg.peers, [self.stub.peer]
+        data = []
+        try:
+            with self.assertRaises(mixin.PaginationError) as context:
+                for record in mixin.streamPages(
+                    rest.GET.api.pages, nb_tries=1, fail="3"
+                ):
+                    data.append(record["id"])
+            error = context.exception
+            self.assertEqual((8, 40), (
+                error.missing_pages, error.missing_records
+            ))
+            cursor = mixin.Cursor.loads(error.cursor.dumps())
+            self.assertEqual(
+                (["api", "pages"], 2, 9, 10),
+                (cursor.path, cursor.page, cursor.last, cursor.count)
+            )
+            cursor.params.pop("fail")
+            for record in mixin.streamPages(cursor.endpoint(), cursor=cursor):
+                data.append(record["id"])
+            # two records seen at page 1 shifted to page 2
+            shifted = mixin.Cursor(["api", "pages"], page=1, last=6, count=7)
+            resumed = mixin.loadPages(
+                shifted.endpoint(), pages=2, cursor=shifted
+            )
+        finally:
+            cfg.peers = peers
+        self.assertEqual(list(range(50)), data)
+        self.assertEqual([7, 8, 9], [r["id"] for r in resumed])
+
+    def test_scoreboard(self):
+        board = scoreboard.Scoreboard(threshold=2, cooldown=0.05)
+        fast, slow, lagging = "http://fast:1", "http://slow:1", "http://lag:1"
+        for peer, latency, height in [
+            (fast, 0.01, 100), (slow, 0.1, 100), (lagging, 0.01, 80)
+        ]:
+            board.record(peer, latency)
+            board.setHeight(peer, height)
+        peers = [fast, slow, lagging]
+        self.assertEqual([fast, slow, lagging], board.rank(peers))
+        chosen = [board.choose(peers) for i in range(300)]
+        self.assertGreater(chosen.count(fast), chosen.count(slow))
+        self.assertGreater(chosen.count(slow), chosen.count(lagging))
+        # consecutive failures eject fast peer until cooldown expired
+        board.record(fast, 1, False)
+        board.record(fast, 1, False)
+        self.assertGreater(board.stats()[fast]["ejected"], 0)
+        self.assertNotIn(fast, [board.choose(peers) for i in range(50)])
+        self.assertEqual(fast, board.choose([fast]))
+        time.sleep(0.06)
+        board.record(fast, 0.01)
+        self.assertEqual(0, board.stats()[fast]["ejected"])
+        # recovered peer is ranked on cost only
+        board.setHeight(lagging, 10)
+        board.record(slow, 1, False)
+        board.record(slow, 1, False)
+        self.assertEqual([lagging, slow], board.rank([slow, lagging]))
+        time.sleep(0.06)
+        self.assertEqual([slow, lagging], board.rank([slow, lagging]))
+        # requests feed global scoreboard
+        rest.GET.api.node(peer=self.stub.peer)
+        self.assertIsNotNone(scoreboard.stats()[self.stub.peer]["latency"])
+
+    def test_failover(self):
+        dead = "http://127.0.0.1:1"
+        budget = retry.BUDGET
+        peers, cfg.peers = cfg.peers, [dead, self.stub.peer]
+        try:
+            budget.reset()
+            scoreboard.SCOREBOARD.clear()
+            for i in range(10):
+                # dead peer is ejected after a few unsuccessful tries
+                resp = rest.GET.api.wallets("w%d" % i)
+                self.assertEqual("/api/wallets/w%d" % i, resp["data"]["path"])
+            self.assertGreater(budget.retries, 0)
+            # POST is retried only on demand
+            cfg.peers, retries = [dead, dead + "/"], budget.retries
+            self.assertFalse(rest.POST.api.transactions()["success"])
+            self.assertEqual(retries, budget.retries)
+            rest.POST.api.transactions(retry=True)
+            self.assertEqual(retries + 1, budget.retries)
+            # budget exhausted
+            budget.balance = 0
+            rest.GET.api.wallets()
+            self.assertEqual(retries + 1, budget.retries)
+            self.assertEqual(1, budget.rejected)
+        finally:
+            cfg.peers = peers
+            budget.reset()
+
+    def test_hedge(self):
+        other = self.stub.peer.replace("127.0.0.1", "localhost")
+        peers, cfg.peers = cfg.peers, [self.stub.peer, other]
+        hedge, cfg.hedge = getattr(cfg, "hedge", 0), 0.001
+        try:
+            retry.BUDGET.reset()
+            for i in range(5):
+                resp = rest.GET.api.delay("w%d" % i)
+                self.assertEqual("/api/delay/w%d" % i, resp["data"]["path"])
+            self.assertEqual(5, retry.BUDGET.hedges)
+            # executor follows in-flight limits, not connection pool size
+            self.assertEqual(
+                2 * cfg.concurrency, rest.HEDGE_EXECUTOR._max_workers
+            )
+            cfg.maxinflight = 4
+            rest.GET.api.delay("w")
+            self.assertEqual(8, rest.HEDGE_EXECUTOR._max_workers)
+            # replaced executor still accepts requests of current callers
+            executor = rest._hedgeExecutor()
+            cfg.maxinflight = 0
+            self.assertIsNot(executor, rest._hedgeExecutor())
+            self.assertEqual(1, executor.submit(lambda: 1).result())
+        finally:
+            cfg.peers, cfg.hedge = peers, hedge
+            cfg.maxinflight = 0
+
+    def test_hedge_simultaneous(self):
+        dead = "http://127.0.0.1:1"
+        peers, cfg.peers = cfg.peers, [dead, self.stub.peer]
+        hedge, cfg.hedge = getattr(cfg, "hedge", 0), 0.001
+        _open, _wait = rest._open, rest.wait
+
+        def slow(request):
+            time.sleep(0.05)
+            return _open(request)
+
+        def both(futures, timeout=None, return_when=None):
+            # first completed request is only seen with the other one
+            if return_when is None:
+                return _wait(futures, timeout)
+            return _wait(futures)
+
+        rest._open, rest.wait = slow, both
+        try:
+            retry.BUDGET.reset()
+            for i in range(10):
+                resp = rest._hedged(
+                    "GET", ("api", "node"), {"peer": dead}, [dead]
+                )
+                self.assertEqual(self.stub.peer, resp["data"]["peer"])
+        finally:
+            rest._open, rest.wait = _open, _wait
+            cfg.peers, cfg.hedge = peers, hedge
+            retry.BUDGET.reset()
+            retry.BUDGET.reset()
+
+    def test_broadcast(self):
+        other = self.stub.peer.replace("127.0.0.1", "localhost")
+        values = dict(
+            (k, getattr(cfg, k, None))
+            for k in ["peers", "network", "maxTransactions"]
+        )
+        cfg.peers = ["http://127.0.0.1:1", self.stub.peer, other]
+        cfg.network, cfg.maxTransactions = "ark", 2
+        try:
+            report = builders.broadcastTransactions(
+                {"id": "a"}, {"id": "x"}, {"id": "b"}, peers=3, quorum=2
+            )
+            single = builders.broadcastTransactions(
+                {"id": "a"}, peers=3, quorum=1
+            )
+        finally:
+            cfg.__dict__.update(values)
+        self.assertEqual(2, len(report))
+        self.assertEqual(["a"], report[0]["data"]["accept"])
+        self.assertEqual(["x"], report[0]["data"]["invalid"])
+        self.assertEqual(["x"], list(report[0]["errors"]))
+        self.assertFalse(report[0]["quorum"])
+        self.assertTrue(report[1]["quorum"])
+        self.assertEqual(
+            {self.stub.peer: 1, other: 1},
+            dict((k, v) for k, v in report[1]["peers"].items() if v == 1)
+        )
+        self.assertTrue(single["quorum"])
+        self.assertEqual(["a"], single["data"]["accept"])
+
+    def test_cache(self):
+        path = os.path.join(tempfile.mkdtemp(), "test.cache")
+        rules = [(r"^/api/wallets/", lambda r: True)]
+        peers, cfg.peers = cfg.peers, [self.stub.peer]
+        try:
+            responses = rest.useCache(path, 200, rules)
+            requests = self.stub.requests
+            for i in range(3):
+                rest.GET.api.wallets("w1")
+            rest.GET.api.wallets("w1", cache=False)
+            rest.GET.api.node()
+            self.assertEqual(3, self.stub.requests - requests)
+            self.assertEqual((2, 1), (responses.hits, responses.stores))
+            # least recently used responses are evicted above 200 bytes
+            for i in range(2, 6):
+                rest.GET.api.wallets("w%d" % i)
+            self.assertLessEqual(responses.size, 200)
+            self.assertGreater(responses.evictions, 0)
+            # responses persist
+            responses = rest.useCache(path, 200, rules)
+            resp = rest.GET.api.wallets("w5")
+            self.assertEqual("/api/wallets/w5", resp["data"]["path"])
+            self.assertEqual(1, responses.hits)
+        finally:
+            rest.useCache(None)
+            cfg.peers = peers
+        final = {"data": {"confirmations": 1000}, "status": 200}
+        responses = cache.ResponseCache(path)
+        self.assertTrue(responses.cacheable("/api/blocks/10", final))
+        self.assertFalse(responses.cacheable("/api/blocks/10", {
+            "data": {"confirmations": 1}, "status": 200
+        }))
+        self.assertFalse(responses.cacheable("/api/blocks", final))
+        # confirmation count is not frozen in cache
+        self.assertTrue(responses.store("k1", "/api/blocks/10", dict(
+            final, data={"id": "b", "confirmations": 1000}
+        )))
+        self.assertEqual({"id": "b"}, responses.get("k1")["data"])
+        self.assertTrue(responses.store("k2", "/api/blocks/10/transactions", {
+            "data": [{"id": "t", "confirmations": 1000}], "status": 200
+        }))
+        self.assertEqual([{"id": "t"}], responses.get("k2")["data"])
+        responses.close()
+        # hits are not written at once but still count for eviction
+        responses = cache.ResponseCache(
+            path + ".lru", 60, [(r"^/", lambda r: True)]
+        )
+        for key in ["a", "b"]:
+            responses.store(key, "/", {"data": key, "status": 200})
+        changes = responses._db.total_changes
+        self.assertIsNotNone(responses.get("a"))
+        self.assertEqual(changes, responses._db.total_changes)
+        responses.store("c", "/", {"data": "c", "status": 200})
+        self.assertEqual(1, responses.evictions)
+        self.assertIsNone(responses.get("b"))
+        self.assertIsNotNone(responses.get("a"))
+        responses.close()
+
+    def test_coalescing(self):
+        requests = self.stub.requests
+        flights = rest.FLIGHTS.stats()
+        barrier = threading.Barrier(20)
+        results = []
+
+        def get():
+            barrier.wait()
+            results.append(rest.GET.api.delay.fees(peer=self.stub.peer))
+
+        threads = [threading.Thread(target=get) for i in range(20)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        stats = rest.FLIGHTS.stats()
+        self.assertEqual(20, len(results))
+        self.assertEqual(20, stats["calls"] - flights["calls"])
+        self.assertGreater(stats["shared"] - flights["shared"], 0)
+        self.assertEqual(
+            stats["leaders"] - flights["leaders"],
+            self.stub.requests - requests
+        )
+        # shared responses are copies
+        self.assertEqual(20, len(set(id(result) for result in results)))
+        results[0]["data"]["path"] = None
+        self.assertEqual("/api/delay/fees", results[-1]["data"]["path"])
+        # leading call exception is raised for followers
+        flights = asynch.SingleFlight()
+        with self.assertRaises(ZeroDivisionError):
+            flights.do("key", lambda: 1 / 0)
+        self.assertEqual((1, False), flights.do("key", lambda: 1))
+        # leader result is copied before followers are released
+        flights, origin, followers = asynch.SingleFlight(list), [1], []
+
+        def lead():
+            follower = threading.Thread(
+                target=lambda: followers.append(flights.do("key", None))
+            )
+            follower.start()
+            until(lambda: flights.stats()["shared"])
+            return origin
+
+        result, shared = flights.do("key", lead)
+        self.assertTrue(until(lambda: len(followers)))
+        self.assertFalse(shared)
+        self.assertEqual(([1], True), followers[0])
+        self.assertIsNot(origin, result)
+        self.assertIsNot(origin, followers[0][0])
+        self.assertIsNot(result, followers[0][0])
+
+    def test_scheduler(self):
+        heights = [1]
+        peers, cfg.peers = cfg.peers, [self.stub.peer]
+        scheduler = asynch.Scheduler(
+            0.05, jitter=0.2, workers=2, batch=2, height=lambda: heights[0]
+        )
+        try:
+            wallets = [
+                api.Wallet("w%d" % i, keep_alive=False) for i in range(5)
+            ]
+            for wallet in wallets:
+                scheduler.add(wallet)
+            # refreshed once by batches, then skipped until next block
+            self.assertTrue(until(lambda: scheduler.stats()["refreshed"] >= 5))
+            self.assertTrue(until(lambda: scheduler.stats()["skipped"] > 5))
+            stats = scheduler.stats()
+            self.assertEqual(5, stats["refreshed"])
+            self.assertGreaterEqual(stats["batches"], 3)
+            self.assertEqual([7e-08] * 5, [w.balance for w in wallets])
+            heights[0] = 2
+            self.assertTrue(
+                until(lambda: scheduler.stats()["refreshed"] >= 10)
+            )
+            skipped = scheduler.stats()["skipped"]
+            self.assertTrue(
+                until(lambda: scheduler.stats()["skipped"] > skipped + 5)
+            )
+            self.assertEqual(10, scheduler.stats()["refreshed"])
+            del wallet, wallets
+            self.assertTrue(until(lambda: scheduler.stats()["objects"] == 0))
+        finally:
+            scheduler.stop()
+            cfg.peers = peers
+
+    def test_content_compatibility(self):
+        peers, cfg.peers = cfg.peers, [self.stub.peer]
+        scheduler = api.SCHEDULER
+        try:
+            wallet = api.Wallet("w1", keep_alive=False)
+            with self.assertWarns(DeprecationWarning):
+                self.assertFalse(api.Content.EVENT)
+            scheduler.add(wallet)
+            with self.assertWarns(DeprecationWarning):
+                self.assertEqual(
+                    [wallet], [ref() for ref in api.Content.REF]
+                )
+            refreshed = scheduler.stats()["refreshed"]
+            with self.assertWarns(DeprecationWarning):
+                api.contentUpdate()
+            self.assertTrue(
+                until(lambda: scheduler.stats()["refreshed"] > refreshed)
+            )
+            with self.assertWarns(DeprecationWarning):
+                event = api.Content.EVENT
+            self.assertFalse(event.is_set())
+            event.set()
+            self.assertTrue(event.is_set())
+            self.assertEqual([], scheduler.objects())
+        finally:
+            scheduler.stop()
+            cfg.peers = peers
+
+    def test_watcher(self):
+        peers, cfg.peers = cfg.peers, [self.stub.peer]
+        scheduler = asynch.Scheduler(60)
+        watcher = api.ChainWatcher(scheduler, depth=5)
+        try:
+            wallets = [
+                api.Wallet(a, keep_alive=False) for a in ["w1", "w2", "w3"]
+            ]
+            block = api.Block("1", keep_alive=False)
+            for content in wallets + [block]:
+                scheduler.add(content)
+            watcher.poll()
+            self.stub.height += 1
+            watcher.poll()
+            # sender and recipient of new block transaction and block not
+            # final yet
+            self.assertTrue(until(lambda: scheduler.stats()["refreshed"] > 2))
+            self.assertEqual(3, scheduler.stats()["refreshed"])
+            # too many blocks to inspect, all contents refreshed
+            self.stub.height += 10
+            watcher.poll()
+            self.assertTrue(until(lambda: scheduler.stats()["refreshed"] > 6))
+            self.assertEqual(7, scheduler.stats()["refreshed"])
+            self.assertEqual(self.stub.height, watcher.height)
+            # unavailable transactions, all contents refreshed
+            self.stub.broken = True
+            self.stub.height += 1
+            watcher.poll()
+            self.assertTrue(until(lambda: scheduler.stats()["refreshed"] > 10))
+            self.assertEqual(11, scheduler.stats()["refreshed"])
+            self.assertEqual(self.stub.height, watcher.height)
+        finally:
+            self.stub.broken = False
+            scheduler.stop()
+            cfg.peers = peers
+
+    def test_affected(self):
+        keys = api._txKeys({
+            "sender": "w1", "asset": {
+                "transfers": [{"recipientId": "w2", "amount": "1"}],
+                "votes": {"arky": 60, "bob": 40}
+            }
+        })
+        self.assertEqual({"w1", "w2", "arky", "bob"}, keys)
+        self.assertEqual(
+            {"w1", "pk"}, api._txKeys({"sender": "w1", "asset": {
+                "votes": ["-pk"]
+            }})
+        )
+        delegate = api.Delegate.__new__(api.Delegate)
+        delegate.__dict__.update(username="arky", address="d1")
+        # unknown voters
+        self.assertTrue(delegate.affected({"w3"}))
+        delegate._voters = {"w1"}
+        self.assertTrue(delegate.affected({"w1"}))
+        self.assertFalse(delegate.affected({"w3"}))
+        # a vote may change voters
+        self.assertTrue(delegate.affected(keys))
+        self.assertTrue(delegate.affected({"w3"}))
+        # block is refreshed until its confirmations are final
+        block = api.Block.__new__(api.Block)
+        self.assertTrue(block.affected(set()))
+        block.__dict__.update(confirmations=10)
+        self.assertTrue(block.affected(set()))
+        block.__dict__.update(confirmations=1000)
+        self.assertFalse(block.affected(set()))
+
+    def test_routing(self):
+        stubs = [self.stub, StubPeer(), StubPeer()]
+
+        def explicit(i):
+            peer = stubs[i % 3].peer
+            resp = rest.GET.api.node("e%d" % i, peer=peer)
+            return peer, resp["data"]["peer"]
+
+        def context(i):
+            with rest.usePeer(stubs[i % 3].peer) as peer:
+                return peer, rest.GET.api.node("c%d" % i)["data"]["peer"]
+
+        def chosen(i):
+            return None, rest.GET.api.node("r%d" % i)["data"]["peer"]
+
+        async def tasks(n):
+            async def get(i):
+                with rest.usePeer(stubs[i % 3].peer) as peer:
+                    resp = await rest.AGET.api.node("a%d" % i)
+                    return peer, resp["data"]["peer"]
+            return await asyncio.gather(*[get(i) for i in range(n)])
+
+        peers, cfg.peers = cfg.peers, [stub.peer for stub in stubs]
+        try:
+            with ThreadPoolExecutor(32) as executor:
+                results = list(executor.map(
+                    lambda i: [explicit, context, chosen][i % 3](i), range(900)
+                ))
+            results.extend(asyncio.run(tasks(90)))
+        finally:
+            cfg.peers = peers
+            [stub.stop() for stub in stubs[1:]]
+        self.assertEqual(990, len(results))
+        for expected, peer in results:
+            if expected is None:
+                self.assertIn(peer, [s.peer for s in stubs])
+            else:
+                self.assertEqual(expected, peer)
+
+    def test_routing_threads(self):
+        other = StubPeer()
+
+        class Probe(object):
+            peers = []
+
+            def update(self):
+                self.peers.append(rest.GET.api.node()["data"]["peer"])
+
+        values = dict(
+            (k, getattr(cfg, k, None))
+            for k in ["peers", "network", "maxTransactions"]
+        )
+        cfg.peers = [other.peer]
+        cfg.network, cfg.maxTransactions = "ark", 2
+        scheduler = asynch.Scheduler(60)
+        try:
+            with rest.usePeer(self.stub.peer):
+                # prefetched pages stay on bound peer
+                records = mixin.loadPages(rest.GET.api.pages, prefetch=4)
+                probe = Probe()
+                scheduler.add(probe)
+                report = builders.broadcastTransactions(
+                    {"id": "a"}, peers=2, quorum=2
+                )
+            self.assertEqual(list(range(50)), [r["id"] for r in records])
+            self.assertNotIn("peers", report)
+            scheduler.refresh()
+            self.assertTrue(until(lambda: len(probe.peers)))
+            self.assertEqual([self.stub.peer], probe.peers)
+            self.assertEqual(0, other.requests)
+        finally:
+            scheduler.stop()
+            cfg.__dict__.update(values)
+            other.stop()
+
+    def test_rate_limit(self):
+        values = dict(
+            (k, getattr(cfg, k, 0))
+            for k in ["ratelimit", "peerratelimit", "maxinflight"]
+        )
+        peer = self.stub.peer
+        try:
+            # 20 tokens available at once then 20 per second
+            cfg.ratelimit, cfg.peerratelimit = 100, 20
+            start = time.time()
+            for i in range(30):
+                rest.GET.api.node("l%d" % i, peer=peer)
+            self.assertGreaterEqual(time.time() - start, 0.45)
+            cfg.ratelimit, cfg.peerratelimit, cfg.maxinflight = 0, 0, 2
+            self.stub.peak = 0
+            with ThreadPoolExecutor(10) as executor:
+                list(executor.map(
+                    lambda i: rest.GET.api.delay("m%d" % i, peer=peer),
+                    range(20)
+                ))
+            self.assertLessEqual(self.stub.peak, 2)
+            # peer paused as long as asked, long pause is not waited and
+            # paused peer is avoided
+            throttled = limit.GOVERNOR.stats()["throttled"]
+            errors = scoreboard.stats()[peer]["errors"]
+            self.assertEqual(429, rest.GET.api.throttle(peer=peer)["status"])
+            # throttling is a peer failure
+            self.assertGreater(scoreboard.stats()[peer]["errors"], errors)
+            stats = limit.GOVERNOR.stats()
+            self.assertEqual(throttled + 1, stats["throttled"])
+            self.assertGreater(stats["paused"][peer], 50)
+            other = StubPeer()
+            peers, cfg.peers = cfg.peers, [peer, other.peer]
+            try:
+                requests = self.stub.requests
+                rejected = limit.GOVERNOR.stats()["rejected"]
+                self.assertFalse(rest.GET.api.node(peer=peer)["success"])
+                self.assertEqual(requests, self.stub.requests)
+                self.assertEqual(
+                    rejected + 1, limit.GOVERNOR.stats()["rejected"]
+                )
+                for i in range(5):
+                    resp = rest.GET.api.node("p%d" % i)
+                    self.assertEqual(other.peer, resp["data"]["peer"])
+            finally:
+                cfg.peers = peers
+                other.stop()
+        finally:
+            limit.GOVERNOR.clear()
+            cfg.__dict__.update(values)
+        bucket = limit.TokenBucket(10, burst=1)
+        self.assertEqual(0, bucket.reserve())
+        self.assertGreater(bucket.reserve(), 0.05)
+        bucket.pause(60)
+        self.assertGreater(bucket.reserve(), 50)
+
+    def test_unreachable_peer(self):
+        resp = rest.GET.api.node(peer="http://127.0.0.1:1")
+        self.assertFalse(resp["success"])
+        stats = pool.stats()["http://127.0.0.1:1"]
+        self.assertEqual(1, stats["failures"])